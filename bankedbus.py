@@ -0,0 +1,88 @@
+'''An interconnect of independent, address-interleaved buses
+
+A BankedBus holds K banks, each a bus of the protocol (atomic or split
+transaction) with its own msg_q, countdown timers and statistics. A message
+goes to bank (address / block_size) % K, so every block is handled by one
+bank and its transactions stay serialized there. All banks snoop the same
+cache controllers.
+
+The cache controllers and the scheduler see the interface of a single bus.
+Only the banks with queued messages or transactions in flight are ticked or
+skipped; an idle bank is not touched until a message is queued to it, so the
+cost of a cycle grows with the number of busy banks, not with K. The bus
+statistics are the sums of those of the banks.
+'''
+import bisect
+
+from scheduler import INFINITY
+
+def _total(name):
+    '''return: property summing the counter name of every bank'''
+    return property(lambda self: sum(getattr(bank, name)
+                                     for bank in self.banks),
+                    doc='sum of the banks\' ' + name)
+
+class BankedBus(object):
+    '''Buses interleaved by block address
+
+    banks: list of buses sharing block_size and list_of_cc
+    '''
+    def __init__(self, banks):
+        self.banks = banks
+        self.block_size = banks[0].block_size
+        self.list_of_cc = banks[0].list_of_cc
+        # indexes of the banks with work, in increasing order
+        self.active = []
+
+    total_bytes_passed_on_bus = _total('total_bytes_passed_on_bus')
+    total_num_invalidations = _total('total_num_invalidations')
+    total_num_evictions = _total('total_num_evictions')
+    total_num_transactions = _total('total_num_transactions')
+    # directory homes only
+    total_num_messages = _total('total_num_messages')
+
+    def bank_index(self, address):
+        '''return: index of the bank handling address'''
+        return int(address / self.block_size % len(self.banks))
+
+    def queue_message(self, message):
+        '''enqueue a message to the bank of its address'''
+        index = self.bank_index(message.address)
+        self.banks[index].queue_message(message)
+        active = self.active
+        position = bisect.bisect_left(active, index)
+        if position == len(active) or active[position] != index:
+            active.insert(position, index)
+
+    def tick(self):
+        '''Emulates a clock tick of every busy bank, in bank order
+
+        A bank that was idle when the tick began, and gets a message during
+        it, e.g. a BusWB following a fill, starts at the next tick.
+        '''
+        banks = self.banks
+        for index in list(self.active):
+            banks[index].tick()
+        self.active = [index for index in self.active
+                       if banks[index].idle_cycles() != INFINITY]
+
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which no bank does real work
+
+        return: 0 if the next tick does real work; INFINITY if every bank is
+                idle.
+        '''
+        banks = self.banks
+        cycles = INFINITY
+        for index in self.active:
+            cycles = min(cycles, banks[index].idle_cycles())
+        return cycles
+
+    def skip(self, cycles):
+        '''Apply the given number of idle ticks to every busy bank.
+
+        Must not exceed idle_cycles().
+        '''
+        banks = self.banks
+        for index in self.active:
+            banks[index].skip(cycles)
@@ -0,0 +1,273 @@
+'''Benchmark the simulator itself on pinned synthetic workloads
+
+Every workload is generated from a fixed seed, so a given (workload, size,
+cores) always produces the same binary traces. Each (protocol, workload,
+size) case is simulated in a fresh worker process, and reports
+    instructions per second: trace records simulated per wall-clock second
+    transactions per second: bus messages per wall-clock second
+    peak RSS: maximum resident set size of the worker, in KB
+
+The results can be saved as a baseline JSON file, and later runs compared
+against it: a case regresses when its instruction throughput drops, or its
+peak RSS grows, by more than the tolerance. The exit status is 1 if any case
+regresses.
+
+usage:
+    python bench.py --save-baseline baseline.json
+    python bench.py --baseline baseline.json --sizes small
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import zlib
+
+import scheduler
+import simulator
+from tracefile import write_trace
+
+# trace records per core
+SIZES = {'small': 5000, 'medium': 50000, 'large': 200000}
+
+# every generated trace is seeded from SEED, the workload name and the core
+SEED = 2017
+
+# fraction of records that are non-memory instructions, and their length
+COMPUTE_FRACTION = 0.3
+MAX_COMPUTE_CYCLES = 20
+
+def private(core, num_of_cores, rand):
+    '''Each core streams through its own 64KB array, one store in four'''
+    base = 0x1000000 * (core + 1)
+    offset = 0
+    while True:
+        yield (1 if rand.random() < 0.25 else 0, base + offset)
+        offset = (offset + 4) % 0x10000
+
+def false_sharing(core, num_of_cores, rand):
+    '''Cores update their own word of the same few blocks'''
+    while True:
+        block = rand.randint(0, 15)
+        yield (rand.randint(0, 1), 0x10000 + block * 128 + core * 4)
+
+def producer_consumer(core, num_of_cores, rand):
+    '''Core 0 fills a 4KB ring buffer which every other core reads'''
+    offset = 0
+    while True:
+        yield (1 if core == 0 else 0, 0x20000 + offset)
+        offset = (offset + 4) % 0x1000
+
+def migratory(core, num_of_cores, rand):
+    '''Cores read then write objects picked from a small shared pool'''
+    while True:
+        address = 0x30000 + rand.randint(0, 63) * 16
+        yield (0, address)
+        yield (1, address)
+
+def read_mostly(core, num_of_cores, rand):
+    '''Cores read a 16KB shared table which is rarely written'''
+    while True:
+        op = 1 if rand.random() < 0.05 else 0
+        yield (op, 0x40000 + rand.randint(0, 4095) * 4)
+
+WORKLOADS = {
+    'private': private,
+    'false_sharing': false_sharing,
+    'producer_consumer': producer_consumer,
+    'migratory': migratory,
+    'read_mostly': read_mostly,
+}
+
+def instructions(workload, core, num_of_cores, num_of_records):
+    '''Generate the trace of one core, with compute instructions mixed in
+
+    return: iterator of num_of_records (op, value)
+    '''
+    rand = random.Random(SEED + zlib.crc32(workload) + core)
+    accesses = WORKLOADS[workload](core, num_of_cores, rand)
+    for _ in xrange(num_of_records):
+        if rand.random() < COMPUTE_FRACTION:
+            yield (2, rand.randint(1, MAX_COMPUTE_CYCLES))
+        else:
+            yield next(accesses)
+
+def generate(trace_dir, workload, num_of_records, num_of_cores):
+    '''Write the traces of a workload unless they already exist
+
+    num_of_records: trace records per core, e.g. a value of SIZES
+
+    return: the input_file prefix of the traces, as taken by simulate()
+    '''
+    prefix = os.path.join(trace_dir, '%s_%d_%d' % (workload, num_of_records,
+                                                   num_of_cores))
+    for core, filename in enumerate(simulator.trace_files(prefix,
+                                                          num_of_cores)):
+        if not os.path.exists(filename):
+            # written under a temporary name, so an interrupted run never
+            # leaves a truncated trace behind
+            write_trace(filename + '.tmp',
+                        instructions(workload, core, num_of_cores,
+                                     num_of_records), core)
+            os.rename(filename + '.tmp', filename)
+    return prefix
+
+def case_key(protocol, workload, size):
+    return '/'.join((protocol, workload, size))
+
+def run_case(case):
+    '''Worker: simulate one case, meant to run in a fresh process
+
+    case: (protocol, workload, size, num_of_records, num_of_cores,
+        input_file, options), size being the name of num_of_records
+
+    return: (case key, dictionary of measurements)
+    '''
+    (protocol, workload, size, num_of_records, num_of_cores, input_file,
+     options) = case
+    start_time = time.time()
+    processors, bus = simulator.simulate(protocol, input_file,
+                                         num_of_cores=num_of_cores, **options)
+    seconds = time.time() - start_time
+
+    num_of_instructions = num_of_records * num_of_cores
+    return (case_key(protocol, workload, size), {
+        'seconds': seconds,
+        'instructions': num_of_instructions,
+        'transactions': bus.total_num_transactions,
+        'instructions_per_second': num_of_instructions / seconds,
+        'transactions_per_second': bus.total_num_transactions / seconds,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'cycles': max(processor.cycle_count for processor in processors),
+    })
+
+def benchmark(protocols, workloads, sizes, num_of_cores, trace_dir, repeat=1,
+              **options):
+    '''Run every (protocol, workload, size) case, keeping the fastest of
+    repeat runs
+
+    options: passed on to simulator.simulate(), e.g. cache_size=4096
+
+    return: dictionary of case key: measurements
+    '''
+    cases = []
+    for workload in workloads:
+        for size in sizes:
+            input_file = generate(trace_dir, workload, SIZES[size],
+                                  num_of_cores)
+            for protocol in protocols:
+                cases.append((protocol, workload, size, SIZES[size],
+                              num_of_cores, input_file, options))
+
+    # one case at a time, each in a new process, so that timings do not
+    # compete and peak RSS is measured per case
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    results = {}
+    try:
+        for key, result in pool.imap(run_case, cases * repeat):
+            if (key not in results or result['seconds'] <
+                    results[key]['seconds']):
+                results[key] = result
+    finally:
+        pool.terminate()
+    return results
+
+def compare(results, baseline, tolerance):
+    '''Find the cases slower or bigger than in baseline
+
+    return: list of (case key, measurement, baseline value, new value)
+    '''
+    regressions = []
+    for key in sorted(results):
+        if key not in baseline:
+            continue
+        old, new = baseline[key], results[key]
+        if (new['instructions_per_second'] <
+                old['instructions_per_second'] * (1 - tolerance)):
+            regressions.append((key, 'instructions_per_second',
+                                old['instructions_per_second'],
+                                new['instructions_per_second']))
+        if new['peak_rss_kb'] > old['peak_rss_kb'] * (1 + tolerance):
+            regressions.append((key, 'peak_rss_kb', old['peak_rss_kb'],
+                                new['peak_rss_kb']))
+    return regressions
+
+def print_results(results, baseline=None):
+    print '%-34s %12s %12s %10s %8s' % ('case', 'instr/s', 'bus tx/s',
+                                        'rss KB', 'speedup')
+    for key in sorted(results):
+        result = results[key]
+        speedup = ''
+        if baseline and key in baseline:
+            speedup = '%.2fx' % (result['instructions_per_second'] /
+                                 baseline[key]['instructions_per_second'])
+        print '%-34s %12.0f %12.0f %10d %8s' % (
+            key, result['instructions_per_second'],
+            result['transactions_per_second'], result['peak_rss_kb'],
+            speedup)
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulator benchmark')
+    parser.add_argument('--protocols', nargs='+',
+                        choices=sorted(simulator.PROTOCOLS),
+                        default=sorted(simulator.PROTOCOLS))
+    parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS),
+                        default=sorted(WORKLOADS))
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES),
+                        default=['small', 'medium'])
+    parser.add_argument('--cores', type=int, default=simulator.NUM_OF_CORES)
+    parser.add_argument('--cache-size', type=int, default=4096)
+    parser.add_argument('--assoc', type=int, default=2)
+    parser.add_argument('--block-size', type=int, default=32)
+    parser.add_argument('--engine', choices=sorted(scheduler.ENGINES),
+                        default='event')
+    parser.add_argument('--cache', choices=sorted(simulator.CACHES),
+                        default='array')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per case, the fastest is kept')
+    parser.add_argument('--trace-dir',
+                        default=os.path.join(tempfile.gettempdir(),
+                                             'coherence_bench'),
+                        help='where the generated traces are kept')
+    parser.add_argument('--baseline', help='JSON file to compare against')
+    parser.add_argument('--save-baseline', help='JSON file to write')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed relative slowdown or RSS growth')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.trace_dir):
+        os.makedirs(args.trace_dir)
+    results = benchmark(args.protocols, args.workloads, args.sizes,
+                        args.cores, args.trace_dir, args.repeat,
+                        cache_size=args.cache_size, assoc=args.assoc,
+                        block_size=args.block_size, engine=args.engine,
+                        cache=args.cache)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['cases']
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump({'python': platform.python_implementation() + ' ' +
+                                 platform.python_version(),
+                       'cases': results}, baseline_file, indent=1,
+                      sort_keys=True)
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for key, measurement, old, new in regressions:
+            print 'REGRESSION %s %s: %.0f -> %.0f' % (key, measurement, old,
+                                                       new)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
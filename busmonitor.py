@@ -0,0 +1,167 @@
+'''Time series of bus occupancy, queue depth and transactions
+
+A BusMonitor is told by the scheduler loop, after every bus tick and before
+every skip of idle cycles, for how many cycles the bus stays in its current
+state. It aggregates on the fly into buckets of a fixed number of cycles, so
+memory does not grow with the length of the run. Both engines give the same
+series. The buses of a bankedbus.BankedBus are monitored together.
+
+Per bucket, the columns are
+    cycle: first cycle of the bucket
+    busy_cycles: cycles in which a transfer occupied the bus; with banks,
+        summed over the banks, up to interval * number of banks
+    queue_depth_sum: msg_q length summed over the cycles of the bucket; the
+        mean depth is queue_depth_sum / interval. With banks, the lengths
+        of all msg_q are added up.
+    queue_depth_max: longest msg_q, or total of the banks' msg_q, in the
+        bucket
+    transactions: messages taken off the queue
+    one column per message title (BusRd, BusRdX, ...): messages of that title
+
+The series is written as a NumPy .npz archive: a zip of one .npy file per
+column, of unsigned 64 bit integers. It is built without NumPy, and load()
+reads it back without NumPy too. Finished buckets are spooled to one
+temporary file per column, so only BLOCK_SIZE buckets are kept in memory.
+'''
+import ast
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import zipfile
+from array import array
+
+from message import TITLE_NAMES
+
+# default bucket length in cycles
+DEFAULT_INTERVAL = 10000
+
+# buckets kept in memory before they are appended to the spool files
+BLOCK_SIZE = 4096
+
+FIELDS = (['cycle', 'busy_cycles', 'queue_depth_sum', 'queue_depth_max',
+           'transactions'] + TITLE_NAMES)
+
+# array type of the columns, and its NumPy description
+TYPECODE = 'L'
+DESCR = ('<' if sys.byteorder == 'little' else '>') + \
+    'u%d' % array(TYPECODE).itemsize
+
+NPY_MAGIC = '\x93NUMPY\x01\x00'
+
+class BusMonitor(object):
+    '''Aggregates the state of a bus into buckets of interval cycles'''
+    def __init__(self, bus, filename, interval=DEFAULT_INTERVAL):
+        self.bus = bus
+        self.buses = getattr(bus, 'banks', [bus])
+        self.filename = filename
+        self.interval = interval
+
+        self.cycle = 0 # cycles recorded so far
+        self.bucket = self.new_bucket(0)
+        # per bus, last message counted as a transaction
+        self.last_messages = [None] * len(self.buses)
+
+        self.columns = dict((field, array(TYPECODE)) for field in FIELDS)
+        self.num_of_buckets = 0
+        self.spool_dir = tempfile.mkdtemp(prefix='busmonitor')
+
+    def new_bucket(self, cycle):
+        bucket = dict((field, 0) for field in FIELDS)
+        bucket['cycle'] = cycle
+        return bucket
+
+    def record(self, cycles):
+        '''The bus keeps its current state for the next cycles cycles'''
+        busy = 0
+        depth = 0
+        for index, bus in enumerate(self.buses):
+            message = bus.active_message
+            if message is not None and message is not self.last_messages[index]:
+                self.last_messages[index] = message
+                self.bucket['transactions'] += 1
+                self.bucket[TITLE_NAMES[message.title]] += 1
+            if bus.countdown_memory >= 0:
+                busy += 1
+            depth += len(bus.msg_q)
+        while cycles > 0:
+            bucket = self.bucket
+            cycles_in_bucket = min(cycles,
+                                   bucket['cycle'] + self.interval -
+                                   self.cycle)
+            bucket['busy_cycles'] += busy * cycles_in_bucket
+            bucket['queue_depth_sum'] += depth * cycles_in_bucket
+            if depth > bucket['queue_depth_max']:
+                bucket['queue_depth_max'] = depth
+
+            self.cycle += cycles_in_bucket
+            cycles -= cycles_in_bucket
+            if self.cycle == bucket['cycle'] + self.interval:
+                self.finish_bucket()
+
+    def finish_bucket(self):
+        for field in FIELDS:
+            self.columns[field].append(self.bucket[field])
+        self.num_of_buckets += 1
+        if len(self.columns['cycle']) >= BLOCK_SIZE:
+            self.spool()
+        self.bucket = self.new_bucket(self.cycle)
+
+    def spool(self):
+        '''Append the buckets in memory to the spool files'''
+        for field in FIELDS:
+            with open(os.path.join(self.spool_dir, field), 'ab') as spool:
+                self.columns[field].tofile(spool)
+            self.columns[field] = array(TYPECODE)
+
+    def close(self):
+        '''Write the series, including the last, partial bucket'''
+        if self.cycle > self.bucket['cycle']:
+            self.finish_bucket()
+        self.spool()
+        archive = zipfile.ZipFile(self.filename, 'w', zipfile.ZIP_DEFLATED)
+        try:
+            for field in FIELDS:
+                npy = os.path.join(self.spool_dir, field + '.npy')
+                with open(npy, 'wb') as output:
+                    output.write(npy_header(self.num_of_buckets))
+                    data = os.path.join(self.spool_dir, field)
+                    if os.path.exists(data):
+                        with open(data, 'rb') as column:
+                            shutil.copyfileobj(column, output)
+                archive.write(npy, field + '.npy')
+        finally:
+            archive.close()
+            shutil.rmtree(self.spool_dir)
+
+def npy_header(length):
+    '''return: the .npy version 1.0 header of a column of length values'''
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (
+        DESCR, length)
+    # the header, with its magic and length, is padded to 64 bytes
+    padding = 64 - (len(NPY_MAGIC) + 2 + len(header) + 1) % 64
+    header += ' ' * (padding % 64) + '\n'
+    return NPY_MAGIC + struct.pack('<H', len(header)) + header
+
+def load(filename):
+    '''return: dictionary of column name: array of the series in filename'''
+    series = {}
+    archive = zipfile.ZipFile(filename)
+    try:
+        for name in archive.namelist():
+            data = archive.read(name)
+            if not data.startswith(NPY_MAGIC):
+                raise ValueError(name + ' is not a .npy file')
+            length = struct.unpack_from('<H', data, len(NPY_MAGIC))[0]
+            start = len(NPY_MAGIC) + 2
+            header = ast.literal_eval(data[start:start + length])
+            if header['descr'] != DESCR:
+                raise ValueError(name + ' has unsupported type ' +
+                                 header['descr'])
+            column = array(TYPECODE)
+            column.fromstring(data[start + length:])
+            series[name[:-len('.npy')]] = column
+    finally:
+        archive.close()
+    return series
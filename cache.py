@@ -1,3 +1,7 @@
+from array import array
+
+from replacement import POLICIES
+
 class Cache(object):
     '''
     A cache is a dictionary with set index (int) as key, and a list of
@@ -11,7 +15,11 @@ class Cache(object):
     A byte's address can be disected into 3 parts:
     | tag | set index | offset |
     '''
-    def __init__(self, cache_size, block_size, assoc, default_state):
+    def __init__(self, cache_size, block_size, assoc, default_state,
+                 replacement='lru'):
+        '''replacement: only 'lru', see ArrayCache for the other policies'''
+        if replacement != 'lru':
+            raise ValueError('the list cache only implements LRU replacement')
         self.cache_size = cache_size # number of bytes
         self.block_size = block_size # number of bytes
         self.assoc = assoc
@@ -44,6 +52,17 @@ class Cache(object):
 
         return self.default_state
 
+    def peek(self, address):
+        '''Same as get_state, but leaves the LRU order untouched'''
+        identifier = address / self.block_size
+        index = identifier % self.num_of_sets
+        tag = identifier / self.num_of_sets
+
+        for pair in self.cache.get(index, ()):
+            if tag == pair[0]:
+                return pair[1]
+        return self.default_state
+
     def set_state(self, address, new_state):
         '''Set or update the state of the referenced cache block.
 
@@ -85,3 +104,139 @@ class Cache(object):
                 self.cache[index] = []
                 self.cache[index].append((tag, new_state))
                 return None
+
+class ArrayCache(object):
+    '''
+    Drop-in replacement for Cache backed by preallocated flat arrays.
+
+    Every way of every set owns one slot; the ways of set i are the slots
+    [i*assoc, (i+1)*assoc). Two arrays run in parallel over the slots:
+        tags   - block number (address / block_size) held in the way, or -1
+                 if the way is empty. Keeping the whole block number instead
+                 of only the tag makes the evicted address a single multiply.
+        states - small integer state code, 0 being default_state
+    The replacement policy keeps its own metadata, see replacement.py. With
+    the default LRU policy, touching a block is a single store into an array
+    of ages, instead of reordering a python list. When block_size and the
+    number of sets are powers of two, the address is split with a shift and a
+    mask instead of divisions.
+
+    get_state/set_state follow the same contract as Cache, including the
+    {'address', 'state'} dictionary returned on eviction.
+
+    replacement: a key of replacement.POLICIES
+    '''
+    def __init__(self, cache_size, block_size, assoc, default_state,
+                 replacement='lru'):
+        self.cache_size = cache_size # number of bytes
+        self.block_size = block_size # number of bytes
+        self.assoc = assoc
+        self.num_of_sets = cache_size/block_size/assoc
+        self.word_size = 4 # number of bytes, fixed
+        self.default_state = default_state
+
+        num_of_slots = self.num_of_sets * assoc
+        self.tags = array('l', [-1]) * num_of_slots
+        self.states = array('b', [0]) * num_of_slots
+        self.policy = POLICIES[replacement](self.num_of_sets, assoc)
+
+        # state code <-> state, codes are handed out on first use
+        self.state_names = [default_state]
+        self.state_codes = {default_state: 0}
+
+        '''offset_shift is None unless both block_size and num_of_sets are
+        powers of two'''
+        self.offset_shift = None
+        self.set_mask = None
+        if _is_power_of_two(block_size) and _is_power_of_two(self.num_of_sets):
+            self.offset_shift = block_size.bit_length() - 1
+            self.set_mask = self.num_of_sets - 1
+
+    def get_state(self, address):
+        '''Get the state of the block containing the requested address
+
+        address: int
+
+        return: state. If not found in cache, return default_state.
+        '''
+        if self.offset_shift is not None:
+            identifier = address >> self.offset_shift
+            first = (identifier & self.set_mask) * self.assoc
+        else:
+            identifier = address / self.block_size
+            first = (identifier % self.num_of_sets) * self.assoc
+
+        tags = self.tags
+        for slot in xrange(first, first + self.assoc):
+            if tags[slot] == identifier:
+                self.policy.touch(slot)
+                return self.state_names[self.states[slot]]
+
+        return self.default_state
+
+    def peek(self, address):
+        '''Same as get_state, but leaves the replacement metadata untouched'''
+        identifier = address / self.block_size
+        first = (identifier % self.num_of_sets) * self.assoc
+        for slot in xrange(first, first + self.assoc):
+            if self.tags[slot] == identifier:
+                return self.state_names[self.states[slot]]
+        return self.default_state
+
+    def set_state(self, address, new_state):
+        '''Set or update the state of the referenced cache block.
+
+        Setting a block to default_state frees its way. Inserting into a full
+        set evicts the way chosen by the replacement policy.
+
+        return: None, or {'address', 'state'} of the evicted block
+        '''
+        if self.offset_shift is not None:
+            identifier = address >> self.offset_shift
+            first = (identifier & self.set_mask) * self.assoc
+        else:
+            identifier = address / self.block_size
+            first = (identifier % self.num_of_sets) * self.assoc
+
+        code = self.state_codes.get(new_state)
+        if code is None:
+            code = len(self.state_names)
+            self.state_codes[new_state] = code
+            self.state_names.append(new_state)
+
+        tags = self.tags
+        last = first + self.assoc
+        for slot in xrange(first, last):
+            if tags[slot] == identifier:
+                if code == 0:
+                    tags[slot] = -1
+                    self.states[slot] = 0
+                else:
+                    self.states[slot] = code
+                    self.policy.touch(slot)
+                return None
+
+        # if runs to here, means tag does not exist in the set
+        if code == 0:
+            return None
+
+        # an empty way if there is one, otherwise the policy's victim
+        evicted = None
+        for victim in xrange(first, last):
+            if tags[victim] == -1:
+                break
+        else:
+            victim = self.policy.victim(first, last)
+            evicted = {'address': tags[victim] * self.block_size,
+                       'state': self.state_names[self.states[victim]]}
+        tags[victim] = identifier
+        self.states[victim] = code
+        self.policy.insert(victim)
+        return evicted
+
+def _is_power_of_two(number):
+    '''True if number is a positive power of two'''
+    return number > 0 and (number & (number - 1)) == 0
+
+# cache implementations selectable from the command line
+CACHES = {'list': Cache, 'array': ArrayCache}
@@ -0,0 +1,68 @@
+'''Save and restore the complete state of a running simulation
+
+A checkpoint is a gzip compressed pickle of a system (processors, bus, list
+of cache controllers) taken between two scheduler steps, i.e. with every
+cache, controller counter, processor countdown, trace position, bus queue,
+active message and bus timer. Trace readers pickle as their file name and
+position. Restoring a checkpoint and running it to the end gives results
+identical to those of the uninterrupted run.
+
+Each load() returns an independent copy of the system, so a warmed-up
+checkpoint can be restored many times to fork several measurement runs.
+'''
+import copy_reg
+import cPickle
+import gzip
+import os
+import types
+
+import scheduler
+
+# cPickle cannot pickle bound methods, e.g. the processor callbacks carried
+# by bus messages. They are pickled as their instance and name.
+def _reduce_method(method):
+    return getattr, (method.im_self, method.im_func.__name__)
+
+copy_reg.pickle(types.MethodType, _reduce_method)
+
+def save(filename, system, metadata=None):
+    '''Write a checkpoint of system, replacing filename atomically
+
+    system: (processors, bus, list_of_cc)
+    metadata: anything picklable describing the run, returned by load()
+    '''
+    temp_filename = filename + '.tmp'
+    output = gzip.open(temp_filename, 'wb')
+    try:
+        cPickle.dump((metadata, system), output, cPickle.HIGHEST_PROTOCOL)
+    finally:
+        output.close()
+    # a crash while writing never destroys the previous checkpoint
+    os.rename(temp_filename, filename)
+
+def load(filename):
+    '''return: (metadata, (processors, bus, list_of_cc))'''
+    checkpoint = gzip.open(filename, 'rb')
+    try:
+        return cPickle.load(checkpoint)
+    finally:
+        checkpoint.close()
+
+def current_cycle(processors):
+    '''return: the cycle the system is at, that of its running processors'''
+    return max(processor.cycle_count for processor in processors)
+
+def run(engine, processors, bus, list_of_cc, filename, interval,
+        metadata=None):
+    '''Same as scheduler.run(), saving a checkpoint every interval cycles
+
+    The cycle of every checkpoint is a multiple of interval, or the first
+    step after it when the event engine skips over it.
+    '''
+    system = (processors, bus, list_of_cc)
+    next_checkpoint = (current_cycle(processors) / interval + 1) * interval
+    for _ in scheduler.ENGINES[engine](processors, bus, list_of_cc):
+        if current_cycle(processors) >= next_checkpoint:
+            save(filename, system, metadata)
+            next_checkpoint = ((current_cycle(processors) / interval + 1) *
+                               interval)
@@ -0,0 +1,244 @@
+'''Directory-based coherence, as an alternative to a snooping bus
+
+Blocks are interleaved over home nodes, the banks of a bankedbus.BankedBus
+(or a single home). Each home keeps a directory: per block, a bitvector of
+the cache controllers that may hold it. A request only reaches the sharers
+in its bitvector, never every controller, so the work of a transaction
+grows with the number of sharers rather than the number of cores.
+
+The caches, controllers and protocol tables are those of the snooping
+protocols: a home is the split-transaction bus of the protocol (see
+splitbus.py), whose snoop filter is the Directory. The point-to-point
+messages of a transaction are timed with hop_latency cycles per hop:
+
+    request: the requester's message reaches its home after a hop. The home
+        takes one request per cycle, serialized per block as on a split bus.
+    BusRd: the home forwards the request to a cache that supplies the block
+        and the data goes back to the requester (2 hops plus the cache-cache
+        latency), or replies with the block from memory (memory latency plus
+        a hop). Other sharers are not contacted.
+    BusRdX, BusUpgr, BusUpd: every other sharer gets an invalidation or
+        update and acknowledges it to the requester (2 hops), in parallel
+        with the data.
+    BusWB: the home writes the block to memory, there is no reply.
+
+A BusUpgr or BusUpd completes when its home handles it, as on the buses.
+The directory learns of dirty evictions through BusWB only, so silently
+evicted clean blocks stay in the bitvectors and are still invalidated.
+After a BusRdX or BusUpgr, the bitvector holds the requester, and any
+sharer the protocol left a copy to (MSIu does with two concurrent BusUpgr).
+
+total_num_messages counts the point-to-point messages of each home.
+'''
+import heapq
+import logging
+
+from message import BUSREAD, BUSREADX, BUSWB, BUSUPGR
+from snoopfilter import SnoopFilter
+from splitbus import SplitTransactionBus, MAX_OUTSTANDING
+import dragon
+import mesi
+import moesi
+import msi
+import msiu
+
+# default latency in cycles of a message between two nodes
+HOP_LATENCY = 10
+
+# set by instrumentation.enable_debug_logging()
+DEBUG = False
+
+# titles that invalidate the other sharers of the block
+EXCLUSIVE_TITLES = (BUSREADX, BUSUPGR)
+
+class Directory(SnoopFilter):
+    '''Sharer bitvectors of the blocks of one home
+
+    Bit N of a bitvector is the Nth controller of the home's list_of_cc.
+
+    verify: if True, every request checks that no controller outside the
+        bitvector holds the block
+    '''
+    def __init__(self, home, verify=False):
+        super(Directory, self).__init__(home, verify)
+        self.sharers = {} # block number: bitvector
+        self.controllers = [] # controller of each bit
+        self.last_targets = [] # sharers reached by the last request
+
+    def targets(self, message):
+        '''Sharers to send message to, and record the sender as sharer
+
+        return: list of cache controllers other than the sender in the
+                block's bitvector, in bus order
+        '''
+        list_of_cc = self.bus.list_of_cc
+        if len(self.active) != len(list_of_cc):
+            # controllers only ever leave, when their core finishes
+            if not self.controllers:
+                self.controllers = list(list_of_cc)
+                self.order = dict((c, i) for i, c in enumerate(list_of_cc))
+            self.active = set(list_of_cc)
+
+        sender = message.sender
+        block = message.address / self.block_size
+        sharers = self.sharers.get(block, 0)
+        targets = []
+        remaining = sharers
+        while remaining:
+            lowest = remaining & -remaining
+            remaining ^= lowest
+            cache_controller = self.controllers[lowest.bit_length() - 1]
+            if (cache_controller is not sender and
+                    cache_controller in self.active):
+                targets.append(cache_controller)
+        if self.verify:
+            self.check(message, targets)
+
+        self.sharers[block] = sharers | 1 << self.order[sender]
+        self.last_targets = targets
+        return targets
+
+    def invalidated(self, message):
+        '''After the sharers snooped a BusRdX/BusUpgr, keep in the block's
+        bitvector the requester and the sharers still holding it'''
+        sharers = 1 << self.order[message.sender]
+        for cache_controller in self.last_targets:
+            cache = cache_controller.cache
+            if cache.peek(message.address) != cache.default_state:
+                sharers |= 1 << self.order[cache_controller]
+        self.sharers[message.address / self.block_size] = sharers
+
+    def writeback(self, message):
+        '''Drop the sender of a BusWB from the block's bitvector'''
+        block = message.address / self.block_size
+        cache = message.sender.cache
+        if (block in self.sharers and
+                cache.peek(message.address) == cache.default_state):
+            self.sharers[block] &= ~(1 << self.order[message.sender])
+            if not self.sharers[block]:
+                del self.sharers[block]
+
+class DirectoryHome(SplitTransactionBus):
+    '''Mixin turning the bus class of a protocol into a home node
+
+    Listed before the bus class in the bases of a home class.
+    '''
+    def __init__(self, block_size, list_of_cc,
+                 max_outstanding=MAX_OUTSTANDING, hop_latency=HOP_LATENCY):
+        super(DirectoryHome, self).__init__(block_size, list_of_cc,
+                                            max_outstanding)
+        self.hop_latency = hop_latency
+        # heap of (cycle of arrival at the home, number, message)
+        self.arriving = []
+        self.num_arrived = 0
+        self.total_num_messages = 0
+
+    def queue_message(self, message):
+        '''send a request to the home, it arrives after a hop'''
+        heapq.heappush(self.arriving, (self.cycle + self.hop_latency,
+                                       self.num_arrived, message))
+        self.num_arrived += 1
+
+    def tick(self):
+        '''Emulates a clock tick: every response that is ready, then one
+        request that arrived'''
+        cycle = self.cycle
+        self.cycle += 1
+        outstanding = self.outstanding
+
+        while outstanding and outstanding[0][0] <= cycle:
+            _, _, message = heapq.heappop(outstanding)
+            self.pending_blocks.remove(message.address / self.block_size)
+            if message.title != BUSWB:
+                if DEBUG:
+                    logging.debug(message)
+                message.sender.receive_bus_message(message)
+
+        arriving = self.arriving
+        while arriving and arriving[0][0] <= cycle:
+            self.msg_q.append(heapq.heappop(arriving)[2])
+
+        if len(outstanding) < self.max_outstanding:
+            message = self.next_request()
+            if message is not None:
+                self.msg_q.remove(message)
+                self.issue(message, cycle)
+
+        self.countdown_memory = 0 if outstanding else -1
+        return # method exit point 1, default exit point
+
+    def issue(self, message, cycle):
+        '''The home handles message: it reaches the sharers, and unless it
+        completes at once, stays in flight until its last reply arrives
+        '''
+        self.active_message = message
+        self.countdown_memory = -1
+        self.countdown_cache = -1
+        directory = self.snoop_filter
+        directory.last_targets = []
+        self.start_transaction()
+
+        hop = self.hop_latency
+        num_of_targets = len(directory.last_targets)
+        title = message.title
+        if title in EXCLUSIVE_TITLES:
+            directory.invalidated(message)
+        self.total_num_messages += 1 # the request
+        if title != BUSREAD:
+            # invalidations or updates, and their acknowledgements
+            self.total_num_messages += 2 * num_of_targets
+
+        if self.countdown_cache >= 0:
+            latency = 2 * hop + self.countdown_cache + 1
+            if title == BUSREAD:
+                self.total_num_messages += 2 # forward, and data
+        elif self.countdown_memory >= 0:
+            latency = self.countdown_memory + 1
+            if title != BUSWB:
+                latency += hop
+                self.total_num_messages += 1 # data
+        else:
+            return # method exit point 1, completed at the home
+        if title != BUSREAD and num_of_targets:
+            latency = max(latency, 2 * hop)
+        self.countdown_cache = -1
+        heapq.heappush(self.outstanding,
+                       (cycle + latency, self.num_issued, message))
+        self.num_issued += 1
+        self.pending_blocks.add(message.address / self.block_size)
+        return # method exit point 2
+
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which the home would do nothing
+
+        return: 0 if the next tick does real work; INFINITY if nothing is in
+                flight, arriving or queued.
+        '''
+        cycles = super(DirectoryHome, self).idle_cycles()
+        if self.arriving:
+            cycles = min(cycles, max(0, self.arriving[0][0] - self.cycle))
+        return cycles
+
+class HomeMSI(DirectoryHome, msi.BusMSI):
+    '''Directory home node for MSI protocol'''
+
+class HomeMSIu(DirectoryHome, msiu.BusMSIu):
+    '''Directory home node for MSI protocol with BusUpgr'''
+
+class HomeMESI(DirectoryHome, mesi.BusMESI):
+    '''Directory home node for MESI protocol'''
+
+class HomeMOESI(DirectoryHome, moesi.BusMOESI):
+    '''Directory home node for MOESI protocol'''
+
+class HomeDragon(DirectoryHome, dragon.BusDragon):
+    '''Directory home node for Dragon protocol'''
+
+# bus class of a protocol: its home node
+HOMES = {
+    msi.BusMSI: HomeMSI,
+    msiu.BusMSIu: HomeMSIu,
+    mesi.BusMESI: HomeMESI,
+    moesi.BusMOESI: HomeMOESI,
+    dragon.BusDragon: HomeDragon,
+}
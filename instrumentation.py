@@ -0,0 +1,149 @@
+'''Opt-in profiling of the simulator's components, and debug logging
+
+A Profiler replaces the methods listed in hooks() by timing wrappers while it
+is installed, and puts the originals back when uninstalled. Nothing is
+wrapped unless a profiler is installed, so a normal run pays nothing.
+
+Each wrapper counts the calls of its component and accumulates their time,
+both inclusive and exclusive of the other wrapped components it calls.
+Components may be split by a key, e.g. controller messages by title. The
+profile is a flat table sorted by exclusive time.
+
+The hot path only calls logging.debug() after enable_debug_logging().
+'''
+import functools
+import logging
+import time
+from collections import defaultdict
+
+from message import TITLE_NAMES
+
+def _access_key(cache_controller, event, address, pr_callback):
+    return ('PrRd', 'PrWr')[event]
+
+def _message_key(cache_controller, message):
+    if message.sender is cache_controller:
+        return TITLE_NAMES[message.title] + ' completion'
+    return TITLE_NAMES[message.title] + ' snoop'
+
+def hooks():
+    '''return: list of (owner, attribute, component name, key function or
+               None) of the methods and functions to profile
+    '''
+    import bankedbus
+    import cache
+    import directory
+    import processor
+    import protocol
+    import scheduler
+    import simulator
+    import snoopfilter
+    import splitbus
+
+    targets = [
+        (processor.Processor, 'tick', 'processor.tick', None),
+        (processor.NonBlockingProcessor, 'tick', 'processor.tick', None),
+        (processor.Processor, 'load_chunk', 'trace.decode', None),
+        (processor.Processor, 'idle_cycles', 'processor.idle_cycles', None),
+        (protocol.CacheController, 'access', 'controller.access',
+         _access_key),
+        (protocol.CacheController, 'receive_bus_message',
+         'controller.receive', _message_key),
+        (snoopfilter.SnoopFilter, 'targets', 'snoopfilter.targets', None),
+        (scheduler, 'drain', 'scheduler.drain', None),
+    ]
+    for Cache in set(cache.CACHES.values()):
+        for method in ['get_state', 'set_state', 'peek']:
+            targets.append((Cache, method, 'cache.' + method, None))
+    for Bus, _, _ in set(simulator.PROTOCOLS.values()):
+        targets.append((Bus, 'tick', 'bus.tick', None))
+        targets.append((Bus, 'idle_cycles', 'bus.idle_cycles', None))
+    for Bus in [splitbus.SplitTransactionBus, directory.DirectoryHome,
+                bankedbus.BankedBus]:
+        targets.append((Bus, 'tick', 'bus.tick', None))
+        targets.append((Bus, 'idle_cycles', 'bus.idle_cycles', None))
+    return targets
+
+class Profiler(object):
+    '''Call counts and time of the simulator's components'''
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.calls = defaultdict(int)
+        self.inclusive = defaultdict(float)
+        self.exclusive = defaultdict(float)
+        # time spent in wrapped callees, one entry per active wrapper
+        self.stack = []
+        self.originals = []
+
+    def wrap(self, name, function, key=None):
+        '''return: function, timed under name, or name + ' ' + key(*args)'''
+        calls = self.calls
+        inclusive = self.inclusive
+        exclusive = self.exclusive
+        stack = self.stack
+        clock = self.clock
+
+        @functools.wraps(function)
+        def wrapper(*args):
+            label = name if key is None else name + ' ' + key(*args)
+            stack.append(0.0)
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                elapsed = clock() - start
+                callees = stack.pop()
+                calls[label] += 1
+                inclusive[label] += elapsed
+                exclusive[label] += elapsed - callees
+                if stack:
+                    stack[-1] += elapsed
+        return wrapper
+
+    def install(self, targets=None):
+        '''Wrap targets, by default hooks()'''
+        for owner, attribute, name, key in targets or hooks():
+            # the attribute is looked up where it is defined, so that an
+            # inherited method is wrapped only once
+            if isinstance(owner, type):
+                defined = [c for c in owner.__mro__ if attribute in vars(c)]
+                owner = defined[0]
+            original = vars(owner)[attribute]
+            if any(o is owner and a == attribute
+                   for o, a, _ in self.originals):
+                continue
+            self.originals.append((owner, attribute, original))
+            setattr(owner, attribute, self.wrap(name, original, key))
+
+    def uninstall(self):
+        '''Put the original methods back'''
+        for owner, attribute, original in reversed(self.originals):
+            setattr(owner, attribute, original)
+        self.originals = []
+
+    def report(self, output):
+        '''Write the flat profile to a file object'''
+        total = sum(self.exclusive.values()) or 1.0
+        output.write('%-40s %10s %10s %10s %6s\n' % (
+            'component', 'calls', 'self s', 'total s', 'self%'))
+        for label in sorted(self.exclusive, key=self.exclusive.get,
+                            reverse=True):
+            output.write('%-40s %10d %10.3f %10.3f %6.1f\n' % (
+                label, self.calls[label], self.exclusive[label],
+                self.inclusive[label], 100 * self.exclusive[label] / total))
+
+def enable_debug_logging():
+    '''Log every instruction and bus transfer at DEBUG level'''
+    import directory
+    import dragon
+    import mesi
+    import moesi
+    import msi
+    import msiu
+    import processor
+    import splitbus
+
+    for module in [processor, msi, msiu, mesi, moesi, dragon, splitbus,
+                   directory]:
+        module.DEBUG = True
+    logging.getLogger().setLevel(logging.DEBUG)
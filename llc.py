@@ -0,0 +1,165 @@
+'''A shared last-level cache between the bus and main memory
+
+Without it, every block transfer that involves memory (a fill no cache
+supplies, the update of memory by a flush, a BusWB) takes the MEM_LATENCY of
+the protocol. With a SharedCache, the bus asks it instead, at the end of
+start_transaction():
+
+    fill from memory: a hit takes hit_latency cycles, a miss the lookup plus
+        the memory latency.
+    flush or BusWB: the block is written into the LLC, in hit_latency
+        cycles, and reaches memory only when the LLC evicts it dirty.
+    fill supplied by another cache: the timing is the bus', the LLC only
+        records the block.
+BusUpgr and BusUpd transfer no block and do not reach the LLC.
+
+The LLC is split into num_of_banks banks interleaved by block address, each
+a cache.Cache (or ArrayCache) of cache_size / num_of_banks bytes, holding
+blocks CLEAN or DIRTY. One SharedCache serves every bank of a
+bankedbus.BankedBus. Its policy is one of:
+
+    inclusive: fills from memory allocate in the LLC. When the LLC evicts a
+        block, every private copy is invalidated (back-invalidation), and
+        written to memory if it was dirty.
+    non-inclusive: fills allocate in the LLC, evictions leave the private
+        caches alone.
+    exclusive: the LLC is a victim cache of the private caches. Fills, and
+        flushes, bypass it, and a hit moves the block to the requester,
+        writing it to memory if it was dirty, as the protocols have no clean
+        state to hand a dirty block over in. Clean blocks are evicted
+        silently by the private caches, so only BusWB fills it.
+
+A fill still in flight on a split bus when its block is back-invalidated
+completes afterwards: the private copy is outside the LLC until evicted.
+'''
+from message import BUSWB
+
+# block states in the LLC, 0 being invalid
+CLEAN = 1
+DIRTY = 2
+
+# --llc-policy choices
+INCLUSIVE = 'inclusive'
+NON_INCLUSIVE = 'non-inclusive'
+EXCLUSIVE = 'exclusive'
+POLICIES = [INCLUSIVE, NON_INCLUSIVE, EXCLUSIVE]
+
+# default hit latency in cycles
+HIT_LATENCY = 20
+
+class SharedCache(object):
+    '''Shared last-level cache of the controllers in list_of_cc
+
+    Cache: class of the banks, cache.Cache or cache.ArrayCache
+    replacement: replacement policy of the banks, a key of
+        replacement.POLICIES
+    '''
+    def __init__(self, Cache, cache_size, block_size, assoc, list_of_cc,
+                 num_of_banks=1, hit_latency=HIT_LATENCY, policy=INCLUSIVE,
+                 replacement='lru'):
+        if policy not in POLICIES:
+            raise ValueError('unknown LLC policy ' + str(policy))
+        self.block_size = block_size
+        self.list_of_cc = list_of_cc
+        self.hit_latency = hit_latency
+        self.policy = policy
+        self.banks = [Cache(cache_size / num_of_banks, block_size, assoc, 0,
+                            replacement)
+                      for _ in range(num_of_banks)]
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_reads = 0
+        self.memory_writes = 0
+        # private copies invalidated by inclusive evictions
+        self.back_invalidations = 0
+
+    def reset_statistics(self):
+        '''Zero the statistics, e.g. after a warm-up'''
+        self.hits = 0
+        self.misses = 0
+        self.memory_reads = 0
+        self.memory_writes = 0
+        self.back_invalidations = 0
+
+    def locate(self, address):
+        '''return: (bank, address of the block within the bank)
+
+        The banks hold the blocks with block / num_of_banks as their block
+        number, so that interleaving leaves all their sets in use.
+        '''
+        block = address / self.block_size
+        num_of_banks = len(self.banks)
+        return (self.banks[block % num_of_banks],
+                block / num_of_banks * self.block_size)
+
+    def transfer(self, bus):
+        '''Time the memory side of the active message of bus, which set its
+        countdown timers as if there were no LLC'''
+        message = bus.active_message
+        if bus.countdown_memory < 0:
+            return # method exit point 1, BusUpgr/BusUpd
+        address = message.address
+        bank, local = self.locate(address)
+        hit_countdown = self.hit_latency - 1
+
+        if bus.countdown_cache >= 0:
+            if self.policy == EXCLUSIVE:
+                # the block stays private, a flush goes on to memory
+                if bus.countdown_memory > bus.countdown_cache:
+                    self.memory_writes += 1
+            elif bus.countdown_memory > bus.countdown_cache:
+                # the flush updates the LLC instead of memory
+                self.fill(bank, local, address, DIRTY)
+                bus.countdown_memory = max(bus.countdown_cache, hit_countdown)
+            else:
+                self.fill(bank, local, address, CLEAN)
+            return # method exit point 2
+
+        if message.title == BUSWB:
+            self.fill(bank, local, address, DIRTY)
+            bus.countdown_memory = hit_countdown
+            return # method exit point 3
+
+        state = bank.get_state(local)
+        if state:
+            self.hits += 1
+            bus.countdown_memory = hit_countdown
+            if self.policy == EXCLUSIVE:
+                bank.set_state(local, 0)
+                if state == DIRTY:
+                    self.memory_writes += 1
+            return # method exit point 4
+
+        self.misses += 1
+        self.memory_reads += 1
+        bus.countdown_memory = hit_countdown + bus.MEM_COUNTDOWN + 1
+        if self.policy != EXCLUSIVE:
+            self.fill(bank, local, address, CLEAN)
+        return # method exit point 5, default exit point
+
+    def fill(self, bank, local, address, state):
+        '''Write a block into its bank, and evict a victim if needed'''
+        if state == CLEAN and bank.peek(local) == DIRTY:
+            state = DIRTY
+        evicted = bank.set_state(local, state)
+        if evicted is None:
+            return
+
+        # address of the victim outside the bank
+        num_of_banks = len(self.banks)
+        victim = ((evicted['address'] / self.block_size * num_of_banks +
+                   address / self.block_size % num_of_banks) *
+                  self.block_size)
+        dirty = evicted['state'] == DIRTY
+        if self.policy == INCLUSIVE:
+            for cache_controller in self.list_of_cc:
+                cache = cache_controller.cache
+                copy = cache.peek(victim)
+                if copy != cache.default_state:
+                    self.back_invalidations += 1
+                    dirty = (dirty or
+                             copy in cache_controller.protocol.dirty_states)
+                    cache.set_state(victim, cache.default_state)
+        if dirty:
+            self.memory_writes += 1
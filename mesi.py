@@ -6,160 +6,57 @@ general guideline for cache and bus design:
 '''
 import logging
 from collections import deque
+from message import BUSREAD, BUSREADX, BUSWB
+from scheduler import INFINITY
+from protocol import Protocol, CacheController, ANY, PRRD, PRWR, HIT, MISS, \
+    PRIVATE_ACCESS, SHARED_ACCESS
 
 
 # latency in cycles to access main memory
 MEM_LATENCY = 100
 
-# possible states
-INVALID = 'invalid'
-SHARED = 'shared'
-EXCLUSIVE = 'exclusive'
-MODIFIED = 'modified'
-
-# message titles
-BUSREAD = 'BusRd'
-BUSREADX = 'BusRdX'
-BUSWB = 'BusWB'
-'''message format
-a dictionary of values
-{title: BUSREAD/BUSREADX/BUSWB,
- sender: the cache controller instance that initiated this message,
- address: the memory address the cache controller wishes to operate on,
- [share status: True/False, whether the cache block is shared among
-        caches, applicable only to BusRead message returned to original sender.
-        This attribute is only added by bus, not upon message construction],
- [callback: callback method for bus to inform cache controller that the tass
-           is done]}
-'''
-
-def construct_message(title, sender, address, callback=None):
-    '''helper function to construct a message'''
-    return {'title': title, 'sender':sender,
-            'address': address, 'callback':callback}
-
-class CacheControllerMESI(object):
-    '''Emulate the cache controller for MESI protocol
-
-    general guideline for sending message to bus:
-        If the message is induced by a processor action, i.e. prwr/prrd, it is
-        queued to bus.
-        If the message is induced by a bus action, i.e. receve_bus_message, it
-        is reduced.
-    '''
-    def __init__(self, bus, cache):
-        self.bus = bus
-        self.cache = cache
-
-        self.hit_count = 0
-        self.miss_count = 0
-        self.private_data_access_count = 0
-        self.shared_data_access_count = 0
-
-    def prrd(self, address, pr_callback):
-        '''respond to processor's PrRd call
-
-        pr_callback: processor's callback function
-        '''
-        current_state = self.cache.get_state(address)
-        if current_state == INVALID:
-            self.miss_count += 1
-            logging.debug('miss')
-            # share/private data stats for BusRd is done in receive_bus_message
-            message = construct_message(BUSREAD, self, address,
-                                        pr_callback)
-            self.bus.queue_message(message)
-            return # method exit point 1
-        elif current_state == SHARED:
-            self.hit_count += 1
-            logging.debug('hit')
-            self.shared_data_access_count += 1
-        elif current_state in (EXCLUSIVE, MODIFIED):
-            self.hit_count += 1
-            logging.debug('hit')
-            self.private_data_access_count += 1
-
-        pr_callback() # call back processor
-        return # method exit point 2
-
-    def prwr(self, address, pr_callback):
-        '''respond to processor's PrWr call'''
-        current_state = self.cache.get_state(address)
-        logging.debug('state:' + current_state)
-        if current_state in (INVALID, SHARED):
-            self.miss_count += 1
-            logging.debug('miss')
-            self.private_data_access_count += 1
-            message = construct_message(BUSREADX, self, address,
-                                        pr_callback)
-            self.bus.queue_message(message)
-            return # method exit point 1
-        elif current_state == EXCLUSIVE:
-            self.cache.set_state(address, MODIFIED)
-            self.hit_count += 1
-            logging.debug('hit')
-            self.private_data_access_count += 1
-        elif current_state == MODIFIED:
-            self.hit_count += 1
-            logging.debug('hit')
-            self.private_data_access_count += 1
-
-        pr_callback() # call back processor
-        return # method exit point 2
-
-    def receive_bus_message(self, message):
-        '''Handles message propagated by bus
-
-        return one of the below:
-            None
-            BusWB
-            (BusBW, is_shared)
-        '''
-        if message['sender'] == self:
-            evicted = None
-            if message['title'] == BUSREAD:
-                if message['share status']: # the block is shared
-                    evicted = self.cache.set_state(message['address'], SHARED)
-                    self.shared_data_access_count += 1
-                else: # the block is not in any other cache
-                    evicted = self.cache.set_state(message['address'], EXCLUSIVE)
-                    self.private_data_access_count += 1
-            elif message['title'] == BUSREADX:
-                evicted = self.cache.set_state(message['address'], MODIFIED)
-
-            if (evicted) and (evicted['state'] == MODIFIED):
-                new_message = construct_message(BUSWB, self, evicted['address'])
-                self.bus.queue_message(new_message)
-
-            message['callback']()
-            return None # method exit point 1
+# set by instrumentation.enable_debug_logging()
+DEBUG = False
 
-        # if the message is from other cache controllers
-        mystate = self.cache.get_state(message['address'])
-        if message['title'] == BUSREAD: # need to respond with flush and share status
-            new_message = None
-            is_shared = True
-            if mystate in (MODIFIED, EXCLUSIVE): # needs to flush and set share status
-                self.cache.set_state(message['address'], SHARED)
-                new_message = construct_message(BUSWB, self, message['address'])
-                is_shared = True
-            elif mystate == SHARED: # needs to set share status to True
-                new_message = None
-                is_shared = True
-            elif mystate == INVALID: # needs to set share status to False
-                new_message = None
-                is_shared = False
-            return (new_message, is_shared) # method exit point 2
-        elif message['title'] == BUSREADX:
-            if mystate in (MODIFIED, EXCLUSIVE):
-                self.cache.set_state(message['address'], INVALID)
-                new_message = construct_message(BUSWB, self, message['address'])
-                return new_message # method exit point 3
-            # SHARED and INVALID will goto the default return, return None
-            elif mystate == SHARED:
-                self.cache.set_state(message['address'], INVALID)
-
-        return None # method exit point 4, default return None
+# possible states
+INVALID = 0
+SHARED = 1
+EXCLUSIVE = 2
+MODIFIED = 3
+
+PROTOCOL = Protocol(
+    'mesi', ['invalid', 'shared', 'exclusive', 'modified'],
+    dirty_states=[MODIFIED],
+    processor={
+        # share/private data stats for BusRd is done on completion
+        (INVALID, PRRD): (None, BUSREAD, MISS),
+        (SHARED, PRRD): (None, None, HIT | SHARED_ACCESS),
+        (EXCLUSIVE, PRRD): (None, None, HIT | PRIVATE_ACCESS),
+        (MODIFIED, PRRD): (None, None, HIT | PRIVATE_ACCESS),
+        (INVALID, PRWR): (None, BUSREADX, MISS | PRIVATE_ACCESS),
+        (SHARED, PRWR): (None, BUSREADX, MISS | PRIVATE_ACCESS),
+        (EXCLUSIVE, PRWR): (MODIFIED, None, HIT | PRIVATE_ACCESS),
+        (MODIFIED, PRWR): (None, None, HIT | PRIVATE_ACCESS),
+    },
+    completion={
+        (BUSREAD, ANY, True): (SHARED, None, SHARED_ACCESS),
+        (BUSREAD, ANY, False): (EXCLUSIVE, None, PRIVATE_ACCESS),
+        (BUSREADX, ANY, ANY): (MODIFIED, None, 0),
+    },
+    # BusRd is answered with (flush, is_shared), BusRdX with flush
+    snoop={
+        (MODIFIED, BUSREAD): (SHARED, (True, True)),
+        (EXCLUSIVE, BUSREAD): (SHARED, (True, True)),
+        (SHARED, BUSREAD): (None, (None, True)),
+        (INVALID, BUSREAD): (None, (None, False)),
+        (MODIFIED, BUSREADX): (INVALID, True),
+        (EXCLUSIVE, BUSREADX): (INVALID, True),
+        (SHARED, BUSREADX): (INVALID, None),
+    })
+
+class CacheControllerMESI(CacheController):
+    '''Emulate the cache controller for MESI protocol'''
+    protocol = PROTOCOL
 
 class BusMESI(object):
     '''Emulate the bus line for MSI protocol
@@ -182,11 +79,17 @@ class BusMESI(object):
         self.countdown_memory = -1
         self.countdown_cache = -1
         self.active_message = None
+        # optional snoop_filter.SnoopFilter, snoop every controller if None
+        self.snoop_filter = None
+        # optional llc.SharedCache between the bus and memory
+        self.llc = None
 
         self.total_bytes_passed_on_bus = 0
         # count the number of BusRdX appeared on bus
         self.total_num_invalidations = 0
         self.total_num_evictions = 0
+        # count every message taken off the queue
+        self.total_num_transactions = 0
 
     def tick(self):
         '''Emulates a clock tick'''
@@ -198,7 +101,9 @@ class BusMESI(object):
                     countdown_cache timer can be set. So it is guranteed that
                     BusWB won't be sent back to cache controllers.
                     '''
-                    self.active_message['sender'].receive_bus_message(
+                    if DEBUG:
+                        logging.debug(self.active_message)
+                    self.active_message.sender.receive_bus_message(
                         self.active_message)
                     # clear variable once the message is sent back
                     self.active_message = None
@@ -212,8 +117,10 @@ class BusMESI(object):
             if self.countdown_memory == 0:
                 # if active_message is not None and not BusWB
                 if ((self.active_message) and
-                        (self.active_message['title'] != BUSWB)):
-                    self.active_message['sender'].receive_bus_message(
+                        (self.active_message.title != BUSWB)):
+                    if DEBUG:
+                        logging.debug(self.active_message)
+                    self.active_message.sender.receive_bus_message(
                         self.active_message)
                 self.active_message = None # this statement is actually not necessary?
 
@@ -226,48 +133,89 @@ class BusMESI(object):
 
         if self.msg_q:
             self.active_message = self.msg_q.popleft()
+            self.start_transaction()
 
-            # increment analysis stats
-            self.total_bytes_passed_on_bus += self.block_size
-            if self.active_message['title'] == BUSREADX:
-                self.total_num_invalidations += 1
-
-            if self.active_message['title'] == BUSREAD:
-                sender = self.active_message['sender']
-                other_cc = {c for c in self.list_of_cc if c not in [sender]}
-                is_shared = False
-                '''A cache with the requested address in Modified state would
-                flush the block. The returned messag will contain [share status]'''
-                for cache_controller in other_cc:
-                    returned = cache_controller.receive_bus_message(self.active_message)
-                    if returned[0]:
-                        self.countdown_cache = self.CACHE_COUNTDOWN
-                        is_shared = True
-                        break
-                    is_shared = is_shared or returned[1]
-                self.active_message['share status'] = is_shared
+        return # method exit point 4, default exit point
 
-                self.countdown_memory = self.MEM_COUNTDOWN
-            elif self.active_message['title'] == BUSREADX:
-                sender = self.active_message['sender']
-                other_cc = {c for c in self.list_of_cc if c not in [sender]}
-                flush = None
-                '''A cache with the requested address in Modified state would
-                flush the block. Otherwise flush is None'''
-                for cache_controller in other_cc:
-                    flush = cache_controller.receive_bus_message(self.active_message)
-                    if flush:
-                        break
-                if flush:
+    def start_transaction(self):
+        '''Put active_message on the bus: count it, snoop the other
+        controllers, and set the countdown timers of its transfer'''
+        # increment analysis stats
+        self.total_num_transactions += 1
+        self.total_bytes_passed_on_bus += self.block_size
+        if self.active_message.title == BUSREADX:
+            self.total_num_invalidations += 1
+
+        if self.active_message.title == BUSREAD:
+            sender = self.active_message.sender
+            if self.snoop_filter:
+                other_cc = self.snoop_filter.targets(self.active_message)
+            else:
+                other_cc = [c for c in self.list_of_cc if c is not sender]
+            is_shared = False
+            '''A cache with the requested address in Modified state would
+            flush the block. The returned tuple is (flush, share status)'''
+            for cache_controller in other_cc:
+                returned = cache_controller.receive_bus_message(self.active_message)
+                if returned[0]:
                     self.countdown_cache = self.CACHE_COUNTDOWN
-                self.countdown_memory = self.MEM_COUNTDOWN
-            elif self.active_message['title'] == BUSWB:
-                self.total_num_evictions += 1
-                self.countdown_memory = self.MEM_COUNTDOWN
-
-        return # method exit point 4, default exit point
+                    is_shared = True
+                    break
+                is_shared = is_shared or returned[1]
+            self.active_message.share_status = is_shared
+
+            self.countdown_memory = self.MEM_COUNTDOWN
+        elif self.active_message.title == BUSREADX:
+            sender = self.active_message.sender
+            if self.snoop_filter:
+                other_cc = self.snoop_filter.targets(self.active_message)
+            else:
+                other_cc = [c for c in self.list_of_cc if c is not sender]
+            flush = None
+            '''A cache with the requested address in Modified state would
+            flush the block. Otherwise flush is None'''
+            for cache_controller in other_cc:
+                flush = cache_controller.receive_bus_message(self.active_message)
+                if flush:
+                    break
+            if flush:
+                self.countdown_cache = self.CACHE_COUNTDOWN
+            self.countdown_memory = self.MEM_COUNTDOWN
+        elif self.active_message.title == BUSWB:
+            if self.snoop_filter:
+                self.snoop_filter.writeback(self.active_message)
+            self.total_num_evictions += 1
+            self.countdown_memory = self.MEM_COUNTDOWN
+
+        if self.llc:
+            self.llc.transfer(self)
 
     def queue_message(self, message):
         '''enqueue a message'''
         self.msg_q.append(message)
 
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which the bus would only decrement its
+        countdown timers.
+
+        return: 0 if the next tick does real work; INFINITY if the bus is free
+                and nothing is queued.
+        '''
+        if self.countdown_memory >= 0:
+            if self.countdown_cache >= 0:
+                return min(self.countdown_cache, self.countdown_memory)
+            return self.countdown_memory
+        if self.msg_q:
+            return 0
+        return INFINITY
+
+    def skip(self, cycles):
+        '''Apply the given number of idle ticks at once.
+
+        Must not exceed idle_cycles().
+        '''
+        if self.countdown_memory >= 0:
+            self.countdown_memory -= cycles
+            if self.countdown_cache >= 0:
+                self.countdown_cache -= cycles
+
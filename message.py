@@ -0,0 +1,42 @@
+'''This module contains the message type carried by the buses of every protocol
+
+Message titles are small integers rather than strings, so the bus and the
+cache controllers dispatch on integer comparisons.
+'''
+
+# message titles
+BUSREAD = 0
+BUSREADX = 1
+BUSWB = 2
+BUSUPGR = 3
+BUSUPD = 4
+
+# printable title of each message title
+TITLE_NAMES = ['BusRd', 'BusRdX', 'BusWB', 'BusUpgr', 'BusUpd']
+
+class BusMessage(object):
+    '''A bus transaction
+
+    title: BUSREAD/BUSREADX/BUSWB/BUSUPGR/BUSUPD
+    sender: the cache controller instance that initiated this message
+    address: the memory address the cache controller wishes to operate on
+    callback: callback method for bus to inform cache controller that the
+        task is done
+    share_status: [MESI/Dragon] True/False, whether the cache block is shared
+        among caches. Only set by the bus, None until then.
+    from_prwr: True/False, set by the cache controller to decide what to do
+        when the message comes back. None on BUSWB.
+    '''
+    __slots__ = ('title', 'sender', 'address', 'callback', 'share_status',
+                 'from_prwr')
+
+    def __init__(self, title, sender, address, callback=None):
+        self.title = title
+        self.sender = sender
+        self.address = address
+        self.callback = callback
+        self.share_status = None
+        self.from_prwr = None
+
+    def __repr__(self):
+        return '<%s %#x>' % (TITLE_NAMES[self.title], self.address)
@@ -0,0 +1,241 @@
+'''This module contains Bus class and Cache Controller for MOESI protocol
+
+MOESI adds an Owned state to MESI: a Modified block that is read by another
+cache becomes Owned instead of being written back. The owner supplies the
+block to later readers, cache to cache, and writes it back when evicted.
+A transfer supplied by a cache holds the bus for the cache-cache latency
+only, memory is not involved.
+
+general guideline for cache and bus design:
+    Bus and cc when interpreting messages should be state-less. Any state
+    information should be explicitly carried in the message.
+'''
+import logging
+from collections import deque
+from message import BUSREAD, BUSREADX, BUSWB
+from scheduler import INFINITY
+from protocol import Protocol, CacheController, ANY, PRRD, PRWR, HIT, MISS, \
+    PRIVATE_ACCESS, SHARED_ACCESS
+
+
+# latency in cycles to access main memory
+MEM_LATENCY = 100
+
+# set by instrumentation.enable_debug_logging()
+DEBUG = False
+
+# possible states
+INVALID = 0
+SHARED = 1
+EXCLUSIVE = 2
+OWNED = 3
+MODIFIED = 4
+
+PROTOCOL = Protocol(
+    'moesi', ['invalid', 'shared', 'exclusive', 'owned', 'modified'],
+    dirty_states=[OWNED, MODIFIED],
+    processor={
+        # share/private data stats for BusRd is done on completion
+        (INVALID, PRRD): (None, BUSREAD, MISS),
+        (SHARED, PRRD): (None, None, HIT | SHARED_ACCESS),
+        (EXCLUSIVE, PRRD): (None, None, HIT | PRIVATE_ACCESS),
+        (OWNED, PRRD): (None, None, HIT | SHARED_ACCESS),
+        (MODIFIED, PRRD): (None, None, HIT | PRIVATE_ACCESS),
+        (INVALID, PRWR): (None, BUSREADX, MISS | PRIVATE_ACCESS),
+        (SHARED, PRWR): (None, BUSREADX, MISS | PRIVATE_ACCESS),
+        (EXCLUSIVE, PRWR): (MODIFIED, None, HIT | PRIVATE_ACCESS),
+        (OWNED, PRWR): (None, BUSREADX, MISS | PRIVATE_ACCESS),
+        (MODIFIED, PRWR): (None, None, HIT | PRIVATE_ACCESS),
+    },
+    completion={
+        (BUSREAD, ANY, True): (SHARED, None, SHARED_ACCESS),
+        (BUSREAD, ANY, False): (EXCLUSIVE, None, PRIVATE_ACCESS),
+        (BUSREADX, ANY, ANY): (MODIFIED, None, 0),
+    },
+    # BusRd is answered with (flush, is_shared), BusRdX with flush
+    snoop={
+        (MODIFIED, BUSREAD): (OWNED, (True, True)),
+        (OWNED, BUSREAD): (None, (True, True)),
+        (EXCLUSIVE, BUSREAD): (SHARED, (True, True)),
+        (SHARED, BUSREAD): (None, (None, True)),
+        (INVALID, BUSREAD): (None, (None, False)),
+        (MODIFIED, BUSREADX): (INVALID, True),
+        (OWNED, BUSREADX): (INVALID, True),
+        (EXCLUSIVE, BUSREADX): (INVALID, True),
+        (SHARED, BUSREADX): (INVALID, None),
+    })
+
+class CacheControllerMOESI(CacheController):
+    '''Emulate the cache controller for MOESI protocol'''
+    protocol = PROTOCOL
+
+class BusMOESI(object):
+    '''Emulate the bus line for MOESI protocol
+
+    The bus uses a deque as its message queue:
+        enqueue is msg_q.append()
+        dequeue is msg_q.popleft()
+    '''
+    def __init__(self, block_size, list_of_cc):
+        '''list_of_cc: the list of cache controllers(cc)'''
+        self.CACHE_COUNTDOWN = block_size-1 # cache-cache data transfer countdown
+        self.MEM_COUNTDOWN = MEM_LATENCY-1
+        self.block_size = block_size
+        self.msg_q = deque()
+        self.list_of_cc = list_of_cc
+
+        '''default value of countdown timers is -1, indicating the bus is not
+        stalled.
+        '''
+        self.countdown_memory = -1
+        self.countdown_cache = -1
+        self.active_message = None
+        # optional snoop_filter.SnoopFilter, snoop every controller if None
+        self.snoop_filter = None
+        # optional llc.SharedCache between the bus and memory
+        self.llc = None
+
+        self.total_bytes_passed_on_bus = 0
+        # count the number of BusRdX appeared on bus
+        self.total_num_invalidations = 0
+        self.total_num_evictions = 0
+        # count every message taken off the queue
+        self.total_num_transactions = 0
+
+    def tick(self):
+        '''Emulates a clock tick'''
+        if self.countdown_memory >= 0:
+            if self.countdown_cache >= 0:
+                # if cache-cache transfer is done
+                if self.countdown_cache == 0:
+                    '''only when active_message is BusRd/BusRdX, the
+                    countdown_cache timer can be set. So it is guranteed that
+                    BusWB won't be sent back to cache controllers.
+                    '''
+                    if DEBUG:
+                        logging.debug(self.active_message)
+                    self.active_message.sender.receive_bus_message(
+                        self.active_message)
+                    # clear variable once the message is sent back
+                    self.active_message = None
+                    # decrement the countdown timers before return
+                    self.countdown_cache -= 1
+                    self.countdown_memory -= 1
+                    return # method exit point 1
+                self.countdown_cache -= 1
+
+            # if memory transfer is done
+            if self.countdown_memory == 0:
+                # if active_message is not None and not BusWB
+                if ((self.active_message) and
+                        (self.active_message.title != BUSWB)):
+                    if DEBUG:
+                        logging.debug(self.active_message)
+                    self.active_message.sender.receive_bus_message(
+                        self.active_message)
+                self.active_message = None # this statement is actually not necessary?
+
+                '''when block_size > mem_latency,cache countdown should be reset
+                here to avoid bleeding into next active_message's countdown!
+                '''
+                self.countdown_cache = -1
+            self.countdown_memory -= 1
+            return # method exit point 2
+
+        if self.msg_q:
+            self.active_message = self.msg_q.popleft()
+            self.start_transaction()
+
+        return # method exit point 4, default exit point
+
+    def start_transaction(self):
+        '''Put active_message on the bus: count it, snoop the other
+        controllers, and set the countdown timers of its transfer'''
+        # increment analysis stats
+        self.total_num_transactions += 1
+        self.total_bytes_passed_on_bus += self.block_size
+        if self.active_message.title == BUSREADX:
+            self.total_num_invalidations += 1
+
+        if self.active_message.title == BUSREAD:
+            sender = self.active_message.sender
+            if self.snoop_filter:
+                other_cc = self.snoop_filter.targets(self.active_message)
+            else:
+                other_cc = [c for c in self.list_of_cc if c is not sender]
+            is_shared = False
+            '''A cache with the requested address in Modified, Owned or
+            Exclusive state supplies the block. The returned tuple is
+            (flush, share status)'''
+            for cache_controller in other_cc:
+                returned = cache_controller.receive_bus_message(self.active_message)
+                if returned[0]:
+                    self.countdown_cache = self.CACHE_COUNTDOWN
+                    is_shared = True
+                    break
+                is_shared = is_shared or returned[1]
+            self.active_message.share_status = is_shared
+
+            '''memory is not updated by a cache-cache transfer, the owner
+            keeps the dirty block'''
+            if self.countdown_cache >= 0:
+                self.countdown_memory = self.CACHE_COUNTDOWN
+            else:
+                self.countdown_memory = self.MEM_COUNTDOWN
+        elif self.active_message.title == BUSREADX:
+            sender = self.active_message.sender
+            if self.snoop_filter:
+                other_cc = self.snoop_filter.targets(self.active_message)
+            else:
+                other_cc = [c for c in self.list_of_cc if c is not sender]
+            flush = None
+            '''A cache with the requested address in Modified, Owned or
+            Exclusive state supplies the block. Every controller is
+            snooped, as Shared copies may exist besides an Owned one'''
+            for cache_controller in other_cc:
+                flush = (cache_controller.receive_bus_message(self.active_message)
+                         or flush)
+            if flush:
+                # the dirty block moves to the requester, Modified
+                self.countdown_cache = self.CACHE_COUNTDOWN
+                self.countdown_memory = self.CACHE_COUNTDOWN
+            else:
+                self.countdown_memory = self.MEM_COUNTDOWN
+        elif self.active_message.title == BUSWB:
+            if self.snoop_filter:
+                self.snoop_filter.writeback(self.active_message)
+            self.total_num_evictions += 1
+            self.countdown_memory = self.MEM_COUNTDOWN
+
+        if self.llc:
+            self.llc.transfer(self)
+
+    def queue_message(self, message):
+        '''enqueue a message'''
+        self.msg_q.append(message)
+
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which the bus would only decrement its
+        countdown timers.
+
+        return: 0 if the next tick does real work; INFINITY if the bus is free
+                and nothing is queued.
+        '''
+        if self.countdown_memory >= 0:
+            if self.countdown_cache >= 0:
+                return min(self.countdown_cache, self.countdown_memory)
+            return self.countdown_memory
+        if self.msg_q:
+            return 0
+        return INFINITY
+
+    def skip(self, cycles):
+        '''Apply the given number of idle ticks at once.
+
+        Must not exceed idle_cycles().
+        '''
+        if self.countdown_memory >= 0:
+            self.countdown_memory -= cycles
+            if self.countdown_cache >= 0:
+                self.countdown_cache -= cycles
+
@@ -0,0 +1,385 @@
+'''Miss ratio curves of the private caches by stack distance analysis
+
+A single pass over the trace of a core gives the miss ratio of an LRU cache
+of every size (Mattson et al., 1970). The stack distance of a reference is
+the number of distinct blocks referenced since the last reference to its
+block; the reference hits in a fully associative LRU cache of C blocks iff
+its distance is below C, and in an A-way cache of S sets iff its distance
+counted within its set (the blocks b with b % S equal) is below A. First
+references always miss.
+
+Distances are counted with a Fenwick tree over reference slots, in
+O(log n) per reference. The tree is compacted whenever its slots run out,
+so its memory follows the number of distinct blocks, not the trace length.
+
+The miss ratios are those of a core running alone: invalidations by other
+cores are not modelled, see simulator.py for those. Every miss ratio of one
+(sets, associativity) matches that of a cache.ArrayCache with LRU
+replacement over the same references.
+
+For very long traces, the references can be sampled by a spatial hash,
+keeping a rate R fraction of the keys and weighting each sampled reference
+1/R. The fully associative curve samples blocks, and scales their distances
+by 1/R (SHARDS, Waldspurger et al., FAST 2015). The set associative curves
+sample sets, whose distances stay exact (set sampling). With max_blocks, a
+curve lowers its threshold whenever it tracks more blocks, so memory stays
+bounded whatever the trace length and footprint.
+
+usage:
+    python mrc.py <input_file> <block_size> [--sizes ...] [--assocs ...]
+It reads <input_file>_N.data of every core, like simulator.py.
+'''
+import argparse
+import bisect
+import csv
+import heapq
+import sys
+import time
+from array import array
+from collections import defaultdict
+
+import simulator
+from tracefile import open_trace
+
+# initial number of slots of a StackDistance, and fewest after compaction
+INITIAL_CAPACITY = 1 << 12
+MIN_CAPACITY = 16
+
+# blocks are sampled by a hash in [0, HASH_RANGE)
+HASH_BITS = 24
+HASH_RANGE = 1 << HASH_BITS
+
+def spatial_hash(block):
+    '''return: pseudo-random hash of a block number in [0, HASH_RANGE)'''
+    return ((block * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> \
+        (64 - HASH_BITS)
+
+class StackDistance(object):
+    '''LRU stack distances of a stream of blocks
+
+    Slot t of the Fenwick tree is 1 if the reference in slot t is the last
+    one to its block so far, so the distance of a reference is the number of
+    ones after the slot of the previous reference to its block.
+    '''
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.tree = array('l', [0]) * (capacity + 1)
+        self.last = {} # block: slot of its last reference
+        self.clock = 0 # slot of the next reference
+
+    def reference(self, block):
+        '''Record a reference to block
+
+        return: its stack distance, or None on the first reference
+        '''
+        if self.clock == len(self.tree) - 1:
+            self.compact()
+        last = self.last
+        slot = last.get(block)
+        distance = None
+        if slot is not None:
+            distance = len(last) - self.prefix(slot)
+            self.add(slot, -1)
+        self.add(self.clock, 1)
+        last[block] = self.clock
+        self.clock += 1
+        return distance
+
+    def forget(self, block):
+        '''Stop tracking block, as if it had never been referenced'''
+        self.add(self.last.pop(block), -1)
+
+    def add(self, slot, value):
+        tree = self.tree
+        size = len(tree)
+        index = slot + 1
+        while index < size:
+            tree[index] += value
+            index += index & -index
+
+    def prefix(self, slot):
+        '''return: number of ones in slots 0 to slot'''
+        tree = self.tree
+        total = 0
+        index = slot + 1
+        while index:
+            total += tree[index]
+            index &= index - 1
+        return total
+
+    def compact(self):
+        '''Renumber the last references 0, 1, ... in order, in a tree with
+        room for as many more'''
+        order = sorted(self.last, key=self.last.get)
+        capacity = max(MIN_CAPACITY, 2 * len(order))
+        tree = array('l', [0]) * (capacity + 1)
+        # the ones in the first slots, summed up the tree in a single pass
+        for index in xrange(1, capacity + 1):
+            if index <= len(order):
+                tree[index] += 1
+            parent = index + (index & -index)
+            if parent <= capacity:
+                tree[parent] += tree[index]
+        self.tree = tree
+        self.last = dict((block, slot) for slot, block in enumerate(order))
+        self.clock = len(order)
+
+class SampledHistogram(object):
+    '''Histogram of the stack distances of the sampled references
+
+    A reference is sampled if the spatial hash of its key (block or set) is
+    below the threshold, and weighs the inverse of the fraction of keys
+    sampled. The misses are divided by the number of references, not by the
+    weight of those sampled, which corrects for hot keys being over or under
+    sampled (SHARDS_adj). Subclasses track the sampled keys, and forget()
+    them when the threshold is lowered below their hash.
+
+    rate: fraction of the keys sampled, 1.0 for exact histograms
+    max_blocks: if not None, most blocks tracked at once, lowering the
+        threshold as needed
+    '''
+    def __init__(self, rate=1.0, max_blocks=None):
+        self.threshold = int(rate * HASH_RANGE)
+        self.max_blocks = max_blocks
+        self.sampling = self.threshold < HASH_RANGE or max_blocks is not None
+        self.sampled = [] # heap of (-hash, key) of the tracked keys
+        self.scale = 1.0 # weight of a sampled reference
+        if self.sampling:
+            self.rescale()
+
+        # distance: weight of the references at that distance
+        self.histogram = defaultdict(float)
+        self.cold = 0.0 # weight of the first references
+        self.num_of_references = 0
+
+    def weight(self, key):
+        '''return: weight of a reference to key, 0.0 if not sampled'''
+        if not self.sampling:
+            return 1.0
+        if spatial_hash(key) >= self.threshold:
+            return 0.0
+        return self.scale
+
+    def sampled_fraction(self):
+        '''return: expected fraction of the keys below the threshold'''
+        return self.threshold / float(HASH_RANGE)
+
+    def rescale(self):
+        '''Weigh the sampled references after a change of threshold'''
+        fraction = self.sampled_fraction()
+        self.scale = 1.0 / fraction if fraction else 0.0
+
+    def track(self, key):
+        '''Record a newly sampled key'''
+        if self.max_blocks is not None:
+            heapq.heappush(self.sampled, (-spatial_hash(key), key))
+
+    def bound(self, num_of_blocks):
+        '''Lower the threshold if more than max_blocks blocks are tracked
+
+        Called for every newly tracked block, so dropping the keys of the
+        largest hash is enough.
+
+        num_of_blocks: number of blocks tracked
+        '''
+        if self.max_blocks is None or num_of_blocks <= self.max_blocks:
+            return
+        # stop sampling the tracked keys of the largest hash
+        self.threshold = -self.sampled[0][0]
+        while self.sampled and -self.sampled[0][0] >= self.threshold:
+            self.forget(heapq.heappop(self.sampled)[1])
+        self.rescale()
+
+    def miss_ratio(self, capacity):
+        '''return: weight of the references at a distance of capacity or
+                   more, or first ones, over the number of references.
+                   None if max_blocks left no key to sample.'''
+        if not self.scale:
+            return None
+        if not self.num_of_references:
+            return 0.0
+        misses = self.cold + sum(weight for distance, weight in
+                                 self.histogram.iteritems()
+                                 if distance >= capacity)
+        return misses / self.num_of_references
+
+class FullyAssociative(SampledHistogram):
+    '''Stack distances among all blocks, SHARDS sampled by block
+
+    A sampled distance counts about rate times the distinct blocks in
+    between, so it is scaled by the weight.
+    '''
+    def __init__(self, rate=1.0, max_blocks=None):
+        super(FullyAssociative, self).__init__(rate, max_blocks)
+        self.stack = StackDistance()
+
+    def reference(self, block):
+        self.num_of_references += 1
+        weight = self.weight(block)
+        if not weight:
+            return
+        distance = self.stack.reference(block)
+        if distance is None:
+            self.cold += weight
+            self.track(block)
+            self.bound(len(self.stack.last))
+        else:
+            self.histogram[int(distance * weight)] += weight
+
+    def forget(self, block):
+        self.stack.forget(block)
+
+class SetAssociative(SampledHistogram):
+    '''Stack distances within each of num_of_sets sets, sampled by set
+
+    Every block of a sampled set is tracked, so its distances are exact, and
+    a sampled reference weighs the exact inverse of the fraction of sets
+    sampled. With few sets, few are sampled and the estimate is coarse; with
+    more than max_blocks blocks per set, none is.
+    '''
+    def __init__(self, num_of_sets, rate=1.0, max_blocks=None):
+        self.num_of_sets = num_of_sets
+        # hash of every set index, in increasing order
+        self.set_hashes = array('l', sorted(spatial_hash(index)
+                                            for index in xrange(num_of_sets)))
+        super(SetAssociative, self).__init__(rate, max_blocks)
+        self.stacks = {} # set index: StackDistance
+        self.num_of_blocks = 0
+
+    def reference(self, block):
+        self.num_of_references += 1
+        index = block % self.num_of_sets
+        weight = self.weight(index)
+        if not weight:
+            return
+        stack = self.stacks.get(index)
+        if stack is None:
+            stack = self.stacks[index] = StackDistance(MIN_CAPACITY)
+            self.track(index)
+        distance = stack.reference(block)
+        if distance is None:
+            self.cold += weight
+            self.num_of_blocks += 1
+            self.bound(self.num_of_blocks)
+        else:
+            self.histogram[distance] += weight
+
+    def sampled_fraction(self):
+        return (bisect.bisect_left(self.set_hashes, self.threshold) /
+                float(self.num_of_sets))
+
+    def forget(self, index):
+        self.num_of_blocks -= len(self.stacks.pop(index).last)
+
+class MissRatioCurves(object):
+    '''Stack distance histograms of the references of one core
+
+    set_counts: numbers of sets of the set associative caches to evaluate,
+        besides the fully associative ones
+    rate, max_blocks: sampling of each histogram, see SampledHistogram
+    '''
+    def __init__(self, block_size, set_counts=(), rate=1.0, max_blocks=None):
+        self.block_size = block_size
+        self.full = FullyAssociative(rate, max_blocks)
+        self.sets = dict((num_of_sets,
+                          SetAssociative(num_of_sets, rate, max_blocks))
+                         for num_of_sets in set_counts)
+        self.num_of_references = 0
+
+    def reference(self, address):
+        '''Record a load or store of address'''
+        self.num_of_references += 1
+        block = address / self.block_size
+        self.full.reference(block)
+        for curve in self.sets.itervalues():
+            curve.reference(block)
+
+    def miss_ratio(self, num_of_blocks, num_of_sets=None):
+        '''Miss ratio of an LRU cache of num_of_blocks blocks
+
+        num_of_sets: None for a fully associative cache, else one of the
+            set_counts, the cache having num_of_blocks / num_of_sets ways
+
+        return: the miss ratio, or None if it could not be sampled
+        '''
+        if num_of_sets is None:
+            return self.full.miss_ratio(num_of_blocks)
+        return self.sets[num_of_sets].miss_ratio(num_of_blocks / num_of_sets)
+
+def analyze(trace, block_size, set_counts=(), rate=1.0, max_blocks=None):
+    '''Read the loads and stores of a trace file name or reader
+
+    return: MissRatioCurves
+    '''
+    if isinstance(trace, basestring):
+        trace = open_trace(trace)
+    curves = MissRatioCurves(block_size, set_counts, rate, max_blocks)
+    reference = curves.reference
+    chunk = trace.next_chunk()
+    while chunk is not None:
+        ops, values = chunk
+        for index in xrange(len(ops)):
+            if ops[index] != 2:
+                reference(values[index])
+        chunk = trace.next_chunk()
+    return curves
+
+def geometries(cache_sizes, assocs, block_size):
+    '''return: list of (cache_size, assoc, number of sets), assoc None for
+               fully associative caches'''
+    result = []
+    for cache_size in cache_sizes:
+        result.append((cache_size, None, None))
+        for assoc in assocs:
+            num_of_sets = cache_size / block_size / assoc
+            if num_of_sets:
+                result.append((cache_size, assoc, num_of_sets))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Per-core LRU miss ratio curves of a set of traces')
+    parser.add_argument('input_file')
+    parser.add_argument('block_size', type=int)
+    parser.add_argument('--cores', type=int, default=simulator.NUM_OF_CORES)
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[1024, 8092, 32768],
+                        help='cache sizes in bytes')
+    parser.add_argument('--assocs', nargs='+', type=int, default=[1, 2, 4],
+                        help='associativities, besides fully associative')
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help='SHARDS sampling rate, 1.0 for exact curves')
+    parser.add_argument('--max-blocks', type=int, metavar='N',
+                        help='track at most N blocks per core, lowering the '
+                             'sampling rate as needed')
+    parser.add_argument('--output', help='CSV file, default standard output')
+    args = parser.parse_args()
+    if not 0 < args.rate <= 1:
+        parser.error('--rate must be in (0, 1]')
+    if args.max_blocks is not None and args.max_blocks < 1:
+        parser.error('--max-blocks must be at least 1')
+
+    start_time = time.time()
+    configs = geometries(args.sizes, args.assocs, args.block_size)
+    set_counts = set(num_of_sets for _, _, num_of_sets in configs
+                     if num_of_sets)
+    output = open(args.output, 'wb') if args.output else sys.stdout
+    writer = csv.writer(output)
+    writer.writerow(['core', 'cache_size', 'assoc', 'block_size',
+                     'miss_ratio', 'references'])
+    for core, trace in enumerate(simulator.trace_files(args.input_file,
+                                                       args.cores)):
+        curves = analyze(trace, args.block_size, set_counts, args.rate,
+                         args.max_blocks)
+        for cache_size, assoc, num_of_sets in configs:
+            writer.writerow([core, cache_size, assoc or 'full',
+                             args.block_size,
+                             curves.miss_ratio(cache_size / args.block_size,
+                                               num_of_sets),
+                             curves.num_of_references])
+    if args.output:
+        output.close()
+    print >> sys.stderr, ('time used in seconds: ' +
+                          str(time.time() - start_time))
+
+if __name__ == '__main__':
+    main()
@@ -1,166 +1,50 @@
 '''This module contains Bus class and Cache Controller for MSI protocol
 '''
 from collections import deque
+from message import BUSREAD, BUSREADX, BUSWB, BUSUPGR
+from scheduler import INFINITY
+from protocol import Protocol, CacheController, ANY, PRRD, PRWR, HIT, MISS, \
+    PRIVATE_ACCESS, SHARED_ACCESS
 import logging
 
+# logging.debug() is only called from the hot path when True, see
+# instrumentation.enable_debug_logging()
+DEBUG = False
+
 # latency in cycles to access main memory
 MEM_LATENCY = 100
 
 # possible states
-INVALID = 'invalid'
-SHARED = 'shared'
-MODIFIED = 'modified'
-
-# message titles
-BUSREAD = 'BusRd'
-BUSREADX = 'BusRdX'
-BUSWB = 'BusWB'
-BUSUPGR = 'BusUpgr'
-'''message format
-a dictionary of values
-{title: BUSREAD/BUSREADX/BUSWB,
- sender: the cache controller instance,
- address: the memory address the cache controller wishes to operate on,
- [new state: the target state the memory block]
- [callback: callback method for bus to inform cache controller that the tass
-           is done]}
-'''
-
-def construct_message(title, sender, address, new_state=None, callback=None):
-    '''helper function to construct a message'''
-    return {'title': title, 'sender':sender,
-            'address': address, 'new state': new_state,
-            'callback':callback}
-
-class CacheControllerMSIu(object):
-    '''Emulate the cache controller for MSI protocol
-
-    general guideline for sending message to bus:
-        If the message is induced by a processor action, i.e. prwr/prrd, it is
-        queued to bus.
-        If the message is induced by a bus action, i.e. receve_bus_message, it
-        is reduced.
-    '''
-    def __init__(self, bus, cache):
-        self.bus = bus
-        self.cache = cache
-
-        self.hit_count = 0
-        self.miss_count = 0
-        self.private_data_access_count = 0
-        self.shared_data_access_count = 0
-
-    def prrd(self, address, pr_callback):
-        '''respond to processor's PrRd call
-
-        pr_callback: processor's callback function
-        '''
-        current_state = self.cache.get_state(address)
-        if current_state == INVALID:
-            self.miss_count += 1
-            self.shared_data_access_count += 1
-            message = construct_message(BUSREAD, self, address, SHARED,
-                                        pr_callback)
-            self.bus.queue_message(message)
-            return # method exit point 1
-        elif current_state == SHARED:
-            self.hit_count += 1
-            self.shared_data_access_count += 1
-        elif current_state == MODIFIED:
-            self.hit_count += 1
-            self.private_data_access_count += 1
-
-        pr_callback() # call back processor
-        return # method exit point 2
-
-    def prwr(self, address, pr_callback):
-        '''respond to processor's PrWr call'''
-        current_state = self.cache.get_state(address)
-        if current_state == INVALID:
-            self.miss_count += 1
-            self.private_data_access_count += 1
-            message = construct_message(BUSREADX, self, address, MODIFIED,
-                                        pr_callback)
-            self.bus.queue_message(message)
-            return # method exit point 1
-        elif current_state == SHARED:
-            self.hit_count += 1
-            self.private_data_access_count += 1
-            message = construct_message(BUSUPGR, self, address, MODIFIED,
-                                        pr_callback)
-            self.bus.queue_message(message)
-            return # method exit point 2
-        elif current_state == MODIFIED:
-            self.hit_count += 1
-            self.private_data_access_count += 1
-
-        pr_callback() # call back processor
-        return # method exit point 3
-
-    def receive_bus_message(self, message):
-        '''Handles message propagated by bus
-
-        By contract:
-        Three types of message can appear on the bus and propagate to cache
-        controllers: BusRd, BusRdX, BusWB.
-        The bus sends back BusRd/BusRdX messages to the original sender to
-        indicate successful data transfer. The cache controller does not need to
-        know the source of this data.
-
-        The bus does not propagate BusWB to cache controllers. Instead, when the
-        flushed write back data needs to be sent back to a controller, the bus
-        sends back the BusRd or BusRdX message to signal the cache controller
-        that the data is ready.
-
-        BusWB incurred due to the cache controller's own message (i.e. evistion)
-        is enqueued to bus. In contrast, BusWB incurred due to other cache
-        controllers' message is returned by the function. This is in accordance
-        with the "general guideline for sending message to bus" in the class
-        docstring.
-
-        Upon receiving the message, the cache controller needs to do some or all
-        of the following where applicable:
-        - update cache line state
-        - callback processor
-        - flush line, if there is evicted line and it is in M state
-
-        return:
-            None
-            True - indicating the referred address is flushed
-        '''
-        if message['sender'] == self:
-            evicted = self.cache.set_state(message['address'],
-                                           message['new state'])
-            if (evicted) and (evicted['state'] == MODIFIED):
-                new_message = construct_message(BUSWB, self, evicted['address'])
-                self.bus.queue_message(new_message)
-            message['callback']() # processor callback
-            return None # method exit point 1
-
-        # if the message is from other cache controllers
-        mystate = self.cache.get_state(message['address'])
-        if message['title'] == BUSREAD:
-            if mystate == MODIFIED:
-                self.cache.set_state(message['address'], SHARED)
-                #new_message = construct_message(BUSWB, self, message['address'])
-                return True # method exit point 2
-        elif message['title'] == BUSREADX:
-            if mystate == SHARED:
-                self.cache.set_state(message['address'], INVALID)
-                return None # method exit point 3
-            elif mystate == MODIFIED:
-                self.cache.set_state(message['address'], INVALID)
-                # new_message = construct_message(BUSWB, self, message['address'])
-                return True # method exit point 4
-        elif message['title'] == BUSUPGR:
-            '''If the cache controller receives a BusUpgr, the referred block
-            can only be in SHARED or INVALID state
-            '''
-            if mystate == SHARED:
-                self.cache.set_state(message['address'], INVALID)
-                return None # method exit point 3
-
-        return None # method exit point 5, default return None. Should never reach here.
+INVALID = 0
+SHARED = 1
+MODIFIED = 2
+
+PROTOCOL = Protocol(
+    'msiu', ['invalid', 'shared', 'modified'], dirty_states=[MODIFIED],
+    processor={
+        (INVALID, PRRD): (None, BUSREAD, MISS | SHARED_ACCESS),
+        (SHARED, PRRD): (None, None, HIT | SHARED_ACCESS),
+        (MODIFIED, PRRD): (None, None, HIT | PRIVATE_ACCESS),
+        (INVALID, PRWR): (None, BUSREADX, MISS | PRIVATE_ACCESS),
+        (SHARED, PRWR): (None, BUSUPGR, HIT | PRIVATE_ACCESS),
+        (MODIFIED, PRWR): (None, None, HIT | PRIVATE_ACCESS),
+    },
+    completion={
+        (BUSREAD, ANY, ANY): (SHARED, None, 0),
+        (BUSREADX, ANY, ANY): (MODIFIED, None, 0),
+        (BUSUPGR, ANY, ANY): (MODIFIED, None, 0),
+    },
+    # True - indicating the referred address is flushed
+    snoop={
+        (MODIFIED, BUSREAD): (SHARED, True),
+        (SHARED, BUSREADX): (INVALID, None),
+        (MODIFIED, BUSREADX): (INVALID, True),
+        (SHARED, BUSUPGR): (INVALID, None),
+    })
+
+class CacheControllerMSIu(CacheController):
+    '''Emulate the cache controller for MSI protocol with BusUpgr'''
+    protocol = PROTOCOL
 
 class BusMSIu(object):
     '''Emulate the bus line for MSI protocol
@@ -183,10 +67,17 @@ class BusMSIu(object):
         self.countdown_memory = -1
         self.countdown_cache = -1
         self.active_message = None
+        # optional snoop_filter.SnoopFilter, snoop every controller if None
+        self.snoop_filter = None
+        # optional llc.SharedCache between the bus and memory
+        self.llc = None
 
         self.total_bytes_passed_on_bus = 0
         # count the number of BusRdX appeared on bus
         self.total_num_invalidations = 0
+        self.total_num_evictions = 0
+        # count every message taken off the queue
+        self.total_num_transactions = 0
 
     def tick(self):
         '''Emulates a clock tick'''
@@ -198,8 +89,9 @@ class BusMSIu(object):
                     countdown_cache timer can be set. So it is guranteed that
                     BusWB won't be sent back to cache controllers.
                     '''
-                    logging.debug(self.active_message)
-                    self.active_message['sender'].receive_bus_message(
+                    if DEBUG:
+                        logging.debug(self.active_message)
+                    self.active_message.sender.receive_bus_message(
                         self.active_message)
                     # clear variable once the message is sent back
                     self.active_message = None
@@ -213,8 +105,10 @@ class BusMSIu(object):
             if self.countdown_memory == 0:
                 # if active_message is not None and not BusWB
                 if ((self.active_message) and
-                        (self.active_message['title'] != BUSWB)):
-                    self.active_message['sender'].receive_bus_message(
+                        (self.active_message.title != BUSWB)):
+                    if DEBUG:
+                        logging.debug(self.active_message)
+                    self.active_message.sender.receive_bus_message(
                         self.active_message)
                 self.active_message = None # this statement is actually not necessary?
 
@@ -227,40 +121,82 @@ class BusMSIu(object):
 
         if self.msg_q:
             self.active_message = self.msg_q.popleft()
+            self.start_transaction()
 
-            # increment analysis stats
-            if self.active_message['title'] != BUSUPGR:
-                self.total_bytes_passed_on_bus += self.block_size
-            if self.active_message['title'] in (BUSREADX, BUSUPGR):
-                self.total_num_invalidations += 1
+        return # method exit point 4, default exit point
 
-            if ((self.active_message['title'] == BUSREAD) or
-                    (self.active_message['title'] == BUSREADX)):
-                sender = self.active_message['sender']
-                other_cc = {c for c in self.list_of_cc if c not in [sender]}
-                flush = None
-                '''A cache with the requested address in Modified state would
-                flush the block. Otherwise flush is None'''
-                for cache_controller in other_cc:
-                    flush = cache_controller.receive_bus_message(self.active_message)
-                    if flush:
-                        break
+    def start_transaction(self):
+        '''Put active_message on the bus: count it, snoop the other
+        controllers, and set the countdown timers of its transfer'''
+        # increment analysis stats
+        self.total_num_transactions += 1
+        if self.active_message.title != BUSUPGR:
+            self.total_bytes_passed_on_bus += self.block_size
+        if self.active_message.title in (BUSREADX, BUSUPGR):
+            self.total_num_invalidations += 1
+
+        if ((self.active_message.title == BUSREAD) or
+                (self.active_message.title == BUSREADX)):
+            sender = self.active_message.sender
+            if self.snoop_filter:
+                other_cc = self.snoop_filter.targets(self.active_message)
+            else:
+                other_cc = [c for c in self.list_of_cc if c is not sender]
+            flush = None
+            '''A cache with the requested address in Modified state would
+            flush the block. Otherwise flush is None'''
+            for cache_controller in other_cc:
+                flush = cache_controller.receive_bus_message(self.active_message)
                 if flush:
-                    self.countdown_cache = self.CACHE_COUNTDOWN
-                self.countdown_memory = self.MEM_COUNTDOWN
-            elif self.active_message['title'] == BUSUPGR:
-                sender = self.active_message['sender']
-                other_cc = {c for c in self.list_of_cc if c not in [sender]}
-                '''A cache with the requested address in Modified state would
-                flush the block. Otherwise flush is None'''
-                for cache_controller in other_cc:
-                    cache_controller.receive_bus_message(self.active_message)
-                sender.receive_bus_message(self.active_message)
-            elif self.active_message['title'] == BUSWB:
-                self.countdown_memory = self.MEM_COUNTDOWN
-
-        return # method exit point 4, default exit point
+                    break
+            if flush:
+                self.countdown_cache = self.CACHE_COUNTDOWN
+            self.countdown_memory = self.MEM_COUNTDOWN
+        elif self.active_message.title == BUSUPGR:
+            sender = self.active_message.sender
+            if self.snoop_filter:
+                other_cc = self.snoop_filter.targets(self.active_message)
+            else:
+                other_cc = [c for c in self.list_of_cc if c is not sender]
+            '''A cache with the requested address in Modified state would
+            flush the block. Otherwise flush is None'''
+            for cache_controller in other_cc:
+                cache_controller.receive_bus_message(self.active_message)
+            sender.receive_bus_message(self.active_message)
+        elif self.active_message.title == BUSWB:
+            if self.snoop_filter:
+                self.snoop_filter.writeback(self.active_message)
+            self.total_num_evictions += 1
+            self.countdown_memory = self.MEM_COUNTDOWN
+
+        if self.llc:
+            self.llc.transfer(self)
 
     def queue_message(self, message):
         '''enqueue a message'''
         self.msg_q.append(message)
+
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which the bus would only decrement its
+        countdown timers.
+
+        return: 0 if the next tick does real work; INFINITY if the bus is free
+                and nothing is queued.
+        '''
+        if self.countdown_memory >= 0:
+            if self.countdown_cache >= 0:
+                return min(self.countdown_cache, self.countdown_memory)
+            return self.countdown_memory
+        if self.msg_q:
+            return 0
+        return INFINITY
+
+    def skip(self, cycles):
+        '''Apply the given number of idle ticks at once.
+
+        Must not exceed idle_cycles().
+        '''
+        if self.countdown_memory >= 0:
+            self.countdown_memory -= cycles
+            if self.countdown_cache >= 0:
+                self.countdown_cache -= cycles
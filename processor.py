@@ -1,12 +1,27 @@
+import functools
 import logging
+from scheduler import INFINITY
+from tracefile import open_trace
+
+# logging.debug() is only called from the hot path when True, see
+# instrumentation.enable_debug_logging()
+DEBUG = False
 
 class Processor(object):
     '''Emulate a processor core'''
 
-    def __init__(self, filename, cache_controller):
-        self.file = open(filename, 'r')
+    def __init__(self, trace, cache_controller):
+        '''trace: trace file name, or a reader with next_chunk()'''
+        if isinstance(trace, basestring):
+            trace = open_trace(trace)
+        self.trace = trace
         self.cache_controller = cache_controller
 
+        # the chunk being executed, and the index of the next instruction
+        self.ops = ()
+        self.values = ()
+        self.index = 0
+
         self.is_stalled = False
         self.count_down_cycle = 0
 
@@ -35,28 +50,62 @@ class Processor(object):
         if self.is_stalled:
             return True
 
-        nextline = self.file.readline()
-        logging.debug(nextline[0:-1])
-        # print nextline
-        if nextline == '':
-            self.is_finished = True
-            return False
+        index = self.index
+        if index >= len(self.ops):
+            if not self.load_chunk():
+                self.is_finished = True
+                return False
+            index = 0
+        op = self.ops[index]
+        value = self.values[index]
+        self.index = index + 1
+        if DEBUG:
+            logging.debug('%d %#x', op, value)
 
-        instr = [int(x, 16) for x in nextline.split()]
-        if instr[0] == 2: # non-mem instructions
-            self.count_down_cycle = instr[1] - 1
-        elif instr[0] == 0: # load
+        if op == 2: # non-mem instructions
+            self.count_down_cycle = value - 1
+        elif op == 0: # load
             self.is_stalled = True
-            self.cache_controller.prrd(instr[1], self.resume)
+            self.cache_controller.prrd(value, self.resume)
 
-        elif instr[0] == 1: # store
+        elif op == 1: # store
             self.is_stalled = True
-            self.cache_controller.prwr(instr[1], self.resume)
+            self.cache_controller.prwr(value, self.resume)
             self.write_start = self.cycle_count
             self.total_num_writes += 1
 
         return True
 
+    def load_chunk(self):
+        '''Read the next chunk of the trace
+
+        return: False at the end of the trace
+        '''
+        chunk = self.trace.next_chunk()
+        if chunk is None:
+            return False
+        self.ops, self.values = chunk
+        self.index = 0
+        return True
+
+    def next_instruction(self):
+        '''Take the next instruction of the trace without executing it
+
+        return: (op, value), or None at the end of the trace
+        '''
+        if self.index >= len(self.ops) and not self.load_chunk():
+            return None
+        index = self.index
+        self.index = index + 1
+        return (self.ops[index], self.values[index])
+
+    def reset_statistics(self):
+        '''Zero the write latency statistics, e.g. after a warm-up'''
+        self.total_num_writes = 0
+        self.total_write_latency = 0
+        self.write_start = 0
+        self.write_finish = 0
+
     def resume(self):
         '''
         alled by the cache_controller to resume processor operation
@@ -66,3 +115,101 @@ class Processor(object):
             self.write_finish = self.cycle_count
             self.total_write_latency += self.write_finish - self.write_start
 
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which the processor would only count
+        down or wait for its cache controller.
+
+        return: 0 if the next tick does real work; INFINITY if stalled, since
+                only the bus can wake the processor up.
+        '''
+        if self.count_down_cycle > 0:
+            return self.count_down_cycle
+        if self.is_stalled:
+            return INFINITY
+        return 0
+
+    def skip(self, cycles):
+        '''Apply the given number of idle ticks at once.
+
+        Must not exceed idle_cycles().
+        '''
+        self.cycle_count += cycles
+        if self.count_down_cycle > 0:
+            self.count_down_cycle -= cycles
+
+
+class NonBlockingProcessor(Processor):
+    '''Emulate a processor core that keeps executing past its cache misses
+
+    Loads and stores are issued without waiting for them to complete, as
+    long as the cache controller accepts them (see
+    CacheController.accepts()): the core stalls when the MSHRs are full, or
+    at a store to a block with an outstanding load miss, until one of its
+    misses completes. At the end of the trace, the core waits for its
+    outstanding misses.
+
+    The write latency is counted per store, from its issue to its completion.
+    '''
+    def __init__(self, trace, cache_controller):
+        super(NonBlockingProcessor, self).__init__(trace, cache_controller)
+        self.num_outstanding = 0 # accesses issued and not completed
+
+    def tick(self):
+        '''
+        return: True if the processor should be further ticked;
+                False if finished.
+        '''
+        if self.is_finished:
+            return False
+
+        self.cycle_count += 1
+
+        if self.count_down_cycle > 0:
+            self.count_down_cycle -= 1
+            return True
+
+        if self.is_stalled:
+            return True
+
+        index = self.index
+        if index >= len(self.ops):
+            if not self.load_chunk():
+                if self.num_outstanding:
+                    self.is_stalled = True
+                    return True
+                self.is_finished = True
+                return False
+            index = 0
+        op = self.ops[index]
+        value = self.values[index]
+
+        if op == 2: # non-mem instructions
+            self.count_down_cycle = value - 1
+        elif self.cache_controller.accepts(op, value):
+            self.num_outstanding += 1
+            if op == 0: # load
+                self.cache_controller.prrd(
+                    value, functools.partial(self.complete, None))
+            else: # store
+                self.total_num_writes += 1
+                self.cache_controller.prwr(
+                    value, functools.partial(self.complete, self.cycle_count))
+        else:
+            # the access is issued again once a miss completes
+            self.is_stalled = True
+            return True
+
+        self.index = index + 1
+        if DEBUG:
+            logging.debug('%d %#x', op, value)
+        return True
+
+    def complete(self, write_start):
+        '''Called back by the cache controller when an access completes
+
+        write_start: cycle a store was issued, None for a load
+        '''
+        self.num_outstanding -= 1
+        self.is_stalled = False
+        if write_start is not None:
+            self.total_write_latency += self.cycle_count - write_start
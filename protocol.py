@@ -0,0 +1,226 @@
+'''This module contains the table-driven cache controller shared by all
+protocols
+
+A protocol is declared as three transition tables over small integer state
+codes:
+    processor: (state, PRRD/PRWR) -> (next state, bus title, statistics)
+        next state is applied to the cache right away (None: unchanged). If
+        bus title is not None, a message is queued to the bus and the
+        processor waits for it to come back.
+    completion: (title, from_prwr, share_status) -> (fill state, follow-up
+                title, statistics)
+        what the controller does when its own message comes back from the
+        bus. If follow-up title is not None, another message is queued
+        instead of filling the block. from_prwr/share_status may be ANY.
+    snoop: (state, title) -> (next state, response)
+        what the controller does with another controller's message, and what
+        it returns to the bus. Missing entries leave the state unchanged and
+        return the protocol's default response.
+
+Statistics are a combination of HIT, MISS, PRIVATE_ACCESS and SHARED_ACCESS.
+The tables are flattened into lists, so every transition is a list lookup.
+
+A controller may have miss status holding registers (MSHRs), for a
+processor that keeps executing past its misses. Each MSHR tracks the
+outstanding miss of one block. A later miss to that block, a secondary
+miss, queues no message: it is merged into the MSHR and called back when the
+block is filled. It counts as a miss; whether the access is private or shared
+is only counted for the primary miss.
+'''
+import functools
+
+from message import BusMessage, BUSWB, TITLE_NAMES
+
+# processor events
+PRRD = 0
+PRWR = 1
+
+# statistics bumped by a transition
+HIT = 1
+MISS = 2
+PRIVATE_ACCESS = 4
+SHARED_ACCESS = 8
+
+# wildcard for from_prwr/share_status in completion keys
+ANY = None
+
+class Protocol(object):
+    '''The transition tables of a coherence protocol
+
+    states: state names, the code of a state being its index. Code 0 is the
+        default (invalid) state.
+    dirty_states: states that must be written back when evicted
+    '''
+    def __init__(self, name, states, dirty_states, processor, completion,
+                 snoop, default_response=None):
+        self.name = name
+        self.states = states
+        self.dirty_states = frozenset(dirty_states)
+
+        num_of_titles = len(TITLE_NAMES)
+        self.processor = [(None, None, 0)] * (len(states) * 2)
+        for (state, event), transition in processor.items():
+            self.processor[state * 2 + event] = transition
+
+        self.completion = [None] * (num_of_titles * 4)
+        for (title, from_prwr, share_status), transition in completion.items():
+            for prwr in ((False, True) if from_prwr is ANY else (from_prwr,)):
+                for shared in ((False, True) if share_status is ANY
+                               else (share_status,)):
+                    self.completion[completion_index(title, prwr, shared)] = \
+                        transition
+
+        self.snoop = [(None, default_response)] * (len(states) * num_of_titles)
+        for (state, title), transition in snoop.items():
+            self.snoop[state * num_of_titles + title] = transition
+        self.num_of_titles = num_of_titles
+
+def completion_index(title, from_prwr, share_status):
+    '''return: index of a message in Protocol.completion'''
+    return title * 4 + (2 if from_prwr else 0) + (1 if share_status else 0)
+
+class CacheController(object):
+    '''Emulate a cache controller following the tables of self.protocol
+
+    Subclasses set the protocol class attribute.
+
+    general guideline for sending message to bus:
+        If the message is induced by the cache controller's own processor's
+        action, i.e. prwr/prrd, it is queued to bus.
+        If the message is induced by other controller's action, in
+        receive_bus_message(), it is returned to the bus.
+    '''
+    protocol = None
+
+    def __init__(self, bus, cache, num_of_mshrs=0):
+        '''num_of_mshrs: 0 for a blocking cache, with a single outstanding
+            miss'''
+        self.bus = bus
+        self.cache = cache
+        self.num_of_mshrs = num_of_mshrs
+        # block number: (event of the primary miss, callbacks of the accesses
+        # merged into it)
+        self.mshrs = {}
+
+        self.hit_count = 0
+        self.miss_count = 0
+        self.private_data_access_count = 0
+        self.shared_data_access_count = 0
+
+    def reset_statistics(self):
+        '''Zero the access statistics, e.g. after a warm-up'''
+        self.hit_count = 0
+        self.miss_count = 0
+        self.private_data_access_count = 0
+        self.shared_data_access_count = 0
+
+    def count(self, statistics):
+        '''bump the statistics of a transition'''
+        if statistics & HIT:
+            self.hit_count += 1
+        if statistics & MISS:
+            self.miss_count += 1
+        if statistics & PRIVATE_ACCESS:
+            self.private_data_access_count += 1
+        if statistics & SHARED_ACCESS:
+            self.shared_data_access_count += 1
+
+    def prrd(self, address, pr_callback):
+        '''respond to processor's PrRd call
+
+        pr_callback: processor's callback function
+        '''
+        self.access(PRRD, address, pr_callback)
+
+    def prwr(self, address, pr_callback):
+        '''respond to processor's PrWr call'''
+        self.access(PRWR, address, pr_callback)
+
+    def access(self, event, address, pr_callback):
+        '''apply the processor table to a PrRd/PrWr'''
+        current_state = self.cache.get_state(address)
+        next_state, title, statistics = \
+            self.protocol.processor[current_state * 2 + event]
+        if title is not None and self.mshrs:
+            mshr = self.mshrs.get(address / self.cache.block_size)
+            if mshr is not None: # secondary miss
+                self.count(statistics & ~(PRIVATE_ACCESS | SHARED_ACCESS))
+                mshr[1].append(pr_callback)
+                return # method exit point 1
+        if statistics:
+            self.count(statistics)
+        if next_state is not None:
+            self.cache.set_state(address, next_state)
+
+        if title is not None:
+            message = BusMessage(title, self, address, callback=pr_callback)
+            message.from_prwr = event == PRWR
+            if self.num_of_mshrs:
+                block = address / self.cache.block_size
+                self.mshrs[block] = (event, [pr_callback])
+                message.callback = functools.partial(self.fill_mshr, block)
+            self.bus.queue_message(message)
+            return # method exit point 2
+
+        pr_callback() # call back processor
+        return # method exit point 3
+
+    def accepts(self, event, address):
+        '''Whether a PrRd/PrWr can be issued now, with MSHRs
+
+        return: False if the access would miss while every MSHR is in use,
+                or if it is a PrWr to a block with an outstanding PrRd miss,
+                which must complete first
+        '''
+        mshr = self.mshrs.get(address / self.cache.block_size)
+        if mshr is not None:
+            return not (event == PRWR and mshr[0] == PRRD)
+        if len(self.mshrs) < self.num_of_mshrs:
+            return True
+        state = self.cache.peek(address)
+        return self.protocol.processor[state * 2 + event][1] is None
+
+    def fill_mshr(self, block):
+        '''Call back every access waiting for the fill of block'''
+        for callback in self.mshrs.pop(block)[1]:
+            callback()
+
+    def receive_bus_message(self, message):
+        '''Handles message propagated by bus
+
+        The bus sends a controller's own message back to it once the data
+        transfer is done: the completion table decides the new state of the
+        block, and the processor is called back. A BusWB is queued if this
+        evicts a block in a dirty state.
+
+        Other controllers' messages are snooped: the snoop table decides the
+        new state of the block and the response returned to the bus.
+        '''
+        protocol = self.protocol
+        if message.sender == self:
+            fill_state, follow_up, statistics = protocol.completion[
+                completion_index(message.title, message.from_prwr,
+                                 message.share_status)]
+            if statistics:
+                self.count(statistics)
+            if follow_up is not None:
+                new_message = BusMessage(follow_up, self, message.address,
+                                         callback=message.callback)
+                self.bus.queue_message(new_message)
+                return None
+
+            evicted = self.cache.set_state(message.address, fill_state)
+            if (evicted) and (evicted['state'] in protocol.dirty_states):
+                new_message = BusMessage(BUSWB, self, evicted['address'])
+                self.bus.queue_message(new_message)
+
+            message.callback() # processor callback
+            return None # method exit point 1
+
+        # if the message is from other cache controllers
+        mystate = self.cache.get_state(message.address)
+        next_state, response = \
+            protocol.snoop[mystate * protocol.num_of_titles + message.title]
+        if next_state is not None:
+            self.cache.set_state(message.address, next_state)
+        return response # method exit point 2
@@ -0,0 +1,193 @@
+'''Replacement policies of cache.ArrayCache
+
+A policy keeps its metadata in flat arrays over the slots of the cache (the
+ways of set i being the slots [i*assoc, (i+1)*assoc)), or over its sets, and
+is told about every access:
+
+    touch(slot): a hit on the block in slot
+    insert(slot): a block was just placed in slot
+    victim(first, last): the slot to evict among the full set [first, last)
+
+The cache fills an empty way of a set before asking for a victim. Probing
+with peek() touches nothing, and freeing a way is not reported: the metadata
+of an empty way is reset when a block is inserted there.
+'''
+from array import array
+import random
+
+# seed of the policies drawing random numbers
+SEED = 0
+
+class LRU(object):
+    '''Least Recently Used: the slot touched the longest ago
+
+    ages holds the value of a running access clock at the last touch of
+    every slot.
+    '''
+    def __init__(self, num_of_sets, assoc, seed=SEED):
+        self.ages = array('L', [0]) * (num_of_sets * assoc)
+        self.clock = 0
+
+    def touch(self, slot):
+        self.clock += 1
+        self.ages[slot] = self.clock
+
+    insert = touch
+
+    def victim(self, first, last):
+        ages = self.ages
+        victim = first
+        for slot in xrange(first + 1, last):
+            if ages[slot] < ages[victim]:
+                victim = slot
+        return victim
+
+class FIFO(LRU):
+    '''First In First Out: the slot filled the longest ago, hits are ignored'''
+    def touch(self, slot):
+        pass
+
+    def insert(self, slot):
+        self.clock += 1
+        self.ages[slot] = self.clock
+
+# largest associativity of TreePLRU, whose trees are stored in 64 bits
+MAX_TREE_ASSOC = 64
+
+def supports_tree(assoc):
+    '''return: True if TreePLRU handles an associativity of assoc'''
+    return 0 < assoc <= MAX_TREE_ASSOC and not assoc & (assoc - 1)
+
+class TreePLRU(object):
+    '''Tree pseudo-LRU of a power of two associativity, up to 64
+
+    Each set has a binary tree of assoc - 1 bits over its ways, stored in one
+    integer with node n (the root being 1, the children of n being 2n and
+    2n+1) at bit n. A bit points to the half of its subtree to evict from,
+    0 to the left and 1 to the right; a touch points every bit on the path to
+    the way away from it.
+    '''
+    def __init__(self, num_of_sets, assoc, seed=SEED):
+        if not supports_tree(assoc):
+            raise ValueError('tree-PLRU needs a power of two associativity '
+                             'up to 64, not ' + str(assoc))
+        self.assoc = assoc
+        self.levels = assoc.bit_length() - 1
+        self.trees = array('L', [0]) * num_of_sets
+
+    def touch(self, slot):
+        index, way = divmod(slot, self.assoc)
+        tree = self.trees[index]
+        node = 1
+        for level in xrange(self.levels - 1, -1, -1):
+            direction = (way >> level) & 1
+            if direction:
+                tree &= ~(1 << node)
+            else:
+                tree |= 1 << node
+            node = 2 * node + direction
+        self.trees[index] = tree
+
+    insert = touch
+
+    def victim(self, first, last):
+        tree = self.trees[first / self.assoc]
+        node = 1
+        for _ in xrange(self.levels):
+            node = 2 * node + ((tree >> node) & 1)
+        return first + node - self.assoc
+
+class Random(object):
+    '''A random slot, from a seeded generator so that runs are repeatable'''
+    def __init__(self, num_of_sets, assoc, seed=SEED):
+        self.random = random.Random(seed)
+
+    def touch(self, slot):
+        pass
+
+    insert = touch
+
+    def victim(self, first, last):
+        return first + self.random.randrange(last - first)
+
+class NRU(object):
+    '''Not Recently Used: the first slot whose reference bit is clear
+
+    A touch sets the bit of its slot. When that sets every bit of the set,
+    the others are cleared.
+    '''
+    def __init__(self, num_of_sets, assoc, seed=SEED):
+        self.assoc = assoc
+        self.referenced = array('b', [0]) * (num_of_sets * assoc)
+
+    def touch(self, slot):
+        referenced = self.referenced
+        referenced[slot] = 1
+        first = slot - slot % self.assoc
+        last = first + self.assoc
+        for other in xrange(first, last):
+            if not referenced[other]:
+                return
+        for other in xrange(first, last):
+            referenced[other] = 0
+        referenced[slot] = 1
+
+    insert = touch
+
+    def victim(self, first, last):
+        referenced = self.referenced
+        for slot in xrange(first, last):
+            if not referenced[slot]:
+                return slot
+        return first
+
+# largest re-reference prediction value of RRIP, with 2-bit values
+MAX_RRPV = 3
+
+class SRRIP(object):
+    '''Static re-reference interval prediction (Jaleel et al., ISCA 2010)
+
+    Every slot has a 2-bit re-reference prediction value (RRPV). A hit sets
+    it to 0, an insert to MAX_RRPV - 1. The victim is the first slot at
+    MAX_RRPV, after aging the whole set until one is.
+    '''
+    def __init__(self, num_of_sets, assoc, seed=SEED):
+        self.rrpv = array('b', [MAX_RRPV]) * (num_of_sets * assoc)
+
+    def touch(self, slot):
+        self.rrpv[slot] = 0
+
+    def insert(self, slot):
+        self.rrpv[slot] = MAX_RRPV - 1
+
+    def victim(self, first, last):
+        rrpv = self.rrpv
+        oldest = max(rrpv[first:last])
+        aging = MAX_RRPV - oldest
+        victim = None
+        for slot in xrange(first, last):
+            rrpv[slot] += aging
+            if victim is None and rrpv[slot] == MAX_RRPV:
+                victim = slot
+        return victim
+
+# fraction of BRRIP inserts predicted like SRRIP's
+BRRIP_EPSILON = 1 / 32.0
+
+class BRRIP(SRRIP):
+    '''Bimodal RRIP: inserts at MAX_RRPV, except a BRRIP_EPSILON fraction at
+    MAX_RRPV - 1, so that a working set larger than the cache keeps part of
+    its blocks'''
+    def __init__(self, num_of_sets, assoc, seed=SEED):
+        super(BRRIP, self).__init__(num_of_sets, assoc)
+        self.random = random.Random(seed)
+
+    def insert(self, slot):
+        if self.random.random() < BRRIP_EPSILON:
+            self.rrpv[slot] = MAX_RRPV - 1
+        else:
+            self.rrpv[slot] = MAX_RRPV
+
+# replacement policies selectable from the command line
+POLICIES = {'lru': LRU, 'fifo': FIFO, 'plru': TreePLRU, 'random': Random,
+            'nru': NRU, 'srrip': SRRIP, 'brrip': BRRIP}
@@ -0,0 +1,168 @@
+'''Statistical sampling of a simulation, in the manner of SMARTS
+
+The loads/stores of every core are cut into periods. Most of a period is
+functionally warmed (scheduler.warm()): caches and coherence states are kept
+up to date, but no time is simulated. The last window loads/stores of each
+period, with the non-mem instructions between them, are simulated in detail
+by the usual engine, all cores starting together on an idle bus. A detailed
+window ends for a core when it has executed its window; it is still snooped
+until every core is done.
+
+Each window gives every core one sample of its miss rate, average write
+latency and cycles per access. A window cut short by the end of a trace is
+only a sample if the core has no full window. The reported values are the
+sample means, scaled to the whole trace for counts, with the half-width of
+their confidence interval:
+    CONFIDENCE_Z * sample standard deviation / sqrt(number of windows)
+Bus statistics are left to the bus, whose counters are exact, as warming
+runs the bus too.
+'''
+import math
+from array import array
+
+import scheduler
+
+# 95% confidence, normal approximation
+CONFIDENCE_Z = 1.96
+
+# per-core fields added by sampling to the simulator's results
+SAMPLED_FIELDS = ['miss_rate_ci', 'average_write_latency_ci',
+                  'cycle_count_ci', 'num_of_windows']
+
+class _EndOfWindow(object):
+    '''Trace of a processor during a window, once the window is executed'''
+    def next_chunk(self, size=None):
+        return None
+
+END_OF_WINDOW = _EndOfWindow()
+
+def take_window(processor, num_of_accesses):
+    '''Take the instructions of the next window off a processor's trace
+
+    return: (chunk of the window, number of loads/stores in it)
+    '''
+    ops = []
+    values = []
+    accesses = 0
+    while accesses < num_of_accesses:
+        instr = processor.next_instruction()
+        if instr is None:
+            break
+        ops.append(instr[0])
+        values.append(instr[1])
+        if instr[0] != 2:
+            accesses += 1
+    return (array('B', ops), array('L', values)), accesses
+
+def counters(processor):
+    '''return: the statistics of a core sampled in each window'''
+    cc = processor.cache_controller
+    return (cc.miss_count, cc.hit_count, cc.private_data_access_count,
+            cc.shared_data_access_count, processor.total_num_writes,
+            processor.total_write_latency, processor.cycle_count)
+
+def estimate(samples):
+    '''return: (mean, confidence interval half-width) of a list of samples,
+               the half-width is nan with fewer than two samples
+    '''
+    if not samples:
+        return 0.0, float('nan')
+    mean = sum(samples) / float(len(samples))
+    if len(samples) < 2:
+        return mean, float('nan')
+    variance = (sum((sample - mean) ** 2 for sample in samples) /
+                (len(samples) - 1))
+    return mean, CONFIDENCE_Z * math.sqrt(variance / len(samples))
+
+def sample(engine, processors, bus, list_of_cc, period, window):
+    '''Simulate a system by sampling, until every trace ends
+
+    period: loads/stores of every core per period, window of which are
+        simulated in detail
+    engine: a key of scheduler.ENGINES, used for the detailed windows
+
+    return: one dictionary per core, with the per-core keys of
+            simulator.core_results() and SAMPLED_FIELDS
+    '''
+    if not 0 < window <= period:
+        raise ValueError('the window must be within the period')
+    num_of_accesses = [0] * len(processors)
+    num_of_writes = [0] * len(processors)
+    windows = [[] for _ in processors] # per core, differences of counters
+
+    while True:
+        warmed = scheduler.warm(processors, bus, period - window)
+        for core, (accesses, writes) in enumerate(warmed):
+            num_of_accesses[core] += accesses
+            num_of_writes[core] += writes
+
+        windows_of_cores = [take_window(processor, window)
+                            for processor in processors]
+        sizes = [accesses for _, accesses in windows_of_cores]
+        if not any(sizes):
+            break
+
+        traces = []
+        for processor, (chunk, _) in zip(processors, windows_of_cores):
+            traces.append((processor.trace, processor.ops, processor.values,
+                           processor.index))
+            processor.trace = END_OF_WINDOW
+            processor.ops, processor.values = chunk
+            processor.index = 0
+            processor.is_finished = False
+
+        before = [counters(processor) for processor in processors]
+        # the scheduler removes finished cores from a copy of the bus' list,
+        # so that they are still snooped until every core is done
+        scheduler.run(engine, processors, bus, list(list_of_cc))
+        scheduler.drain(bus)
+
+        for core, processor in enumerate(processors):
+            processor.trace, processor.ops, processor.values, \
+                processor.index = traces[core]
+            if sizes[core]:
+                difference = [after - start for after, start in
+                              zip(counters(processor), before[core])]
+                windows[core].append((sizes[core], difference))
+                num_of_accesses[core] += sizes[core]
+                num_of_writes[core] += difference[4]
+
+    for processor in processors:
+        processor.is_finished = True
+    return [results(num_of_accesses[core], num_of_writes[core],
+                    windows[core]) for core in range(len(processors))]
+
+def results(num_of_accesses, num_of_writes, windows):
+    '''return: the estimated statistics of a core from its windows'''
+    full_size = max([size for size, _ in windows] or [0])
+    windows = [(size, difference) for size, difference in windows
+               if size == full_size]
+    accesses = sum(size for size, _ in windows) or 1
+    private = sum(difference[2] for _, difference in windows)
+    shared = sum(difference[3] for _, difference in windows)
+    miss_rate, miss_rate_ci = estimate(
+        [difference[0] / float(size) for size, difference in windows])
+    write_latency, write_latency_ci = estimate(
+        [difference[5] / float(difference[4])
+         for _, difference in windows if difference[4]])
+    cycles_per_access, cycles_ci = estimate(
+        [difference[6] / float(size) for size, difference in windows])
+
+    miss_count = int(round(miss_rate * num_of_accesses))
+    return {
+        'miss_count': miss_count,
+        'hit_count': num_of_accesses - miss_count,
+        'miss_rate': miss_rate,
+        'private_data_access_count':
+            int(round(private * num_of_accesses / float(accesses))),
+        'shared_data_access_count':
+            int(round(shared * num_of_accesses / float(accesses))),
+        'total_write_latency': int(round(write_latency * num_of_writes)),
+        'total_num_writes': num_of_writes,
+        'average_write_latency': write_latency,
+        'cycle_count': int(round(cycles_per_access * num_of_accesses)),
+        'miss_rate_ci': miss_rate_ci,
+        'average_write_latency_ci': write_latency_ci,
+        'cycle_count_ci': cycles_ci * num_of_accesses,
+        'num_of_windows': len(windows),
+    }
@@ -0,0 +1,200 @@
+'''This module contains the main simulation loops
+
+Two interchangeable loops are provided:
+    cycle_accurate_steps - ticks every processor and the bus once per
+        simulated cycle. This is the reference mode.
+    event_driven_steps - asks every component how many upcoming cycles it
+        would spend only counting down (or waiting for the bus), and jumps the
+        clock straight to the next cycle in which something happens.
+
+Both loops produce identical cycle counts, write latencies and bus counters.
+They are generators that yield after every cycle they tick, so several
+simulations can be interleaved in one process; run() drives one simulation
+to the end.
+
+fast_forward() warms the caches up before either loop: it applies the
+coherence transitions of the first instructions without simulating time.
+'''
+
+# returned by idle_cycles() when a component would wait forever on its own
+INFINITY = float('inf')
+
+def cycle_accurate_steps(processors, bus, list_of_cc, monitor=None):
+    '''Tick every running processor, then the bus, once per cycle.
+
+    processors: list of Processor, ticked in list order
+    list_of_cc: the bus' list of cache controllers. A controller is removed
+        from it once its processor finishes.
+    monitor: optional busmonitor.BusMonitor, told about every cycle
+
+    A new generator may be started on a system restored from a checkpoint
+    taken between two steps, and continues exactly where the old one was.
+    '''
+    # processors finished before a checkpoint was taken stay finished
+    running = [p for p in processors if not p.is_finished]
+    while True:
+        for processor in list(running):
+            if not processor.tick():
+                running.remove(processor)
+                list_of_cc.remove(processor.cache_controller)
+
+        bus.tick()
+        if monitor:
+            monitor.record(1)
+
+        if not running:
+            break
+        yield
+
+def event_driven_steps(processors, bus, list_of_cc, monitor=None):
+    '''Same as cycle_accurate_steps, but idle cycles are skipped in one step.
+
+    The next interesting cycle is the earliest cycle in which any running
+    processor or the bus does more than decrement a countdown timer. Every
+    cycle before it is applied through skip(), which advances the counters
+    exactly as the same number of tick() calls would.
+    '''
+    running = [p for p in processors if not p.is_finished]
+    while True:
+        cycles = bus.idle_cycles()
+        for processor in running:
+            if cycles == 0:
+                break
+            cycles = min(cycles, processor.idle_cycles())
+
+        if 0 < cycles < INFINITY:
+            # nothing changes on the bus until the next interesting cycle
+            if monitor:
+                monitor.record(cycles)
+            for processor in running:
+                processor.skip(cycles)
+            bus.skip(cycles)
+
+        # the next interesting cycle is ticked as usual
+        for processor in list(running):
+            if not processor.tick():
+                running.remove(processor)
+                list_of_cc.remove(processor.cache_controller)
+
+        bus.tick()
+        if monitor:
+            monitor.record(1)
+
+        if not running:
+            break
+        yield
+
+ENGINES = {'cycle': cycle_accurate_steps, 'event': event_driven_steps}
+
+def _ignore():
+    '''Processor callback of warm-up accesses, nobody waits for them'''
+
+def drain(bus):
+    '''Run the bus until its queue is empty, skipping all its countdowns
+
+    Snoops and state transitions happen exactly as when the bus is ticked,
+    only no time passes for the processors.
+    '''
+    while True:
+        cycles = bus.idle_cycles()
+        if cycles == INFINITY:
+            return
+        if cycles:
+            bus.skip(cycles)
+        bus.tick()
+
+def warm(processors, bus, num_of_accesses):
+    '''Functional warming: apply the next num_of_accesses loads/stores of
+    every processor to the caches, without timing
+
+    Processors take turns, one access each, in list order. Every access goes
+    through its cache controller, and its bus messages are resolved at once
+    by drain(). Non-mem instructions are skipped.
+
+    return: [number of accesses, number of stores] of every processor, fewer
+            accesses than asked if its trace ends
+    '''
+    counts = dict((processor, [0, 0]) for processor in processors)
+    warming = [p for p in processors if num_of_accesses > 0]
+    while warming:
+        for processor in list(warming):
+            instr = processor.next_instruction()
+            while instr is not None and instr[0] == 2:
+                instr = processor.next_instruction()
+            if instr is None: # the trace ends during the warm-up
+                warming.remove(processor)
+                continue
+
+            if instr[0] == 0:
+                processor.cache_controller.prrd(instr[1], _ignore)
+            else:
+                processor.cache_controller.prwr(instr[1], _ignore)
+                counts[processor][1] += 1
+            drain(bus)
+
+            counts[processor][0] += 1
+            if counts[processor][0] == num_of_accesses:
+                warming.remove(processor)
+    return [counts[processor] for processor in processors]
+
+def fast_forward(processors, bus, num_of_accesses):
+    '''Functional warm-up: warm() the first num_of_accesses loads/stores of
+    every processor
+
+    Statistics of processors, controllers and bus are then reset, so that
+    they only cover what is simulated afterwards; cycle counts start from 0.
+    '''
+    warm(processors, bus, num_of_accesses)
+    for processor in processors:
+        processor.reset_statistics()
+        processor.cache_controller.reset_statistics()
+    # bus statistics are the total_* counters of the bus, or of its banks
+    for each in getattr(bus, 'banks', [bus]):
+        for name in vars(each):
+            if name.startswith('total_'):
+                setattr(each, name, 0)
+        if getattr(each, 'llc', None):
+            each.llc.reset_statistics()
+
+def run(engine, processors, bus, list_of_cc, monitor=None):
+    '''Simulate until every processor finishes
+
+    engine: a key of ENGINES
+    monitor: optional busmonitor.BusMonitor
+    '''
+    for _ in ENGINES[engine](processors, bus, list_of_cc, monitor):
+        pass
+
+def trace_positions(processors):
+    '''return: index of the next chunk of the trace reader of every
+               processor, 0 for readers that do not tell'''
+    return [getattr(processor.trace, 'index', 0) for processor in processors]
+
+def run_interleaved(engine, simulations):
+    '''Simulate several independent systems in one loop, until all finish
+
+    The systems read the traces of the same cores, e.g. from the readers of
+    a tracefile.SharedTrace per core. The one stepped is always the system
+    furthest behind the leading reader of one of the cores, until one of its
+    readers moves on to another chunk. The windows of decoded chunks thus
+    stay as small as the different progress of the cores within each system
+    allows, however different the speeds of the systems.
+
+    simulations: list of (processors, bus, list_of_cc)
+    '''
+    running = [(ENGINES[engine](*simulation), simulation[0])
+               for simulation in simulations]
+    while running:
+        positions = [trace_positions(processors) for _, processors in running]
+        leaders = map(max, zip(*positions))
+        lags = [max(leader - position
+                    for leader, position in zip(leaders, system_positions))
+                for system_positions in positions]
+        index = lags.index(max(lags))
+        step, processors = running[index]
+        try:
+            next(step)
+            while trace_positions(processors) == positions[index]:
+                next(step)
+        except StopIteration:
+            del running[index]
@@ -1,162 +1,505 @@
-from sys import argv
-from cache import Cache
-from processor import Processor
+import argparse
+import os
+import sys
+from cache import CACHES
+from replacement import POLICIES as REPLACEMENT_POLICIES, supports_tree
+from processor import Processor, NonBlockingProcessor
+from tracefile import SharedTrace, find_trace
+from snoopfilter import SnoopFilter
+from splitbus import SPLIT_BUSES, MAX_OUTSTANDING
+from bankedbus import BankedBus
+from directory import HOMES, Directory, DirectoryHome, HOP_LATENCY
+from llc import SharedCache, POLICIES as LLC_POLICIES, INCLUSIVE, \
+    HIT_LATENCY as LLC_LATENCY
+from busmonitor import BusMonitor, DEFAULT_INTERVAL
 import msi
+import msiu
 import mesi
+import moesi
 import dragon
+import scheduler
+import checkpoint
+import sampling
+import instrumentation
 import time
 from time import gmtime, strftime
 import logging
 
-_, protocol, input_file, cache, associativity, block= argv
-cache_size = int(cache)
-assoc = int(associativity)
-block_size = int(block)
-
-logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.WARNING)
-print 'start time: ' + strftime("%H:%M:%S", gmtime())
-start_time = time.time()
-
-"""
-dataset = ['blackscholes', 'bodytrack', 'fluidanimate']
-cache_size = 1024#[1024,8192,32768]
-assoc = 1#[1,2,4]
-block_size = 16#[8, 32, 128]
-"""
-if protocol == 'msi':
-    Bus = msi.BusMSI
-    CacheController = msi.CacheControllerMSI
-    DefaultState = msi.INVALID
-elif protocol == 'mesi':
-    Bus = mesi.BusMESI
-    CacheController = mesi.CacheControllerMESI
-    DefaultState = mesi.INVALID
-elif protocol == 'dragon':
-    Bus = dragon.BusDragon
-    CacheController = dragon.CacheControllerDragon
-    DefaultState = dragon.INVALID
-else:
-    exit("Wrong protocol")
-
-# initiate components
-list_of_cc = []
-bus = Bus(block_size, list_of_cc)
-
-cache_0 = Cache(cache_size, block_size, assoc, DefaultState)
-cc_0 = CacheController(bus, cache_0)
-pr_0 = Processor(input_file + '_0.data', cc_0)
-list_of_cc.append(cc_0)
-
-cache_1 = Cache(cache_size, block_size, assoc, DefaultState)
-cc_1 = CacheController(bus, cache_1)
-pr_1 = Processor(input_file + '_1.data', cc_1)
-list_of_cc.append(cc_1)
-#"""
-cache_2 = Cache(cache_size, block_size, assoc, DefaultState)
-cc_2 = CacheController(bus, cache_2)
-pr_2 = Processor(input_file + '_2.data', cc_2)
-list_of_cc.append(cc_2)
-
-cache_3 = Cache(cache_size, block_size, assoc, DefaultState)
-cc_3 = CacheController(bus, cache_3)
-pr_3 = Processor(input_file + '_3.data', cc_3)
-list_of_cc.append(cc_3)
-#"""
-is_running_0 = True
-is_running_1 = True
-is_running_2 = True
-is_running_3 = True
-while(True):
-    if is_running_0:
-        is_running_0 = pr_0.tick()
-        if not is_running_0:
-            list_of_cc.remove(cc_0)
-
-    if is_running_1:
-        is_running_1 = pr_1.tick()
-        if not is_running_1:
-            list_of_cc.remove(cc_1)
-
-    if is_running_2:
-        is_running_2 = pr_2.tick()
-        if not is_running_2:
-            list_of_cc.remove(cc_2)
-
-    if is_running_3:
-        is_running_3 = pr_3.tick()
-        if not is_running_3:
-            list_of_cc.remove(cc_3)
-
-    bus.tick()
-
-    if not (is_running_0 or is_running_1 or is_running_2 or is_running_3):
-        break
-
-    # print pr_0.cycle_count
-"""
-print 'cache miss count: ' + str(cc_0.miss_count)
-print 'private access: ' + str(cc_0.private_data_access_count)
-print 'shared access: ' + str(cc_0.shared_data_access_count)
-print 'total write latency: ' + str(pr_0.total_write_latency)
-print 'total writes: ' + str(pr_0.total_num_writes)
-print 'cycle count: ' + str(pr_0.cycle_count)
-print '\n'
-
-print 'cache miss count: ' + str(cc_1.miss_count)
-print 'private access: ' + str(cc_1.private_data_access_count)
-print 'shared access: ' + str(cc_1.shared_data_access_count)
-print 'total write latency: ' + str(pr_1.total_write_latency)
-print 'total writes: ' + str(pr_1.total_num_writes)
-print 'cycle count: ' + str(pr_1.cycle_count)
-print '\n'
-
-print 'cache miss count: ' + str(cc_2.miss_count)
-print 'private access: ' + str(cc_2.private_data_access_count)
-print 'shared access: ' + str(cc_2.shared_data_access_count)
-print 'total write latency: ' + str(pr_2.total_write_latency)
-print 'total writes: ' + str(pr_2.total_num_writes)
-print 'cycle count: ' + str(pr_2.cycle_count)
-print '\n'
-
-print 'cache miss count: ' + str(cc_3.miss_count)
-print 'private access: ' + str(cc_3.private_data_access_count)
-print 'shared access: ' + str(cc_3.shared_data_access_count)
-print 'total write latency: ' + str(pr_3.total_write_latency)
-print 'total writes: ' + str(pr_3.total_num_writes)
-print 'cycle count: ' + str(pr_3.cycle_count)
-print '\n'
-
-print 'data traffic on bus: ' + str(bus.total_bytes_passed_on_bus)
-print 'num of invalidations on bus: ' + str(bus.total_num_invalidations)
-
-end_time = time.time()
-print 'time used in seconds' + str((end_time - start_time))
-print 'end time: ' + strftime("%H:%M:%S", gmtime())
-"""
-output=open(input_file+protocol+'.csv','a')
-output.write(' ,miss count,hit count,miss rate, private data access count,shared data access count,'+
-             'total write latency,total num writes,average write latency,cycle count,'+
-             'total bytes passes on bus,bus invalidation/updates,num evictions\n')
-result_0 = ['cache size:'+(str(cache_size)), cc_0.miss_count, cc_0.hit_count, cc_0.miss_count/(cc_0.miss_count+cc_0.hit_count+0.0),
-            cc_0.private_data_access_count, cc_0.shared_data_access_count, pr_0.total_write_latency,
-            pr_0.total_num_writes, pr_0.total_write_latency/(pr_0.total_num_writes+0.0), pr_0.cycle_count,
-            bus.total_bytes_passed_on_bus, bus.total_num_invalidations, bus.total_num_evictions]
-
-result_1 = ['block size:'+(str(block_size)), cc_1.miss_count, cc_1.hit_count, cc_1.miss_count/(cc_1.miss_count+cc_1.hit_count+0.0),
-            cc_1.private_data_access_count, cc_1.shared_data_access_count, pr_1.total_write_latency,
-            pr_1.total_num_writes, pr_1.total_write_latency/(pr_1.total_num_writes+0.0), pr_1.cycle_count]
-
-result_2 = ['associativity:'+(str(assoc)), cc_2.miss_count, cc_2.hit_count, cc_2.miss_count/(cc_2.miss_count+cc_2.hit_count+0.0),
-            cc_2.private_data_access_count, cc_2.shared_data_access_count, pr_2.total_write_latency,
-            pr_2.total_num_writes, pr_2.total_write_latency/(pr_2.total_num_writes+0.0), pr_2.cycle_count]
-
-result_3 = ['protocol: '+(str(protocol)), cc_3.miss_count, cc_3.hit_count, cc_3.miss_count/(cc_3.miss_count+cc_3.hit_count+0.0),
-            cc_3.private_data_access_count, cc_3.shared_data_access_count, pr_3.total_write_latency,
-            pr_3.total_num_writes, pr_3.total_write_latency/(pr_3.total_num_writes+0.0), pr_3.cycle_count]
-
-output.write(','.join(map(str, result_0))+'\n')
-output.write(','.join(map(str, result_1))+'\n')
-output.write(','.join(map(str, result_2))+'\n')
-output.write(','.join(map(str, result_3))+'\n')
-output.write('\n')
-output.close()
\ No newline at end of file
+# protocol name: (Bus, CacheController, default cache state)
+PROTOCOLS = {
+    'msi': (msi.BusMSI, msi.CacheControllerMSI, msi.INVALID),
+    'msiu': (msiu.BusMSIu, msiu.CacheControllerMSIu, msiu.INVALID),
+    'mesi': (mesi.BusMESI, mesi.CacheControllerMESI, mesi.INVALID),
+    'moesi': (moesi.BusMOESI, moesi.CacheControllerMOESI, moesi.INVALID),
+    'dragon': (dragon.BusDragon, dragon.CacheControllerDragon, dragon.INVALID),
+}
+
+# default number of cores, each reading its own trace
+NUM_OF_CORES = 4
+
+# per-core statistics, in output column order
+CORE_FIELDS = ['miss_count', 'hit_count', 'miss_rate',
+               'private_data_access_count', 'shared_data_access_count',
+               'total_write_latency', 'total_num_writes',
+               'average_write_latency', 'cycle_count']
+# bus statistics, shared by all cores of a run
+BUS_FIELDS = ['total_bytes_passed_on_bus', 'total_num_invalidations',
+              'total_num_evictions']
+# statistics of directory homes only: point-to-point messages
+DIRECTORY_FIELDS = ['total_num_messages']
+
+# --snoop-filter choices: None, or whether the filter verifies itself
+SNOOP_FILTERS = {'off': None, 'on': False, 'verify': True}
+
+# --bus choices
+BUS_MODELS = ['atomic', 'split', 'directory']
+
+def build(protocol, traces, cache_size, assoc, block_size, cache='array',
+          snoop_filter='off', bus_model='atomic',
+          max_outstanding=MAX_OUTSTANDING, num_of_banks=1, num_of_mshrs=0,
+          mem_latency=None, cache_latency=None, hop_latency=HOP_LATENCY,
+          llc=None, replacement='lru'):
+    '''Create one system: a bus, and a cache, cache controller and processor
+    per trace
+
+    traces: one trace file name or trace reader per core
+    snoop_filter: a key of SNOOP_FILTERS
+    bus_model: one of BUS_MODELS. A split bus has up to max_outstanding
+        transactions in flight, see splitbus.py. A directory has home nodes
+        with up to max_outstanding transactions in flight each, and
+        messages of hop_latency cycles, see directory.py.
+    num_of_banks: with more than one, the bus is a BankedBus of that many
+        buses, or home nodes, of bus_model
+    num_of_mshrs: 0 for blocking caches. Otherwise every controller has
+        that many MSHRs, and the processors are NonBlockingProcessor.
+    mem_latency, cache_latency: cycles of a block transfer from memory and
+        from another cache, by default the MEM_LATENCY of the protocol and
+        block_size
+    llc: None, or (cache_size, assoc, num_of_banks, hit_latency, policy) of
+        a shared last-level cache between the bus and memory, see llc.py
+    replacement: replacement policy of every cache, a key of
+        replacement.POLICIES. The list cache only implements 'lru'.
+
+    return: (list of Processor, bus, list of cache controllers)
+    raise ValueError: if bus_model is not one of BUS_MODELS
+    '''
+    if bus_model not in BUS_MODELS:
+        raise ValueError('unknown bus model ' + str(bus_model))
+    Bus, CacheController, DefaultState = PROTOCOLS[protocol]
+    Cache = CACHES[cache]
+
+    list_of_cc = []
+    shared_cache = None
+    if llc is not None:
+        llc_size, llc_assoc, llc_banks, llc_latency, llc_policy = llc
+        shared_cache = SharedCache(Cache, llc_size, block_size, llc_assoc,
+                                   list_of_cc, llc_banks, llc_latency,
+                                   llc_policy, replacement)
+    banks = []
+    for _ in range(num_of_banks):
+        if bus_model == 'split':
+            bank = SPLIT_BUSES[Bus](block_size, list_of_cc, max_outstanding)
+        elif bus_model == 'directory':
+            bank = HOMES[Bus](block_size, list_of_cc, max_outstanding,
+                              hop_latency)
+        else:
+            bank = Bus(block_size, list_of_cc)
+        if mem_latency is not None:
+            bank.MEM_COUNTDOWN = mem_latency - 1
+        if cache_latency is not None:
+            bank.CACHE_COUNTDOWN = cache_latency - 1
+        if bus_model == 'directory':
+            # the directory replaces the snoop filter
+            bank.snoop_filter = Directory(bank, snoop_filter == 'verify')
+        elif SNOOP_FILTERS[snoop_filter] is not None:
+            bank.snoop_filter = SnoopFilter(bank, SNOOP_FILTERS[snoop_filter])
+        bank.llc = shared_cache
+        banks.append(bank)
+    bus = BankedBus(banks) if num_of_banks > 1 else banks[0]
+    processors = []
+    for trace in traces:
+        cache_controller = CacheController(
+            bus, Cache(cache_size, block_size, assoc, DefaultState,
+                       replacement),
+            num_of_mshrs)
+        if num_of_mshrs:
+            processors.append(NonBlockingProcessor(trace, cache_controller))
+        else:
+            processors.append(Processor(trace, cache_controller))
+        list_of_cc.append(cache_controller)
+    return processors, bus, list_of_cc
+
+def trace_files(input_file, num_of_cores=NUM_OF_CORES):
+    '''return: the trace file name of every core
+
+    <input_file>_N.data, or its compressed version if only that exists
+    '''
+    return [find_trace(input_file + '_' + str(core) + '.data')
+            for core in range(num_of_cores)]
+
+def simulate(protocol, input_file, cache_size, assoc, block_size,
+             engine='event', cache='array', num_of_cores=NUM_OF_CORES,
+             snoop_filter='off', bus_model='atomic',
+             max_outstanding=MAX_OUTSTANDING, num_of_banks=1, num_of_mshrs=0,
+             mem_latency=None, cache_latency=None, hop_latency=HOP_LATENCY,
+             llc=None, replacement='lru', warmup=0, checkpoint_file=None,
+             checkpoint_interval=None, bus_trace=None,
+             bus_trace_interval=DEFAULT_INTERVAL):
+    '''Run one configuration until every processor finishes
+
+    The trace of core N is read from input_file + '_N.data'.
+
+    warmup: number of loads/stores of every core applied by
+        scheduler.fast_forward() before the timed simulation
+
+    checkpoint_file: if it exists, the run resumes from it. The checkpoint
+        must have been taken with the same configuration.
+    checkpoint_interval: if not None, checkpoint_file is written every
+        checkpoint_interval cycles
+    bus_trace: if not None, file the bus time series is written to, in
+        buckets of bus_trace_interval cycles. See busmonitor.BusMonitor.
+
+    return: (list of Processor, bus)
+    '''
+    metadata = {'protocol': protocol, 'input_file': input_file,
+                'cache_size': cache_size, 'assoc': assoc,
+                'block_size': block_size, 'cache': cache,
+                'num_of_cores': num_of_cores, 'snoop_filter': snoop_filter,
+                'bus_model': bus_model, 'max_outstanding': max_outstanding,
+                'num_of_banks': num_of_banks, 'num_of_mshrs': num_of_mshrs,
+                'mem_latency': mem_latency, 'cache_latency': cache_latency,
+                'hop_latency': hop_latency, 'llc': llc,
+                'replacement': replacement, 'warmup': warmup}
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        saved_metadata, system = checkpoint.load(checkpoint_file)
+        if saved_metadata != metadata:
+            raise ValueError(checkpoint_file + ' is a checkpoint of another '
+                             'configuration: ' + str(saved_metadata))
+        processors, bus, list_of_cc = system
+    else:
+        processors, bus, list_of_cc = build(
+            protocol, trace_files(input_file, num_of_cores), cache_size,
+            assoc, block_size, cache, snoop_filter, bus_model,
+            max_outstanding, num_of_banks, num_of_mshrs, mem_latency,
+            cache_latency, hop_latency, llc, replacement)
+        if warmup:
+            scheduler.fast_forward(processors, bus, warmup)
+
+    if checkpoint_file and checkpoint_interval:
+        checkpoint.run(engine, processors, bus, list_of_cc, checkpoint_file,
+                       checkpoint_interval, metadata)
+    elif bus_trace:
+        monitor = BusMonitor(bus, bus_trace, bus_trace_interval)
+        scheduler.run(engine, processors, bus, list_of_cc, monitor)
+        monitor.close()
+    else:
+        scheduler.run(engine, processors, bus, list_of_cc)
+    return processors, bus
+
+def simulate_many(protocol, input_file, geometries, engine='event',
+                  cache='array', num_of_cores=NUM_OF_CORES,
+                  snoop_filter='off', bus_model='atomic',
+                  max_outstanding=MAX_OUTSTANDING, num_of_banks=1,
+                  num_of_mshrs=0, mem_latency=None, cache_latency=None,
+                  hop_latency=HOP_LATENCY, llc=None, replacement='lru',
+                  warmup=0):
+    '''Run several cache geometries over the same traces in a single pass
+
+    Every trace is decoded once, by a SharedTrace feeding one reader per
+    geometry. The systems are interleaved step by step, and each produces
+    exactly the results of a standalone simulate() call.
+
+    geometries: list of (cache_size, assoc, block_size)
+
+    return: list of (list of Processor, bus), in geometries order
+    '''
+    shared_traces = [SharedTrace(filename)
+                     for filename in trace_files(input_file, num_of_cores)]
+    systems = []
+    for cache_size, assoc, block_size in geometries:
+        traces = [shared.reader() for shared in shared_traces]
+        system = build(protocol, traces, cache_size, assoc, block_size,
+                       cache, snoop_filter, bus_model, max_outstanding,
+                       num_of_banks, num_of_mshrs, mem_latency, cache_latency,
+                       hop_latency, llc, replacement)
+        if warmup:
+            scheduler.fast_forward(system[0], system[1], warmup)
+        systems.append(system)
+    scheduler.run_interleaved(engine, systems)
+    return [(processors, bus) for processors, bus, _ in systems]
+
+def simulate_sampled(protocol, input_file, cache_size, assoc, block_size,
+                     sample_period, sample_window, engine='event',
+                     cache='array', num_of_cores=NUM_OF_CORES,
+                     snoop_filter='off', bus_model='atomic',
+                     max_outstanding=MAX_OUTSTANDING, num_of_banks=1,
+                     num_of_mshrs=0, mem_latency=None, cache_latency=None,
+                     hop_latency=HOP_LATENCY, llc=None, replacement='lru',
+                     warmup=0):
+    '''Estimate the results of one configuration by sampling.sample()
+
+    Every sample_period loads/stores of each core, the last sample_window are
+    simulated in detail and the others functionally warmed.
+
+    return: one dictionary per core, with CORE_FIELDS, bus_fields() and
+            sampling.SAMPLED_FIELDS keys
+    '''
+    processors, bus, list_of_cc = build(protocol,
+                                        trace_files(input_file, num_of_cores),
+                                        cache_size, assoc, block_size, cache,
+                                        snoop_filter, bus_model,
+                                        max_outstanding, num_of_banks,
+                                        num_of_mshrs, mem_latency,
+                                        cache_latency, hop_latency, llc,
+                                        replacement)
+    if warmup:
+        scheduler.fast_forward(processors, bus, warmup)
+    results = sampling.sample(engine, processors, bus, list_of_cc,
+                              sample_period, sample_window)
+    for result in results:
+        for field in bus_fields(bus):
+            result[field] = getattr(bus, field)
+    return results
+
+def bus_fields(bus):
+    '''return: the statistics of bus, BUS_FIELDS and, for directory homes,
+               DIRECTORY_FIELDS'''
+    if isinstance(getattr(bus, 'banks', [bus])[0], DirectoryHome):
+        return BUS_FIELDS + DIRECTORY_FIELDS
+    return BUS_FIELDS
+
+def core_results(processors, bus):
+    '''Collect the statistics of a finished run
+
+    return: one dictionary per core, with CORE_FIELDS and bus_fields() keys
+    '''
+    results = []
+    for processor in processors:
+        cc = processor.cache_controller
+        result = {
+            'miss_count': cc.miss_count,
+            'hit_count': cc.hit_count,
+            'miss_rate': (cc.miss_count/(cc.miss_count+cc.hit_count+0.0)
+                          if cc.miss_count+cc.hit_count else 0.0),
+            'private_data_access_count': cc.private_data_access_count,
+            'shared_data_access_count': cc.shared_data_access_count,
+            'total_write_latency': processor.total_write_latency,
+            'total_num_writes': processor.total_num_writes,
+            'average_write_latency': (
+                processor.total_write_latency/(processor.total_num_writes+0.0)
+                if processor.total_num_writes else 0.0),
+            'cycle_count': processor.cycle_count,
+        }
+        for field in bus_fields(bus):
+            result[field] = getattr(bus, field)
+        results.append(result)
+    return results
+
+def write_csv(filename, results, protocol, cache_size, assoc, block_size):
+    '''Append the results of one run to filename
+
+    There is one row per core. The first column of the first four rows
+    labels the configuration, and bus statistics are only written on the
+    first row. Results of a directory have their messages, and results of a
+    sampled run their confidence intervals, in extra columns.
+    '''
+    sampled = sampling.SAMPLED_FIELDS[0] in results[0]
+    fields = [field for field in BUS_FIELDS + DIRECTORY_FIELDS
+              if field in results[0]]
+    labels = ['cache size:'+(str(cache_size)), 'block size:'+(str(block_size)),
+              'associativity:'+(str(assoc)), 'protocol: '+(str(protocol))]
+    output=open(filename,'a')
+    output.write(' ,miss count,hit count,miss rate, private data access count,shared data access count,'+
+                 'total write latency,total num writes,average write latency,cycle count,'+
+                 'total bytes passes on bus,bus invalidation/updates,num evictions'+
+                 (',num messages' if DIRECTORY_FIELDS[0] in fields else '')+
+                 (',miss rate ci,average write latency ci,cycle count ci,'
+                  'num windows' if sampled else '')+'\n')
+    for core, result in enumerate(results):
+        row = [labels[core] if core < len(labels) else '']
+        row.extend(result[field] for field in CORE_FIELDS)
+        if core == 0:
+            row.extend(result[field] for field in fields)
+        if sampled:
+            if core != 0:
+                row.extend([''] * len(fields))
+            row.extend(result[field] for field in sampling.SAMPLED_FIELDS)
+        output.write(','.join(map(str, row))+'\n')
+    # with fewer than four cores, the configuration is still labelled
+    for label in labels[len(results):]:
+        output.write(label+'\n')
+    output.write('\n')
+    output.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache coherence simulator')
+    parser.add_argument('protocol', choices=sorted(PROTOCOLS))
+    parser.add_argument('input_file')
+    parser.add_argument('cache_size', type=int)
+    parser.add_argument('assoc', type=int)
+    parser.add_argument('block_size', type=int)
+    parser.add_argument('--engine', choices=sorted(scheduler.ENGINES),
+                        default='event',
+                        help='event skips idle cycles, cycle ticks every cycle '
+                             '(reference mode)')
+    parser.add_argument('--cache', choices=sorted(CACHES), default='array',
+                        help='array keeps flat arrays, list is the original '
+                             'list-of-pairs cache, LRU only')
+    parser.add_argument('--replacement', default='lru',
+                        choices=sorted(REPLACEMENT_POLICIES),
+                        help='replacement policy of the private caches and '
+                             'the LLC')
+    parser.add_argument('--cores', type=int, default=NUM_OF_CORES,
+                        help='number of cores, core N reads '
+                             '<input_file>_N.data, which may be compressed '
+                             '(.gz, .bz2, .xz, .zst)')
+    parser.add_argument('--snoop-filter', choices=sorted(SNOOP_FILTERS),
+                        default='off',
+                        help='snoop only controllers that may hold the block; '
+                             'verify also checks that no holder is skipped')
+    parser.add_argument('--bus', choices=BUS_MODELS, default='atomic',
+                        help='atomic holds the bus for a whole transaction, '
+                             'split frees it between request and response, '
+                             'directory sends point-to-point messages to '
+                             'the sharers only')
+    parser.add_argument('--max-outstanding', type=int,
+                        default=MAX_OUTSTANDING, metavar='N',
+                        help='transactions in flight on a split bus or '
+                             'directory home')
+    parser.add_argument('--banks', type=int, default=1, metavar='K',
+                        help='K independent buses, or directory homes, '
+                             'interleaved by block address')
+    parser.add_argument('--mshrs', type=int, default=0, metavar='N',
+                        help='non-blocking caches with N outstanding misses '
+                             'per core, 0 for blocking caches')
+    parser.add_argument('--mem-latency', type=int, metavar='CYCLES',
+                        help='cycles of a block transfer from memory, '
+                             'default 100')
+    parser.add_argument('--cache-latency', type=int, metavar='CYCLES',
+                        help='cycles of a block transfer from another cache, '
+                             'default the block size')
+    parser.add_argument('--hop-latency', type=int, default=HOP_LATENCY,
+                        metavar='CYCLES',
+                        help='cycles of a directory message between nodes')
+    parser.add_argument('--llc-size', type=int, metavar='BYTES',
+                        help='add a shared last-level cache of BYTES between '
+                             'the bus and memory')
+    parser.add_argument('--llc-assoc', type=int, default=8)
+    parser.add_argument('--llc-banks', type=int, default=1, metavar='K',
+                        help='LLC banks interleaved by block address')
+    parser.add_argument('--llc-latency', type=int, default=LLC_LATENCY,
+                        metavar='CYCLES', help='cycles of an LLC hit')
+    parser.add_argument('--llc-policy', choices=LLC_POLICIES,
+                        default=INCLUSIVE,
+                        help='inclusive LLCs back-invalidate the private '
+                             'copies of the blocks they evict')
+    parser.add_argument('--warmup', type=int, default=0, metavar='N',
+                        help='apply the first N loads/stores of every core '
+                             'without timing, then reset the statistics')
+    parser.add_argument('--sample-period', type=int, metavar='N',
+                        help='estimate the results by sampling: of every N '
+                             'loads/stores of a core, simulate the last '
+                             '--sample-window in detail')
+    parser.add_argument('--sample-window', type=int, default=1000,
+                        metavar='N')
+    parser.add_argument('--bus-trace', metavar='FILE',
+                        help='write the bus occupancy, queue depth and '
+                             'transactions over time to FILE (.npz)')
+    parser.add_argument('--bus-trace-interval', type=int,
+                        default=DEFAULT_INTERVAL, metavar='CYCLES',
+                        help='cycles per bucket of the bus trace')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time spent in each component')
+    parser.add_argument('--debug', action='store_true',
+                        help='log every instruction and bus transfer')
+    parser.add_argument('--checkpoint',
+                        help='checkpoint file, the run resumes from it if '
+                             'it exists')
+    parser.add_argument('--checkpoint-every', type=int, metavar='CYCLES',
+                        help='write the checkpoint every CYCLES cycles')
+    args = parser.parse_args()
+    if args.cores < 1:
+        parser.error('--cores must be at least 1')
+    if args.max_outstanding < 1:
+        parser.error('--max-outstanding must be at least 1')
+    if args.banks < 1:
+        parser.error('--banks must be at least 1')
+    if args.mshrs < 0:
+        parser.error('--mshrs cannot be negative')
+    if args.hop_latency < 0:
+        parser.error('--hop-latency cannot be negative')
+    if args.cache == 'list' and args.replacement != 'lru':
+        parser.error('--cache list only implements lru replacement')
+    if args.llc_assoc < 1 or args.llc_banks < 1:
+        parser.error('--llc-assoc and --llc-banks must be at least 1')
+    if args.replacement == 'plru' and not (
+            supports_tree(args.assoc) and
+            (not args.llc_size or supports_tree(args.llc_assoc))):
+        parser.error('--replacement plru needs power of two '
+                     'associativities up to 64')
+    llc = None
+    if args.llc_size:
+        llc = (args.llc_size, args.llc_assoc, args.llc_banks,
+               args.llc_latency, args.llc_policy)
+    for latency in [args.mem_latency, args.cache_latency, args.llc_latency]:
+        if latency is not None and latency < 1:
+            parser.error('latencies must be at least 1 cycle')
+    if args.checkpoint_every and not args.checkpoint:
+        parser.error('--checkpoint-every needs --checkpoint')
+    if args.sample_period and args.checkpoint:
+        parser.error('sampled runs cannot be checkpointed')
+    if args.bus_trace and (args.sample_period or args.checkpoint_every):
+        parser.error('--bus-trace needs a plain run, without sampling or '
+                     'checkpoints')
+
+    logging.basicConfig(format='%(levelname)s:%(message)s', level=logging.WARNING)
+    if args.debug:
+        instrumentation.enable_debug_logging()
+    if args.profile:
+        profiler = instrumentation.Profiler()
+        profiler.install()
+    print 'start time: ' + strftime("%H:%M:%S", gmtime())
+    start_time = time.time()
+
+    if args.sample_period:
+        results = simulate_sampled(args.protocol, args.input_file,
+                                   args.cache_size, args.assoc,
+                                   args.block_size, args.sample_period,
+                                   args.sample_window, args.engine,
+                                   args.cache, args.cores, args.snoop_filter,
+                                   args.bus, args.max_outstanding,
+                                   args.banks, args.mshrs, args.mem_latency,
+                                   args.cache_latency, args.hop_latency,
+                                   llc, args.replacement, args.warmup)
+    else:
+        processors, bus = simulate(args.protocol, args.input_file,
+                                   args.cache_size, args.assoc,
+                                   args.block_size, args.engine, args.cache,
+                                   args.cores, args.snoop_filter, args.bus,
+                                   args.max_outstanding, args.banks,
+                                   args.mshrs, args.mem_latency,
+                                   args.cache_latency, args.hop_latency,
+                                   llc, args.replacement, args.warmup,
+                                   args.checkpoint, args.checkpoint_every,
+                                   args.bus_trace, args.bus_trace_interval)
+        results = core_results(processors, bus)
+        if args.bus == 'directory':
+            print 'directory messages: %d' % bus.total_num_messages
+        shared_cache = getattr(bus, 'banks', [bus])[0].llc
+        if shared_cache:
+            print ('llc hits: %d, misses: %d, back-invalidations: %d, '
+                   'memory reads: %d, writes: %d' %
+                   (shared_cache.hits, shared_cache.misses,
+                    shared_cache.back_invalidations,
+                    shared_cache.memory_reads, shared_cache.memory_writes))
+    write_csv(args.input_file+args.protocol+'.csv', results, args.protocol,
+              args.cache_size, args.assoc, args.block_size)
+    if args.profile:
+        profiler.uninstall()
+        profiler.report(sys.stdout)
+
+    print 'time used in seconds: ' + str((time.time() - start_time))
+    print 'end time: ' + strftime("%H:%M:%S", gmtime())
+
+if __name__ == '__main__':
+    main()
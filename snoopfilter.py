@@ -0,0 +1,114 @@
+'''This module contains an optional snoop filter for the buses
+
+Without a filter, every BusRd/BusRdX/BusUpd/BusUpgr is snooped by every other
+cache controller on the bus. A controller that does not hold the block misses
+in its cache, leaves its LRU order alone and gives the default answer, so
+snooping it changes nothing. The filter keeps, per block, the set of
+controllers that may hold it, and the bus snoops only those that do, in bus
+order. Results are therefore identical with and without the filter.
+
+The set is maintained from what the bus sees:
+    - the sender of any transaction may hold the block afterwards
+    - the sender of a BusWB no longer holds the block, unless a
+      non-blocking cache filled it again since, e.g. by completing an
+      upgrade that was outstanding when the block was evicted
+Invalidations and clean evictions are not visible on the bus. Instead, the
+recorded holders of a block are checked with Cache.peek(), which does not
+touch LRU order, each time the block is snooped, and dropped once they no
+longer hold it. Whenever the number of blocks recorded doubles, every block
+is checked, and those no controller holds any more are forgotten, so the
+filter follows the blocks currently cached.
+'''
+
+# fewest blocks recorded before the filter is pruned
+PRUNE_MINIMUM = 1024
+
+class SnoopFilter(object):
+    '''Presence directory of the blocks cached by the controllers of a bus
+
+    verify: if True, every filtered snoop checks, without disturbing LRU
+        order, that no skipped controller holds the block
+    '''
+    def __init__(self, bus, verify=False):
+        self.bus = bus
+        self.block_size = bus.block_size
+        self.verify = verify
+
+        self.holders = {} # block number: set of cache controllers
+        self.order = {} # cache controller: position on the bus
+        self.active = set() # controllers still on the bus
+        self.limit = PRUNE_MINIMUM # number of blocks that triggers prune()
+
+    def targets(self, message):
+        '''Controllers to snoop for message, and record the sender as holder
+
+        return: list of cache controllers other than the sender holding the
+                block, in bus order
+        '''
+        list_of_cc = self.bus.list_of_cc
+        if len(self.active) != len(list_of_cc):
+            # controllers only ever leave the bus, when their core finishes
+            if not self.order:
+                self.order = dict((c, i) for i, c in enumerate(list_of_cc))
+            self.active = set(list_of_cc)
+
+        sender = message.sender
+        address = message.address
+        block = address / self.block_size
+        holders = self.holders.get(block)
+        if holders is None:
+            if len(self.holders) >= self.limit:
+                self.prune()
+            holders = self.holders[block] = set()
+
+        targets = []
+        for cache_controller in list(holders):
+            if cache_controller is sender:
+                continue
+            cache = cache_controller.cache
+            if cache.peek(address) == cache.default_state:
+                holders.discard(cache_controller)
+            elif cache_controller in self.active:
+                targets.append(cache_controller)
+        if len(targets) > 1:
+            targets.sort(key=self.order.get)
+        if self.verify:
+            self.check(message, targets)
+
+        holders.add(sender)
+        return targets
+
+    def writeback(self, message):
+        '''Record that the sender of a BusWB dropped the block'''
+        block = message.address / self.block_size
+        holders = self.holders.get(block)
+        cache = message.sender.cache
+        if holders and cache.peek(message.address) == cache.default_state:
+            holders.discard(message.sender)
+            if not holders:
+                del self.holders[block]
+
+    def prune(self):
+        '''Drop the holders that no longer hold their block, and forget the
+        blocks left without holders'''
+        for block, holders in self.holders.items():
+            address = block * self.block_size
+            for cache_controller in list(holders):
+                cache = cache_controller.cache
+                if cache.peek(address) == cache.default_state:
+                    holders.discard(cache_controller)
+            if not holders:
+                del self.holders[block]
+        self.limit = max(PRUNE_MINIMUM, 2 * len(self.holders))
+
+    def check(self, message, targets):
+        '''Raise AssertionError if a skipped controller holds the block'''
+        for cache_controller in self.bus.list_of_cc:
+            if (cache_controller is not message.sender and
+                    cache_controller not in targets):
+                cache = cache_controller.cache
+                state = cache.peek(message.address)
+                if state != cache.default_state:
+                    raise AssertionError(
+                        'snoop filter missed a sharer of %#x in state %s' %
+                        (message.address, state))
@@ -0,0 +1,157 @@
+'''Split-transaction variants of the buses of every protocol
+
+The atomic buses hold the bus from the moment a message is taken off msg_q
+until its data transfer ends. A split-transaction bus separates the two:
+
+    request phase: one queued message per cycle is put on the bus. Other
+        controllers snoop it at once, through the atomic bus'
+        start_transaction(), which also gives the latency of its transfer,
+        from a flushing cache or from memory.
+    response phase: once its latency has passed, a transaction answers its
+        sender. The data lines carry one response per cycle, the earliest
+        issued first when several are ready.
+
+Up to max_outstanding transactions are in flight between the two phases. A
+message to a block with a transaction in flight waits in msg_q, behind it,
+until the transaction ends, so the transactions of a block stay serialized;
+later messages to other blocks may be put on the bus before it. A BusUpgr or
+BusUpd completes during its request phase, as on the atomic bus.
+
+The controllers, snoop filters and the scheduler see the same interface as
+the atomic buses. countdown_memory is 0 while transactions are in flight and
+-1 otherwise, so that a busmonitor.BusMonitor counts the cycles with
+transactions in flight as busy.
+'''
+import heapq
+import logging
+
+from message import BUSWB
+from scheduler import INFINITY
+import dragon
+import mesi
+import moesi
+import msi
+import msiu
+
+# default number of transactions in flight
+MAX_OUTSTANDING = 8
+
+# set by instrumentation.enable_debug_logging()
+DEBUG = False
+
+class SplitTransactionBus(object):
+    '''Mixin turning an atomic bus class into a split-transaction bus
+
+    Listed before the atomic bus class in the bases of a bus class.
+    '''
+    def __init__(self, block_size, list_of_cc,
+                 max_outstanding=MAX_OUTSTANDING):
+        super(SplitTransactionBus, self).__init__(block_size, list_of_cc)
+        self.max_outstanding = max_outstanding
+        self.cycle = 0 # number of the next tick
+        # heap of (cycle the response is ready, issue number, message)
+        self.outstanding = []
+        self.num_issued = 0
+        # blocks with a transaction in flight
+        self.pending_blocks = set()
+
+    def tick(self):
+        '''Emulates a clock tick: a response phase, then a request phase'''
+        cycle = self.cycle
+        self.cycle += 1
+        outstanding = self.outstanding
+
+        if outstanding and outstanding[0][0] <= cycle:
+            _, _, message = heapq.heappop(outstanding)
+            self.pending_blocks.remove(message.address / self.block_size)
+            if message.title != BUSWB:
+                if DEBUG:
+                    logging.debug(message)
+                message.sender.receive_bus_message(message)
+
+        if len(outstanding) < self.max_outstanding:
+            message = self.next_request()
+            if message is not None:
+                self.msg_q.remove(message)
+                self.issue(message, cycle)
+
+        self.countdown_memory = 0 if outstanding else -1
+        return # method exit point 1, default exit point
+
+    def next_request(self):
+        '''return: the first queued message whose block has no transaction in
+                   flight, or None
+        '''
+        for message in self.msg_q:
+            if message.address / self.block_size not in self.pending_blocks:
+                return message
+        return None
+
+    def issue(self, message, cycle):
+        '''Request phase of message: snoop it, and unless it completes at
+        once, keep it in flight until the latency of its transfer passed
+        '''
+        self.active_message = message
+        self.countdown_memory = -1
+        self.countdown_cache = -1
+        self.start_transaction()
+
+        if self.countdown_cache >= 0:
+            latency = self.countdown_cache + 1
+        elif self.countdown_memory >= 0:
+            latency = self.countdown_memory + 1
+        else:
+            return # method exit point 1, completed during the snoop
+        self.countdown_cache = -1
+        heapq.heappush(self.outstanding,
+                       (cycle + latency, self.num_issued, message))
+        self.num_issued += 1
+        self.pending_blocks.add(message.address / self.block_size)
+        return # method exit point 2
+
+    def idle_cycles(self):
+        '''Number of upcoming ticks in which the bus would do nothing
+
+        return: 0 if the next tick does real work; INFINITY if nothing is in
+                flight and nothing is queued.
+        '''
+        outstanding = self.outstanding
+        if outstanding and outstanding[0][0] <= self.cycle:
+            return 0
+        if (len(outstanding) < self.max_outstanding and
+                self.next_request() is not None):
+            return 0
+        if outstanding:
+            return outstanding[0][0] - self.cycle
+        return INFINITY
+
+    def skip(self, cycles):
+        '''Apply the given number of idle ticks at once.
+
+        Must not exceed idle_cycles().
+        '''
+        self.cycle += cycles
+
+class BusMSISplit(SplitTransactionBus, msi.BusMSI):
+    '''Split-transaction bus for MSI protocol'''
+
+class BusMSIuSplit(SplitTransactionBus, msiu.BusMSIu):
+    '''Split-transaction bus for MSI protocol with BusUpgr'''
+
+class BusMESISplit(SplitTransactionBus, mesi.BusMESI):
+    '''Split-transaction bus for MESI protocol'''
+
+class BusMOESISplit(SplitTransactionBus, moesi.BusMOESI):
+    '''Split-transaction bus for MOESI protocol'''
+
+class BusDragonSplit(SplitTransactionBus, dragon.BusDragon):
+    '''Split-transaction bus for Dragon protocol'''
+
+# atomic bus class: its split-transaction variant
+SPLIT_BUSES = {
+    msi.BusMSI: BusMSISplit,
+    msiu.BusMSIu: BusMSIuSplit,
+    mesi.BusMESI: BusMESISplit,
+    moesi.BusMOESI: BusMOESISplit,
+    dragon.BusDragon: BusDragonSplit,
+}
@@ -0,0 +1,333 @@
+'''Run a grid of simulator configurations on a process pool
+
+Every (protocol, dataset, cores, cache size, associativity, block size) point
+of the grid is simulated in its own worker process. Results are appended to a
+single CSV table with one row per (configuration, core), as soon as each
+configuration finishes. A configuration is identified by its grid point and
+the options changing its results, i.e. all but the engine, the cache
+implementation and the snoop filter, which lead every row. Configurations that already have rows
+in the table are skipped, so an interrupted sweep resumes where it stopped.
+A sweep refuses to append to a table of other columns, e.g. written with
+other options.
+
+With --single-pass, all pending geometries of one (protocol, dataset, cores)
+are simulated together by one worker, which decodes the traces only once.
+
+With --sample-period, results are estimated by sampling (see sampling.py),
+and the table gets confidence interval columns.
+
+The grid is given on the command line, or in a JSON file whose keys are the
+long option names, e.g.
+    {"protocols": ["msi", "mesi"], "datasets": ["blackscholes"],
+     "cache_sizes": [1024, 8192], "assocs": [1, 2], "block_sizes": [16]}
+Options given on the command line take precedence over the file.
+'''
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+import scheduler
+import simulator
+import sampling
+
+# columns of a grid point
+CONFIG_FIELDS = ['protocol', 'dataset', 'cores', 'cache_size', 'assoc',
+                 'block_size']
+# options of sweep() that do not change the results, and are not columns
+NEUTRAL_OPTIONS = ['engine', 'cache', 'snoop_filter']
+
+class TableColumnsError(ValueError):
+    '''An existing table has the columns of a sweep with other options'''
+
+def option_fields(options):
+    '''return: the columns of the options changing the results, which
+               identify a configuration together with its grid point'''
+    return sorted(name for name in options if name not in NEUTRAL_OPTIONS)
+
+def table_fields(options):
+    '''return: the columns of the table of a sweep: a configuration, then
+               the per-core columns, of which DIRECTORY_FIELDS are empty
+               unless the bus model is a directory'''
+    fields = (CONFIG_FIELDS + option_fields(options) + ['core'] +
+              simulator.CORE_FIELDS + simulator.BUS_FIELDS +
+              simulator.DIRECTORY_FIELDS)
+    if options.get('sample_period'):
+        fields += sampling.SAMPLED_FIELDS
+    return fields
+
+def csv_value(value):
+    '''return: value as read back from the table'''
+    return '' if value is None else str(value)
+
+def config_key(config, options):
+    '''return: the values of the identifying columns of a configuration'''
+    return (tuple(map(csv_value, config)) +
+            tuple(csv_value(options[name]) for name in option_fields(options)))
+
+def table_rows(config, options, results):
+    '''return: the table rows of one finished configuration
+
+    results: the per-core results of the configuration
+    '''
+    rows = []
+    for core, result in enumerate(results):
+        row = dict(zip(CONFIG_FIELDS + option_fields(options),
+                       config_key(config, options)))
+        row['core'] = core
+        row.update(result)
+        rows.append(row)
+    return rows
+
+def run_config(job):
+    '''Worker: simulate one configuration
+
+    job: (list with one config, trace_dir, options), config in
+        CONFIG_FIELDS order, options the keyword arguments of simulate()
+
+    return: list of (config, list of table rows)
+    '''
+    (config,), trace_dir, options = job
+    protocol, dataset, cores, cache_size, assoc, block_size = config
+    simulate_options = dict(options)
+    sample_period = simulate_options.pop('sample_period', None)
+    sample_window = simulate_options.pop('sample_window', None)
+    input_file = os.path.join(trace_dir, dataset)
+    if sample_period:
+        results = simulator.simulate_sampled(
+            protocol, input_file, cache_size, assoc, block_size,
+            sample_period, sample_window, num_of_cores=cores,
+            **simulate_options)
+    else:
+        processors, bus = simulator.simulate(
+            protocol, input_file, cache_size, assoc, block_size,
+            num_of_cores=cores, **simulate_options)
+        results = simulator.core_results(processors, bus)
+    return [(config, table_rows(config, options, results))]
+
+def run_single_pass(job):
+    '''Worker: simulate configurations sharing protocol, dataset and core
+    count in one pass over the traces
+
+    job: (list of configs, trace_dir, options)
+
+    return: list of (config, list of table rows)
+    '''
+    configs, trace_dir, options = job
+    protocol, dataset, cores = configs[0][:3]
+    systems = simulator.simulate_many(
+        protocol, os.path.join(trace_dir, dataset),
+        [config[3:] for config in configs], num_of_cores=cores, **options)
+    return [(config, table_rows(config, options,
+                                simulator.core_results(processors, bus)))
+            for config, (processors, bus) in zip(configs, systems)]
+
+def finished_configs(filename, fields):
+    '''return: set of the config_key() of the configurations that already
+               have rows in filename
+
+    fields: columns of the table
+    raise TableColumnsError: if filename has other columns
+    '''
+    key_fields = fields[:fields.index('core')]
+    finished = set()
+    if not os.path.exists(filename):
+        return finished
+    with open(filename, 'rb') as table:
+        reader = csv.DictReader(table)
+        if reader.fieldnames is None: # empty table
+            return finished
+        if reader.fieldnames != fields:
+            raise TableColumnsError(filename + ' has the columns of a sweep '
+                                    'with other options')
+        for row in reader:
+            finished.add(tuple(row[field] for field in key_fields))
+    return finished
+
+def sweep(configs, output, trace_dir='.', jobs=None, single_pass=False,
+          **options):
+    '''Simulate every configuration not yet in output, jobs at a time
+
+    jobs: number of worker processes, all cores by default
+    single_pass: if True, each worker simulates all pending configurations of
+        one (protocol, dataset, cores), decoding its traces only once
+    options: passed on to simulator.simulate(), e.g. engine='cycle', or
+        sample_period and sample_window to simulate_sampled()
+
+    return: number of configurations simulated
+    raise TableColumnsError: if output has the columns of a sweep with
+        other options, which may not be sampled, or changes results
+        otherwise
+    '''
+    if options.get('sample_period'):
+        if single_pass:
+            raise ValueError('sampled configurations cannot be single pass')
+    else:
+        options.pop('sample_period', None)
+        options.pop('sample_window', None)
+    fields = table_fields(options)
+
+    finished = finished_configs(output, fields)
+    pending = [c for c in configs if config_key(c, options) not in finished]
+    if not pending:
+        return 0
+
+    is_new = not os.path.exists(output) or not os.path.getsize(output)
+    table = open(output, 'ab')
+    writer = csv.DictWriter(table, fields)
+    if is_new:
+        writer.writeheader()
+
+    pool = multiprocessing.Pool(jobs)
+    try:
+        if single_pass:
+            groups = {}
+            for config in pending:
+                groups.setdefault(config[:3], []).append(config)
+            worker = run_single_pass
+        else:
+            groups = dict((config, [config]) for config in pending)
+            worker = run_config
+        work = [(groups[key], trace_dir, options)
+                for key in sorted(groups)]
+        for results in pool.imap_unordered(worker, work):
+            for config, rows in results:
+                # a configuration is written in one go, so resuming never
+                # sees half of its cores
+                writer.writerows(rows)
+                table.flush()
+                print ' '.join(map(str, config))
+    finally:
+        pool.terminate()
+        table.close()
+    return len(pending)
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep')
+    parser.add_argument('--config', help='JSON file with the grid')
+    parser.add_argument('--protocols', nargs='+',
+                        choices=sorted(simulator.PROTOCOLS))
+    parser.add_argument('--datasets', nargs='+')
+    parser.add_argument('--cores', nargs='+', type=int)
+    parser.add_argument('--cache-sizes', nargs='+', type=int)
+    parser.add_argument('--assocs', nargs='+', type=int)
+    parser.add_argument('--block-sizes', nargs='+', type=int)
+    parser.add_argument('--trace-dir', default='.',
+                        help='directory holding the <dataset>_N.data traces')
+    parser.add_argument('--output', default='sweep.csv')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='worker processes, defaults to all cores')
+    parser.add_argument('--engine', choices=sorted(scheduler.ENGINES),
+                        default='event')
+    parser.add_argument('--cache', choices=sorted(simulator.CACHES),
+                        default='array')
+    parser.add_argument('--replacement', default='lru',
+                        choices=sorted(simulator.REPLACEMENT_POLICIES),
+                        help='replacement policy of every cache')
+    parser.add_argument('--snoop-filter',
+                        choices=sorted(simulator.SNOOP_FILTERS),
+                        default='off')
+    parser.add_argument('--bus', choices=simulator.BUS_MODELS,
+                        default='atomic')
+    parser.add_argument('--max-outstanding', type=int,
+                        default=simulator.MAX_OUTSTANDING)
+    parser.add_argument('--banks', type=int, default=1)
+    parser.add_argument('--mshrs', type=int, default=0,
+                        help='outstanding misses per core, 0 for blocking')
+    parser.add_argument('--mem-latency', type=int,
+                        help='cycles of a block transfer from memory')
+    parser.add_argument('--cache-latency', type=int,
+                        help='cycles of a block transfer from another cache')
+    parser.add_argument('--hop-latency', type=int,
+                        default=simulator.HOP_LATENCY,
+                        help='cycles of a directory message between nodes')
+    parser.add_argument('--llc-size', type=int,
+                        help='bytes of a shared last-level cache')
+    parser.add_argument('--llc-assoc', type=int, default=8)
+    parser.add_argument('--llc-banks', type=int, default=1)
+    parser.add_argument('--llc-latency', type=int,
+                        default=simulator.LLC_LATENCY,
+                        help='cycles of an LLC hit')
+    parser.add_argument('--llc-policy', choices=simulator.LLC_POLICIES,
+                        default=simulator.INCLUSIVE)
+    parser.add_argument('--warmup', type=int, default=0,
+                        help='loads/stores of every core to fast-forward')
+    parser.add_argument('--sample-period', type=int,
+                        help='estimate results by sampling, see simulator.py')
+    parser.add_argument('--sample-window', type=int, default=1000)
+    parser.add_argument('--single-pass', action='store_true',
+                        help='simulate all geometries of a protocol and '
+                             'dataset in one pass over its traces')
+    args = parser.parse_args()
+    if args.single_pass and args.sample_period:
+        parser.error('--single-pass cannot be used with --sample-period')
+    # the checks of simulator.py, before any worker starts
+    if args.max_outstanding < 1:
+        parser.error('--max-outstanding must be at least 1')
+    if args.banks < 1:
+        parser.error('--banks must be at least 1')
+    if args.mshrs < 0:
+        parser.error('--mshrs cannot be negative')
+    if args.hop_latency < 0:
+        parser.error('--hop-latency cannot be negative')
+    if args.cache == 'list' and args.replacement != 'lru':
+        parser.error('--cache list only implements lru replacement')
+    if args.llc_assoc < 1 or args.llc_banks < 1:
+        parser.error('--llc-assoc and --llc-banks must be at least 1')
+    for latency in [args.mem_latency, args.cache_latency, args.llc_latency]:
+        if latency is not None and latency < 1:
+            parser.error('latencies must be at least 1 cycle')
+
+    # the grid of the former msi.sh/mesi.sh/dragon.sh
+    grid = {'protocols': ['msi', 'mesi', 'dragon'],
+            'datasets': ['blackscholes', 'bodytrack', 'fluidanimate'],
+            'cores': [simulator.NUM_OF_CORES],
+            'cache_sizes': [1024, 8092, 32768],
+            'assocs': [1, 2, 4],
+            'block_sizes': [8, 32, 128]}
+    if args.config:
+        with open(args.config) as config_file:
+            grid.update(json.load(config_file))
+    for key in grid:
+        if getattr(args, key) is not None:
+            grid[key] = getattr(args, key)
+    if min(grid['cores']) < 1:
+        parser.error('--cores must be at least 1')
+    if args.replacement == 'plru' and not all(
+            map(simulator.supports_tree, grid['assocs'] +
+                ([args.llc_assoc] if args.llc_size else []))):
+        parser.error('--replacement plru needs power of two '
+                     'associativities up to 64')
+
+    llc = None
+    if args.llc_size:
+        llc = (args.llc_size, args.llc_assoc, args.llc_banks,
+               args.llc_latency, args.llc_policy)
+    configs = list(itertools.product(grid['protocols'], grid['datasets'],
+                                     grid['cores'], grid['cache_sizes'],
+                                     grid['assocs'],
+                                     grid['block_sizes']))
+    start_time = time.time()
+    try:
+        count = sweep(configs, args.output, args.trace_dir, args.jobs,
+                      args.single_pass, engine=args.engine, cache=args.cache,
+                      snoop_filter=args.snoop_filter, bus_model=args.bus,
+                      max_outstanding=args.max_outstanding,
+                      num_of_banks=args.banks, num_of_mshrs=args.mshrs,
+                      mem_latency=args.mem_latency,
+                      cache_latency=args.cache_latency,
+                      hop_latency=args.hop_latency, llc=llc,
+                      replacement=args.replacement, warmup=args.warmup,
+                      sample_period=args.sample_period,
+                      sample_window=args.sample_window)
+    except TableColumnsError as error:
+        parser.error(str(error) + ', give another --output')
+    print (str(count) + ' configurations simulated, ' +
+           str(len(configs) - count) + ' already done')
+    print 'time used in seconds: ' + str((time.time() - start_time))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+'''Run every protocol on interleaved banks of atomic and split-transaction
+buses, with both engines'''
+import os
+import tempfile
+import bench
+import busmonitor
+import scheduler
+import simulator
+from message import BusMessage, BUSREAD
+
+directory = tempfile.mkdtemp()
+traces = simulator.trace_files(
+    bench.generate(directory, 'migratory', 500, 4), 4)
+
+for protocol in sorted(simulator.PROTOCOLS):
+    for bus_model in simulator.BUS_MODELS:
+        results = []
+        for engine in sorted(scheduler.ENGINES):
+            processors, bus, list_of_cc = simulator.build(
+                protocol, traces, 1024, 2, 16, 'array', 'verify', bus_model,
+                4, 4)
+            filename = os.path.join(directory, 'banks.npz')
+            monitor = busmonitor.BusMonitor(bus, filename, 1000)
+            scheduler.run(engine, processors, bus, list_of_cc, monitor)
+            monitor.close()
+            results.append(simulator.core_results(processors, bus))
+
+            series = busmonitor.load(filename)
+            assert (sum(series['transactions']) ==
+                    sum(bank.total_num_transactions for bank in bus.banks))
+            assert all(busy <= 4 * 1000 for busy in series['busy_cycles'])
+        assert results[0] == results[1]
+        print protocol, bus_model, [bank.total_num_transactions
+                                    for bank in bus.banks]
+
+    # the statistics of every bank are reset after a warm-up
+    processors, bus, list_of_cc = simulator.build(
+        protocol, traces, 1024, 2, 16, num_of_banks=4)
+    scheduler.fast_forward(processors, bus, 100)
+    assert bus.total_num_transactions == 0
+    assert bus.total_bytes_passed_on_bus == 0
+
+# blocks are interleaved over the banks, and only the banks given a message
+# are busy
+processors, bus, list_of_cc = simulator.build('mesi', traces, 1024, 2, 16,
+                                              num_of_banks=4)
+for address in [0x0, 0x4, 0x10, 0x30, 0x40]:
+    bus.queue_message(BusMessage(BUSREAD, list_of_cc[0], address))
+assert [len(bank.msg_q) for bank in bus.banks] == [3, 1, 0, 1]
+assert bus.active == [0, 1, 3]
+assert bus.idle_cycles() == 0
+print 'finished'
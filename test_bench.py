@@ -0,0 +1,26 @@
+'''Check that benchmark workloads are reproducible and regressions detected'''
+import filecmp
+import tempfile
+import bench
+import simulator
+
+for workload in sorted(bench.WORKLOADS):
+    first = bench.generate(tempfile.mkdtemp(), workload, 500, 4)
+    second = bench.generate(tempfile.mkdtemp(), workload, 500, 4)
+    for a, b in zip(simulator.trace_files(first, 4),
+                    simulator.trace_files(second, 4)):
+        assert filecmp.cmp(a, b, shallow=False)
+    print workload + ' traces are reproducible'
+
+key, result = bench.run_case(('mesi', 'migratory', 'tiny', 500, 4, first,
+                              {'cache_size': 1024, 'assoc': 1,
+                               'block_size': 16}))
+print key, result
+assert result['instructions'] == 2000 and result['transactions'] > 0
+
+slower = dict(result, instructions_per_second=
+              result['instructions_per_second'] * 0.5)
+assert bench.compare({key: result}, {key: result}, 0.1) == []
+assert bench.compare({key: slower}, {key: result}, 0.1)[0][1] == \
+    'instructions_per_second'
+print 'finished'
@@ -0,0 +1,49 @@
+'''Record the bus time series of synthetic runs with both engines and check
+it against the bus' own counters'''
+import os
+import tempfile
+import bench
+import busmonitor
+import scheduler
+import simulator
+
+directory = tempfile.mkdtemp()
+traces = simulator.trace_files(
+    bench.generate(directory, 'migratory', 500, 4), 4)
+for protocol in sorted(simulator.PROTOCOLS):
+    series = []
+    for engine in sorted(scheduler.ENGINES):
+        processors, bus, list_of_cc = simulator.build(protocol, traces, 1024,
+                                                      2, 16)
+        filename = os.path.join(directory, protocol + engine + '.npz')
+        monitor = busmonitor.BusMonitor(bus, filename, 1000)
+        scheduler.run(engine, processors, bus, list_of_cc, monitor)
+        monitor.close()
+        series.append(busmonitor.load(filename))
+
+        columns = series[-1]
+        assert sorted(columns) == sorted(busmonitor.FIELDS)
+        assert sum(columns['transactions']) == bus.total_num_transactions
+        assert sum(columns['transactions']) == sum(
+            sum(columns[title]) for title in busmonitor.TITLE_NAMES)
+        assert list(columns['cycle']) == range(0, monitor.cycle, 1000)
+        assert all(busy <= 1000 for busy in columns['busy_cycles'])
+    assert series[0] == series[1]
+    print protocol, sum(series[0]['transactions']), 'transactions'
+
+# a state lasting across buckets is split between them
+class Bus(object):
+    active_message = None
+    countdown_memory = 3
+    msg_q = [None, None]
+
+filename = os.path.join(directory, 'split.npz')
+monitor = busmonitor.BusMonitor(Bus(), filename, 10)
+monitor.record(25)
+monitor.close()
+columns = busmonitor.load(filename)
+assert list(columns['cycle']) == [0, 10, 20]
+assert list(columns['busy_cycles']) == [10, 10, 5]
+assert list(columns['queue_depth_sum']) == [20, 20, 10]
+assert list(columns['queue_depth_max']) == [2, 2, 2]
+print 'finished'
@@ -15,3 +15,26 @@ return0 = mycache.set_state(0, 'shared')
 print 'return0:' + str(return0)
 
 print 'get 2970:' + str(mycache.get_state(2970))
+
+# ArrayCache must behave exactly like Cache, including evictions
+import random
+from cache import ArrayCache
+
+for (cache_size, block_size, assoc) in [(1024, 16, 1), (8092, 32, 2),
+                                        (4096, 8, 4), (1024, 128, 4)]:
+    reference = Cache(cache_size, block_size, assoc, 'invalid')
+    compact = ArrayCache(cache_size, block_size, assoc, 'invalid')
+    rand = random.Random(0)
+    for i in xrange(20000):
+        address = rand.randint(0, 64 * cache_size)
+        if rand.random() < 0.5:
+            assert reference.get_state(address) == compact.get_state(address)
+        else:
+            state = reference.get_state(address)
+            compact.get_state(address)
+            new_state = rand.choice(['invalid', 'shared', 'modified'])
+            if state == 'invalid' and new_state == 'invalid':
+                continue # Cache keeps a line for this, ArrayCache does not
+            assert (reference.set_state(address, new_state) ==
+                    compact.set_state(address, new_state))
+    print 'ArrayCache matches Cache: %d %d %d' % (cache_size, block_size, assoc)
@@ -0,0 +1,57 @@
+'''Interrupt simulations, restore them from a checkpoint, and check that
+the results are those of the uninterrupted runs'''
+import gzip
+import os
+import tempfile
+import bench
+import checkpoint
+import scheduler
+import simulator
+
+directory = tempfile.mkdtemp()
+text_traces = []
+compressed_traces = []
+for core in range(4):
+    text_traces.append(os.path.join(directory, 'm_%d.data' % core))
+    compressed_traces.append(text_traces[-1] + '.gz')
+    lines = ['%d %x\n' % instr
+             for instr in bench.instructions('migratory', core, 4, 1000)]
+    with open(text_traces[-1], 'w') as trace:
+        trace.writelines(lines)
+    trace = gzip.open(compressed_traces[-1], 'wb')
+    trace.writelines(lines)
+    trace.close()
+
+filename = os.path.join(directory, 'checkpoint.gz')
+for traces in [text_traces, compressed_traces]:
+    for protocol in sorted(simulator.PROTOCOLS):
+        processors, bus, list_of_cc = simulator.build(protocol, traces, 1024,
+                                                      2, 16, 'list', 'on')
+        scheduler.run('cycle', processors, bus, list_of_cc)
+        expected = simulator.core_results(processors, bus)
+
+        for stop_cycle in [1, 2000, 10000]:
+            processors, bus, list_of_cc = simulator.build(
+                protocol, traces, 1024, 2, 16, 'list', 'on')
+            for _ in scheduler.ENGINES['event'](processors, bus, list_of_cc):
+                if checkpoint.current_cycle(processors) >= stop_cycle:
+                    break
+            checkpoint.save(filename, (processors, bus, list_of_cc))
+
+            # finish with the other engine, from the restored copy
+            _, (processors, bus, list_of_cc) = checkpoint.load(filename)
+            scheduler.run('cycle', processors, bus, list_of_cc)
+            assert simulator.core_results(processors, bus) == expected
+        print protocol + ' ' + traces[0] + ' restored identically'
+
+# periodic checkpoints through simulate(), then resuming from the last one
+input_file = os.path.join(directory, 'm')
+filename = os.path.join(directory, 'periodic.gz')
+processors, bus = simulator.simulate('mesi', input_file, 1024, 2, 16,
+                                     checkpoint_file=filename,
+                                     checkpoint_interval=5000)
+expected = simulator.core_results(processors, bus)
+processors, bus = simulator.simulate('mesi', input_file, 1024, 2, 16,
+                                     checkpoint_file=filename)
+assert simulator.core_results(processors, bus) == expected
+print 'finished'
@@ -0,0 +1,73 @@
+'''Run every protocol on directory homes with both engines, and check the
+timing and the targets of the messages of a home'''
+import tempfile
+import bench
+import directory
+import scheduler
+import simulator
+from message import BusMessage, BUSREAD, BUSREADX
+
+temp = tempfile.mkdtemp()
+traces = simulator.trace_files(
+    bench.generate(temp, 'migratory', 500, 4), 4)
+
+for protocol in sorted(simulator.PROTOCOLS):
+    for num_of_banks, hop_latency in [(1, 10), (4, 10), (4, 0)]:
+        results = []
+        for engine in sorted(scheduler.ENGINES):
+            processors, bus, list_of_cc = simulator.build(
+                protocol, traces, 1024, 2, 16, 'array', 'verify', 'directory',
+                4, num_of_banks, hop_latency=hop_latency)
+            scheduler.run(engine, processors, bus, list_of_cc)
+            results.append(simulator.core_results(processors, bus))
+        assert results[0] == results[1]
+        # a request, and a reply unless it completed at the home
+        assert bus.total_num_messages >= bus.total_num_transactions
+        assert results[0][0]['total_num_messages'] == bus.total_num_messages
+        assert not any(bank.arriving or bank.outstanding
+                       for bank in getattr(bus, 'banks', [bus]))
+        print protocol, num_of_banks, hop_latency, bus.total_num_messages, \
+            [result['cycle_count'] for result in results[0]]
+
+# a read is served by memory, a read for exclusive reaches the sharers only
+class Controller(object):
+    default_state = 0
+
+    def __init__(self):
+        self.cache = self
+        self.state = 0
+        self.snooped = []
+        self.completed = []
+
+    def peek(self, address):
+        return self.state
+
+    def receive_bus_message(self, message):
+        if message.sender is self:
+            self.completed.append(home.cycle - 1)
+            self.state = 1
+            return None
+        self.snooped.append(message.title)
+        if message.title == BUSREADX:
+            self.state = 0
+            return None # no flush
+        return (None, False) # no flush, not shared
+
+controllers = [Controller() for _ in range(4)]
+home = directory.HomeMESI(16, controllers, 4, 10)
+home.snoop_filter = directory.Directory(home)
+for index in [0, 1]:
+    home.queue_message(BusMessage(BUSREAD, controllers[index], 0x40))
+    scheduler.drain(home)
+home.queue_message(BusMessage(BUSREADX, controllers[3], 0x40))
+scheduler.drain(home)
+# a hop to the home, the memory latency, and a hop back
+assert [controller.completed for controller in controllers] == [
+    [120], [241], [], [362]]
+assert [controller.snooped for controller in controllers] == [
+    [BUSREAD, BUSREADX], [BUSREADX], [], []]
+# request and data per read; request, 2 invalidations, 2 acknowledgements
+# and data for the read for exclusive
+assert home.total_num_messages == 10
+assert home.snoop_filter.sharers == {0x40 / 16: 1 << 3}
+print 'finished'
@@ -0,0 +1,68 @@
+'''Profile a run of the sample traces, check that the profiler leaves no
+trace once uninstalled, and that debug logging covers every bus'''
+import logging
+import sys
+import instrumentation
+import processor
+import scheduler
+import simulator
+
+original_tick = vars(processor.Processor)['tick']
+for protocol in sorted(simulator.PROTOCOLS):
+    processors, bus, list_of_cc = simulator.build(
+        protocol, ['t_0.txt', 't_1.txt'], 64, 1, 16)
+    scheduler.run('cycle', processors, bus, list_of_cc)
+    expected = simulator.core_results(processors, bus)
+
+    profiler = instrumentation.Profiler()
+    profiler.install()
+    processors, bus, list_of_cc = simulator.build(
+        protocol, ['t_0.txt', 't_1.txt'], 64, 1, 16)
+    scheduler.run('cycle', processors, bus, list_of_cc)
+    profiler.uninstall()
+    assert simulator.core_results(processors, bus) == expected
+    assert vars(processor.Processor)['tick'] is original_tick
+
+    # both cores tick until they finish, every access is counted once
+    assert profiler.calls['processor.tick'] == sum(
+        p.cycle_count for p in processors)
+    assert (profiler.calls['controller.access PrRd'] +
+            profiler.calls['controller.access PrWr'] == 7)
+    for label in profiler.exclusive:
+        assert profiler.exclusive[label] <= profiler.inclusive[label] + 1e-9
+    print protocol
+    profiler.report(sys.stdout)
+
+# non-blocking processors are profiled too
+profiler = instrumentation.Profiler()
+profiler.install()
+processors, bus, list_of_cc = simulator.build(
+    'mesi', ['t_0.txt', 't_1.txt'], 64, 1, 16, num_of_mshrs=2)
+scheduler.run('event', processors, bus, list_of_cc)
+profiler.uninstall()
+assert profiler.calls['processor.tick'] > 0
+
+class Transfers(logging.Handler):
+    '''Count the bus transfers logged'''
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.count = 0
+
+    def emit(self, record):
+        if not isinstance(record.msg, str):
+            self.count += 1
+
+handler = Transfers()
+logging.getLogger().addHandler(handler)
+instrumentation.enable_debug_logging()
+for protocol in sorted(simulator.PROTOCOLS):
+    for bus_model in simulator.BUS_MODELS:
+        handler.count = 0
+        processors, bus, list_of_cc = simulator.build(
+            protocol, ['t_0.txt', 't_1.txt'], 64, 1, 16,
+            bus_model=bus_model)
+        scheduler.run('event', processors, bus, list_of_cc)
+        assert handler.count > 0, (protocol, bus_model)
+logging.getLogger().removeHandler(handler)
+print 'every bus logs its transfers'
+print 'finished'
@@ -0,0 +1,69 @@
+'''Run every protocol with a shared last-level cache of each policy, and check
+its hit path and back-invalidations'''
+import tempfile
+import bench
+import cache
+import llc
+import scheduler
+import simulator
+from message import BusMessage, BUSREAD, BUSWB
+
+directory = tempfile.mkdtemp()
+input_file = bench.generate(directory, 'migratory', 500, 4)
+traces = simulator.trace_files(input_file, 4)
+
+for protocol in sorted(simulator.PROTOCOLS):
+    for policy in llc.POLICIES:
+        results = []
+        for engine in sorted(scheduler.ENGINES):
+            processors, bus, list_of_cc = simulator.build(
+                protocol, traces, 1024, 2, 16, 'array', 'verify', 'split',
+                4, 2, llc=(2048, 4, 2, 20, policy))
+            scheduler.run(engine, processors, bus, list_of_cc)
+            results.append(simulator.core_results(processors, bus))
+        assert results[0] == results[1]
+        shared_cache = bus.banks[0].llc
+        assert shared_cache is bus.banks[1].llc
+        if policy != llc.INCLUSIVE:
+            assert shared_cache.back_invalidations == 0
+        print protocol, policy, shared_cache.hits, shared_cache.misses, \
+            [result['cycle_count'] for result in results[0]]
+
+# a large LLC keeps the misses of a private working set off memory
+cycles = []
+for size in [None, 65536]:
+    processors, bus = simulator.simulate(
+        'mesi', bench.generate(directory, 'private', 500, 4), 256, 2, 16,
+        llc=size and (size, 8, 1, 20, llc.INCLUSIVE))
+    cycles.append(max(processor.cycle_count for processor in processors))
+assert cycles[1] < cycles[0]
+print 'private cycles, without and with an LLC:', cycles
+
+# an LLC hit takes hit_latency, a miss the lookup and memory; the eviction
+# of an inclusive LLC invalidates the private copies
+processors, bus, list_of_cc = simulator.build(
+    'mesi', traces, 1024, 2, 16, llc=(16, 1, 1, 20, llc.INCLUSIVE))
+shared_cache = bus.llc
+latencies = []
+for address in [0x0, 0x0, 0x10]:
+    bus.queue_message(BusMessage(BUSREAD, list_of_cc[0], address,
+                                 callback=lambda: None))
+    bus.tick()
+    latencies.append(bus.countdown_memory + 1)
+    scheduler.drain(bus)
+assert latencies == [120, 20, 120]
+assert shared_cache.back_invalidations == 1
+assert list_of_cc[0].cache.peek(0x0) == list_of_cc[0].cache.default_state
+assert list_of_cc[0].cache.peek(0x10) != list_of_cc[0].cache.default_state
+
+# a BusWB fills an exclusive LLC, whose hits then leave it
+shared_cache = llc.SharedCache(cache.Cache, 64, 16, 1, [], 2,
+                               policy=llc.EXCLUSIVE)
+bus.llc = shared_cache
+for title in [BUSWB, BUSREAD, BUSREAD]:
+    bus.queue_message(BusMessage(title, list_of_cc[1], 0x40,
+                                 callback=lambda: None))
+    scheduler.drain(bus)
+assert (shared_cache.hits, shared_cache.misses) == (1, 1)
+assert shared_cache.memory_writes == 1
+print 'finished'
@@ -0,0 +1,58 @@
+'''Run MOESI on synthetic traces, and check that an owner supplies its
+dirty block without involving memory'''
+import tempfile
+import bench
+import moesi
+import scheduler
+import simulator
+from scheduler import INFINITY
+
+directory = tempfile.mkdtemp()
+for workload in ['migratory', 'producer_consumer']:
+    traces = simulator.trace_files(
+        bench.generate(directory, workload, 500, 4), 4)
+    addresses = set(address for core in range(4) for op, address in
+                    bench.instructions(workload, core, 4, 500) if op != 2)
+    for bus_model in simulator.BUS_MODELS:
+        results = []
+        for engine in sorted(scheduler.ENGINES):
+            processors, bus, list_of_cc = simulator.build(
+                'moesi', traces, 1024, 2, 16, 'array', 'verify', bus_model)
+            scheduler.run(engine, processors, bus, list_of_cc)
+            results.append(simulator.core_results(processors, bus))
+        assert results[0] == results[1]
+
+        # one owner at most, and no other copy of an exclusive block
+        for address in addresses:
+            states = [cc.cache.peek(address) for cc in list_of_cc]
+            owners = [state for state in states if state in
+                      (moesi.EXCLUSIVE, moesi.OWNED, moesi.MODIFIED)]
+            assert len(owners) <= 1
+            if moesi.EXCLUSIVE in owners or moesi.MODIFIED in owners:
+                assert states.count(moesi.INVALID) == len(states) - 1
+        print workload, bus_model, [r['cycle_count'] for r in results[0]]
+
+# a dirty block read by another core becomes owned, and the bus is only held
+# for the cache-cache transfer
+for protocol, held in [('mesi', True), ('moesi', False)]:
+    processors, bus, list_of_cc = simulator.build(
+        protocol, ['t_0.txt', 't_1.txt'], 1024, 1, 16)
+    completed = []
+    list_of_cc[0].prwr(0x40, lambda: completed.append(0))
+    scheduler.drain(bus)
+    list_of_cc[1].prrd(0x40, lambda: completed.append(1))
+    cycles = 0
+    while len(completed) < 2:
+        bus.tick()
+        cycles += 1
+    assert cycles == 1 + 16
+    assert (bus.idle_cycles() != INFINITY) == held
+moesi_states = [cc.cache.peek(0x40) for cc in list_of_cc]
+assert moesi_states == [moesi.OWNED, moesi.SHARED]
+
+list_of_cc[1].prwr(0x40, lambda: None)
+scheduler.drain(bus)
+assert [cc.cache.peek(0x40) for cc in list_of_cc] == [moesi.INVALID,
+                                                      moesi.MODIFIED]
+assert bus.total_num_evictions == 0
+print 'finished'
@@ -0,0 +1,83 @@
+'''Check stack distances against an explicit LRU stack, exact miss ratio
+curves against ArrayCache, and the bounds of sampled curves'''
+import os
+import random
+import tempfile
+import bench
+import mrc
+import simulator
+from cache import ArrayCache
+from tracefile import open_trace, write_trace
+
+# distances across many compactions of the tree
+rand = random.Random(0)
+stack = mrc.StackDistance(mrc.MIN_CAPACITY)
+lru = [] # most recently used last
+for _ in xrange(5000):
+    block = int(rand.paretovariate(1.2))
+    expected = None
+    if block in lru:
+        expected = len(lru) - 1 - lru.index(block)
+        lru.remove(block)
+    lru.append(block)
+    assert stack.reference(block) == expected
+print 'stack distances match'
+
+def loads_and_stores(trace):
+    addresses = []
+    reader = open_trace(trace)
+    chunk = reader.next_chunk()
+    while chunk is not None:
+        addresses.extend(value for op, value in zip(*chunk) if op != 2)
+        chunk = reader.next_chunk()
+    return addresses
+
+def miss_ratio(addresses, cache_size, block_size, assoc):
+    '''return: miss ratio of an LRU ArrayCache over addresses'''
+    cache = ArrayCache(cache_size, block_size, assoc, 'I')
+    misses = 0
+    for address in addresses:
+        if cache.get_state(address) == 'I':
+            misses += 1
+            cache.set_state(address, 'S')
+    return misses / float(len(addresses))
+
+directory = tempfile.mkdtemp()
+for workload in ['migratory', 'read_mostly']:
+    trace = simulator.trace_files(
+        bench.generate(directory, workload, 2000, 4), 4)[1]
+    addresses = loads_and_stores(trace)
+    for block_size in [8, 32]:
+        configs = mrc.geometries([256, 1024, 8092], [1, 2, 4], block_size)
+        curves = mrc.analyze(trace, block_size,
+                             set(num_of_sets for _, _, num_of_sets in configs
+                                 if num_of_sets))
+        assert curves.num_of_references == len(addresses)
+        for cache_size, assoc, num_of_sets in configs:
+            num_of_blocks = cache_size / block_size
+            expected = miss_ratio(addresses, cache_size, block_size,
+                                  assoc or num_of_blocks)
+            assert abs(curves.miss_ratio(num_of_blocks, num_of_sets) -
+                       expected) < 1e-12
+        print workload, block_size, 'exact curves match ArrayCache'
+
+# sampled curves of a larger footprint
+trace = os.path.join(directory, 'skewed_0.data')
+write_trace(trace, ((0, int(rand.paretovariate(0.8)) * 16)
+                    for _ in xrange(50000)), 0)
+configs = mrc.geometries([1024, 16384], [1, 4], 16)
+set_counts = set(num_of_sets for _, _, num_of_sets in configs if num_of_sets)
+exact = mrc.analyze(trace, 16, set_counts)
+for rate, max_blocks in [(0.25, None), (1.0, 500)]:
+    sampled = mrc.analyze(trace, 16, set_counts, rate, max_blocks)
+    errors = [sampled.miss_ratio(cache_size / 16, num_of_sets) -
+              exact.miss_ratio(cache_size / 16, num_of_sets)
+              for cache_size, _, num_of_sets in configs]
+    assert max(abs(error) for error in errors) < 0.05
+    if max_blocks:
+        assert len(sampled.full.stack.last) <= max_blocks
+        assert all(curve.num_of_blocks <= max_blocks
+                   for curve in sampled.sets.itervalues())
+    print 'rate', rate, 'max blocks', max_blocks, 'errors', \
+        [round(error, 3) for error in errors]
+print 'finished'
@@ -0,0 +1,75 @@
+'''Run non-blocking caches with MSHRs on every protocol, and check the
+merging of secondary misses'''
+import os
+import tempfile
+import bench
+import checkpoint
+import scheduler
+import simulator
+from protocol import PRRD, PRWR
+
+directory = tempfile.mkdtemp()
+input_file = bench.generate(directory, 'migratory', 500, 4)
+traces = simulator.trace_files(input_file, 4)
+num_of_accesses = [sum(1 for op, _ in bench.instructions('migratory', core, 4,
+                                                         500) if op != 2)
+                   for core in range(4)]
+
+for protocol in sorted(simulator.PROTOCOLS):
+    results_of = {}
+    for bus_model in simulator.BUS_MODELS:
+        results = results_of[bus_model] = []
+        for engine in sorted(scheduler.ENGINES):
+            processors, bus, list_of_cc = simulator.build(
+                protocol, traces, 1024, 2, 16, 'array', 'verify', bus_model,
+                num_of_mshrs=4)
+            scheduler.run(engine, processors, bus, list_of_cc)
+            results.append(simulator.core_results(processors, bus))
+            for processor in processors:
+                assert processor.num_outstanding == 0
+                assert not processor.cache_controller.mshrs
+        assert results[0] == results[1]
+        for result, accesses in zip(results[0], num_of_accesses):
+            assert result['hit_count'] + result['miss_count'] == accesses
+        print protocol, bus_model, [r['cycle_count'] for r in results[0]]
+
+    # a checkpoint taken with misses outstanding
+    processors, bus, list_of_cc = simulator.build(
+        protocol, traces, 1024, 2, 16, 'list', 'on', 'split', num_of_mshrs=4)
+    for _ in scheduler.ENGINES['event'](processors, bus, list_of_cc):
+        if checkpoint.current_cycle(processors) >= 1000:
+            break
+    filename = os.path.join(directory, protocol + '.gz')
+    checkpoint.save(filename, (processors, bus, list_of_cc))
+    _, (processors, bus, list_of_cc) = checkpoint.load(filename)
+    scheduler.run('cycle', processors, bus, list_of_cc)
+    assert simulator.core_results(processors, bus) == results_of['split'][0]
+
+# independent misses overlap
+cycles = []
+for num_of_mshrs in [0, 4]:
+    processors, bus = simulator.simulate(
+        'mesi', bench.generate(directory, 'private', 500, 4), 1024, 2, 16,
+        bus_model='split', num_of_mshrs=num_of_mshrs)
+    cycles.append(max(processor.cycle_count for processor in processors))
+assert cycles[1] < cycles[0]
+print 'private cycles, blocking and 4 MSHRs:', cycles
+
+# secondary misses are merged, a store waits for a load miss of its block,
+# and a miss waits for a free MSHR
+processors, bus, list_of_cc = simulator.build('msi', traces, 1024, 2, 16,
+                                              num_of_mshrs=2)
+cache_controller = list_of_cc[0]
+completed = []
+cache_controller.prrd(0x100, lambda: completed.append(0x100))
+cache_controller.prrd(0x104, lambda: completed.append(0x104))
+assert len(bus.msg_q) == 1 and cache_controller.miss_count == 2
+assert cache_controller.accepts(PRRD, 0x108)
+assert not cache_controller.accepts(PRWR, 0x108)
+cache_controller.prwr(0x200, lambda: completed.append(0x200))
+assert not cache_controller.accepts(PRRD, 0x300)
+scheduler.drain(bus)
+assert completed == [0x100, 0x104, 0x200]
+assert cache_controller.accepts(PRWR, 0x108)
+assert cache_controller.accepts(PRRD, 0x300)
+print 'finished'
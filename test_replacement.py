@@ -0,0 +1,61 @@
+'''Check the victims of every replacement policy in a single set, and run the
+simulator with each of them'''
+import tempfile
+import bench
+import scheduler
+import simulator
+from cache import ArrayCache
+from replacement import POLICIES
+
+def victims(replacement, touches, num_of_fills=2):
+    '''Fill the 4 ways of a set with blocks 0-3, read blocks touches, then
+    insert num_of_fills new blocks
+
+    return: the blocks evicted by the new blocks
+    '''
+    cache = ArrayCache(64, 16, 4, 'I', replacement)
+    for block in range(4):
+        assert cache.set_state(block * 16, 'S') is None
+    for block in touches:
+        assert cache.get_state(block * 16) == 'S'
+    return [cache.set_state(block * 16, 'S')['address'] / 16
+            for block in range(4, 4 + num_of_fills)]
+
+assert victims('lru', [0]) == [1, 2]
+assert victims('fifo', [0]) == [0, 1]
+# the tree points away from 0, then from 3 and 2 within the right half
+assert victims('plru', [0]) == [2, 1]
+# filling block 3 referenced every way, so only 3 kept its bit
+assert victims('nru', []) == [0, 1]
+assert victims('nru', [0]) == [1, 2]
+# every way is inserted at 2, a hit brings block 1 to 0
+assert victims('srrip', [1]) == [0, 2]
+# once every way is hit, the set ages and the new blocks replace the old
+assert victims('srrip', [0, 1, 2, 3], 3) == [0, 1, 2]
+# unlike SRRIP, a new block is predicted distant, and evicted again first
+assert victims('brrip', [0, 1, 2, 3], 3) == [0, 4, 5]
+assert victims('random', []) == victims('random', [])
+assert len(set(victims('random', [], 20))) > 1
+print 'victims of every policy'
+
+# a full cache evicts under every policy
+for replacement in sorted(POLICIES):
+    cache = ArrayCache(1024, 16, 4, 'I', replacement)
+    for address in range(0, 1024, 16):
+        assert cache.set_state(address, 'M') is None
+    assert cache.set_state(1024, 'M')['state'] == 'M'
+
+directory = tempfile.mkdtemp()
+traces = simulator.trace_files(
+    bench.generate(directory, 'migratory', 500, 4), 4)
+for replacement in sorted(POLICIES):
+    results = []
+    for engine in sorted(scheduler.ENGINES):
+        processors, bus, list_of_cc = simulator.build(
+            'mesi', traces, 256, 4, 16, 'array', 'verify',
+            llc=(1024, 4, 1, 20, 'inclusive'), replacement=replacement)
+        scheduler.run(engine, processors, bus, list_of_cc)
+        results.append(simulator.core_results(processors, bus))
+    assert results[0] == results[1]
+    print replacement, [result['miss_count'] for result in results[0]]
+print 'finished'
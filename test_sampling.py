@@ -0,0 +1,41 @@
+'''Sample synthetic traces, and check the estimates against full runs'''
+import tempfile
+import bench
+import sampling
+import scheduler
+import simulator
+
+for protocol in sorted(simulator.PROTOCOLS):
+    # with one core, a single window covering the whole trace is exact
+    traces = simulator.trace_files(
+        bench.generate(tempfile.mkdtemp(), 'private', 2000, 1), 1)
+    processors, bus, list_of_cc = simulator.build(protocol, traces, 1024, 2,
+                                                  16)
+    scheduler.run('event', processors, bus, list_of_cc)
+    full = simulator.core_results(processors, bus)[0]
+    processors, bus, list_of_cc = simulator.build(protocol, traces, 1024, 2,
+                                                  16)
+    estimate = sampling.sample('event', processors, bus, list_of_cc, 10000,
+                               10000)[0]
+    for field in simulator.CORE_FIELDS:
+        assert estimate[field] == full[field]
+
+    # four cores, one window of 50 in every 200 loads/stores
+    input_file = bench.generate(tempfile.mkdtemp(), 'read_mostly', 2000, 4)
+    full = simulator.core_results(*simulator.simulate(protocol, input_file,
+                                                      1024, 2, 16))
+    results = simulator.simulate_sampled(protocol, input_file, 1024, 2, 16,
+                                         200, 50)
+    for before, after in zip(full, results):
+        assert (before['hit_count'] + before['miss_count'] ==
+                after['hit_count'] + after['miss_count'])
+        assert before['total_num_writes'] == after['total_num_writes']
+        assert after['num_of_windows'] > 1
+        print '%s miss rate %.3f, estimate %.3f +- %.3f' % (
+            protocol, before['miss_rate'], after['miss_rate'],
+            after['miss_rate_ci'])
+        print '%s cycles %d, estimate %d +- %d' % (
+            protocol, before['cycle_count'], after['cycle_count'],
+            after['cycle_count_ci'])
+
+print 'finished'
@@ -0,0 +1,36 @@
+'''Run every protocol with and without a verifying snoop filter, and check
+that the results are the same, and that the filter forgets evicted blocks'''
+import tempfile
+import bench
+import simulator
+import scheduler
+import snoopfilter
+
+traces = ['t_0.txt', 't_1.txt']
+
+for protocol in sorted(simulator.PROTOCOLS):
+    results = []
+    for snoop_filter in ['off', 'verify']:
+        processors, bus, list_of_cc = simulator.build(
+            protocol, traces, 1024, 1, 16, snoop_filter=snoop_filter)
+        scheduler.run('event', processors, bus, list_of_cc)
+        results.append(simulator.core_results(processors, bus))
+    assert results[0] == results[1]
+    print protocol + ' cycle count: ' + str(results[0][0]['cycle_count'])
+
+# the filter follows the blocks cached, not every block ever touched
+snoopfilter.PRUNE_MINIMUM = 16
+traces = simulator.trace_files(
+    bench.generate(tempfile.mkdtemp(), 'private', 2000, 4), 4)
+processors, bus, list_of_cc = simulator.build('mesi', traces, 256, 2, 16,
+                                              snoop_filter='verify')
+touched = set()
+for _ in scheduler.ENGINES['event'](processors, bus, list_of_cc):
+    touched.update(bus.snoop_filter.holders)
+    assert len(bus.snoop_filter.holders) <= bus.snoop_filter.limit
+bus.snoop_filter.prune()
+cached = sum(256 / 16 for _ in processors)
+assert 0 < len(bus.snoop_filter.holders) <= cached < len(touched)
+print len(touched), 'blocks touched,', len(bus.snoop_filter.holders), \
+    'still cached'
+print 'finished'
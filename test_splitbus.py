@@ -0,0 +1,85 @@
+'''Run every protocol on split-transaction buses, and check the ordering of
+the transactions of a split bus'''
+import os
+import tempfile
+import bench
+import checkpoint
+import scheduler
+import simulator
+import splitbus
+from message import BusMessage, BUSREAD
+
+directory = tempfile.mkdtemp()
+input_file = bench.generate(directory, 'migratory', 500, 4)
+traces = simulator.trace_files(input_file, 4)
+addresses = set(address for core in range(4) for op, address in
+                bench.instructions('migratory', core, 4, 500) if op != 2)
+
+for protocol in sorted(simulator.PROTOCOLS):
+    results = []
+    for engine in sorted(scheduler.ENGINES):
+        processors, bus, list_of_cc = simulator.build(
+            protocol, traces, 1024, 2, 16, 'array', 'verify', 'split', 4)
+        scheduler.run(engine, processors, bus, list_of_cc)
+        results.append(simulator.core_results(processors, bus))
+    assert results[0] == results[1]
+    assert not bus.outstanding and not bus.pending_blocks
+
+    # a single writer per block in the invalidation protocols
+    if protocol != 'dragon':
+        module = __import__(protocol)
+        for address in addresses:
+            states = [cc.cache.peek(address) for cc in list_of_cc]
+            if module.MODIFIED in states:
+                assert states.count(module.INVALID) == len(states) - 1
+
+    # a checkpoint taken with transactions in flight
+    processors, bus, list_of_cc = simulator.build(
+        protocol, traces, 1024, 2, 16, 'array', 'off', 'split', 4)
+    for _ in scheduler.ENGINES['event'](processors, bus, list_of_cc):
+        if checkpoint.current_cycle(processors) >= 2000:
+            break
+    filename = os.path.join(directory, protocol + '.gz')
+    checkpoint.save(filename, (processors, bus, list_of_cc))
+    _, (processors, bus, list_of_cc) = checkpoint.load(filename)
+    scheduler.run('cycle', processors, bus, list_of_cc)
+    assert simulator.core_results(processors, bus) == results[0]
+    print protocol, [result['cycle_count'] for result in results[0]]
+
+# independent blocks overlap their transactions
+cycles = []
+for max_outstanding in [1, 8]:
+    processors, bus = simulator.simulate(
+        'mesi', bench.generate(directory, 'private', 500, 4), 1024, 2, 16,
+        bus_model='split', max_outstanding=max_outstanding)
+    cycles.append(max(processor.cycle_count for processor in processors))
+assert cycles[1] < cycles[0]
+print 'private cycles, 1 and 8 in flight:', cycles
+
+# a message waits for the transaction in flight on its block, later
+# messages to other blocks go ahead of it
+class Controller(object):
+    def __init__(self):
+        self.completed = []
+
+    def receive_bus_message(self, message):
+        if message.sender is self:
+            self.completed.append((bus.cycle - 1, message.address))
+            return None
+        return (None, False)
+
+requester = Controller()
+bus = splitbus.BusMESISplit(16, [requester, Controller()], 2)
+for address in [0x0, 0x4, 0x100, 0x200]:
+    bus.queue_message(BusMessage(BUSREAD, requester, address))
+scheduler.drain(bus)
+assert requester.completed == [(100, 0x0), (101, 0x100), (200, 0x4),
+                               (201, 0x200)]
+
+# an unknown bus model is an error, not an atomic bus
+try:
+    simulator.build('msi', ['t_0.txt'], 1024, 1, 16, bus_model='splt')
+    assert False, 'built a system of an unknown bus model'
+except ValueError:
+    pass
+print 'finished'
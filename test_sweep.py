@@ -0,0 +1,115 @@
+'''Check that a sweep resumes without simulating finished configurations, that
+single-pass sweeps write the same table, and that interleaved systems match
+standalone runs'''
+import csv
+import os
+import tempfile
+import bench
+import scheduler
+import simulator
+import sweep
+import tracefile
+
+directory = tempfile.mkdtemp()
+dataset = os.path.basename(bench.generate(directory, 'migratory', 500, 2))
+configs = [('mesi', dataset, 2, 1024, 1, 16), ('mesi', dataset, 2, 256, 2, 16)]
+
+# the options of sweep.py that the runs below change
+options = {'engine': 'event', 'warmup': 0, 'bus_model': 'atomic',
+           'num_of_mshrs': 0}
+
+def read_table(filename):
+    with open(filename, 'rb') as table:
+        return sorted(csv.DictReader(table),
+                      key=lambda row: (row['cache_size'], row['core']))
+
+tables = []
+for single_pass in [False, True]:
+    output = os.path.join(directory, 'sweep_%s.csv' % single_pass)
+    assert sweep.sweep(configs, output, directory, 2, single_pass,
+                       **options) == 2
+    assert sweep.sweep(configs, output, directory, 2, single_pass,
+                       **options) == 0
+    tables.append(read_table(output))
+    assert len(tables[-1]) == 4
+    print 'single pass', single_pass, 'resumed with nothing left'
+assert tables[0] == tables[1]
+
+# a new configuration of the grid is simulated alone
+assert sweep.sweep(configs + [('msi', dataset, 2, 1024, 1, 16)], output,
+                   directory, 2, True, **options) == 1
+assert len(read_table(output)) == 6
+
+# runs of the same grid with other options are other configurations
+num_of_rows = 6
+for other_options in [dict(options, warmup=50),
+                      dict(options, bus_model='split', num_of_mshrs=4)]:
+    assert sweep.sweep(configs, output, directory, 2, **other_options) == 2
+    assert sweep.sweep(configs, output, directory, 2, **other_options) == 0
+    num_of_rows += 4
+    assert len(read_table(output)) == num_of_rows
+# the messages of directory homes are reported, the other buses have none
+assert sweep.sweep(configs, output, directory, 2,
+                   **dict(options, bus_model='directory')) == 2
+num_of_rows += 4
+rows = read_table(output)
+assert len(rows) == num_of_rows
+assert all((row['bus_model'] == 'directory') ==
+           (row['total_num_messages'] != '') for row in rows)
+# neither the engine nor the snoop filter are columns
+assert sweep.sweep(configs, output, directory, 2,
+                   **dict(options, engine='cycle')) == 0
+assert sweep.sweep(configs, output, directory, 2,
+                   **dict(options, snoop_filter='on')) == 0
+print 'runs with other options resumed'
+
+# rows of other columns, e.g. sampled ones, go to a table of their own
+for other_options in [dict(options, sample_period=200),
+                      dict(options, replacement='fifo')]:
+    try:
+        sweep.sweep(configs, output, directory, 2, **other_options)
+        assert False, 'appended rows of other columns'
+    except sweep.TableColumnsError:
+        pass
+sampled_output = os.path.join(directory, 'sampled.csv')
+for sample_window in [50, 100]:
+    sampled_options = dict(options, sample_period=200,
+                           sample_window=sample_window)
+    assert sweep.sweep(configs, sampled_output, directory, 2,
+                       **sampled_options) == 2
+    assert sweep.sweep(configs, sampled_output, directory, 2,
+                       **sampled_options) == 0
+assert len(read_table(sampled_output)) == 8
+assert len(read_table(output)) == num_of_rows
+print 'sampled runs resumed'
+
+# systems of very different speeds share the decoded chunks of one pass
+geometries = [(1024, 1, 16), (32768, 4, 16), (256, 2, 32)]
+input_file = os.path.join(directory, dataset)
+expected = [simulator.core_results(*simulator.simulate(
+    'mesi', input_file, cache_size, assoc, block_size, num_of_cores=2))
+            for cache_size, assoc, block_size in geometries]
+assert [simulator.core_results(processors, bus) for processors, bus in
+        simulator.simulate_many('mesi', input_file, geometries,
+                                num_of_cores=2)] == expected
+
+largest_window = [0]
+shared_traces = [tracefile.SharedTrace(filename, 16)
+                 for filename in simulator.trace_files(input_file, 2)]
+for shared in shared_traces:
+    decode_batch = shared.decode_batch
+    def counting_decode_batch(shared=shared, decode_batch=decode_batch):
+        decode_batch()
+        largest_window[0] = max(largest_window[0], len(shared.window))
+    shared.decode_batch = counting_decode_batch
+systems = [simulator.build('mesi', [shared.reader()
+                                    for shared in shared_traces],
+                           cache_size, assoc, block_size)
+           for cache_size, assoc, block_size in geometries]
+scheduler.run_interleaved('event', systems)
+assert [simulator.core_results(processors, bus)
+        for processors, bus, _ in systems] == expected
+assert largest_window[0] <= 4
+print 'interleaved systems match simulate(), window of', largest_window[0], \
+    'chunks'
+print 'finished'
@@ -0,0 +1,61 @@
+'''Convert the sample text traces to binary and read both back'''
+import bz2
+import gzip
+import os
+import tempfile
+from tracefile import TextTrace, BinaryTrace, open_trace, convert, \
+    merge_compute
+
+def read_all(trace):
+    '''return: the whole trace as one chunk'''
+    ops, values = [], []
+    chunk = trace.next_chunk()
+    while chunk is not None:
+        ops.extend(chunk[0])
+        values.extend(chunk[1])
+        chunk = trace.next_chunk()
+    return merge_compute(ops, values)
+
+for filename in ['t_0.txt', 't_1.txt']:
+    binary_filename = os.path.join(tempfile.mkdtemp(), 't.data')
+    print 'records written: ' + str(convert(filename, binary_filename, 0))
+
+    text = open_trace(filename)
+    binary = open_trace(binary_filename) # detected by magic bytes
+    assert isinstance(text, TextTrace) and isinstance(binary, BinaryTrace)
+    while True:
+        instr = text.next_instruction()
+        assert instr == binary.next_instruction()
+        if instr is None:
+            break
+        print instr
+
+    # chunks of both formats agree, with runs of non-mem instructions merged
+    text = open_trace(filename)
+    binary = open_trace(binary_filename)
+    while True:
+        chunk = text.next_chunk(7)
+        assert chunk == binary.next_chunk(7)
+        if chunk is None:
+            break
+        print list(chunk[0]), list(chunk[1])
+
+    # gzip/bzip2 compressed copies of both formats read the same chunks
+    for source in [filename, binary_filename]:
+        for extension, compress in [('.gz', gzip.open), ('.bz2', bz2.BZ2File)]:
+            compressed_filename = os.path.join(tempfile.mkdtemp(),
+                                               't.data' + extension)
+            with open(source, 'rb') as plain:
+                output = compress(compressed_filename, 'wb')
+                output.write(plain.read())
+                output.close()
+            # chunk boundaries may differ, so runs of non-mem instructions
+            # are merged again over the whole trace
+            assert (read_all(open_trace(source)) ==
+                    read_all(open_trace(compressed_filename)))
+            print compressed_filename + ' read back'
+
+ops, values = merge_compute([2, 2, 0, 2, 1, 2], [3, 0, 16, 5, 32, 1])
+assert list(ops) == [2, 0, 2, 1, 2] and list(values) == [4, 16, 5, 32, 1]
+
+print 'finished'
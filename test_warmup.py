@@ -0,0 +1,33 @@
+'''Fast-forward the first accesses of synthetic traces, then simulate the
+rest with both engines'''
+import tempfile
+import bench
+import scheduler
+import simulator
+
+traces = simulator.trace_files(
+    bench.generate(tempfile.mkdtemp(), 'read_mostly', 500, 4), 4)
+for protocol in sorted(simulator.PROTOCOLS):
+    processors, bus, list_of_cc = simulator.build(protocol, traces, 1024, 2,
+                                                  16)
+    scheduler.run('event', processors, bus, list_of_cc)
+    full = simulator.core_results(processors, bus)
+
+    results = []
+    for engine, cache in [('event', 'array'), ('cycle', 'list')]:
+        processors, bus, list_of_cc = simulator.build(protocol, traces, 1024,
+                                                      2, 16, cache, 'verify')
+        scheduler.fast_forward(processors, bus, 100)
+        assert bus.total_bytes_passed_on_bus == 0
+        scheduler.run(engine, processors, bus, list_of_cc)
+        results.append(simulator.core_results(processors, bus))
+    assert results[0] == results[1]
+
+    for before, after in zip(full, results[0]):
+        # the warm-up accesses are no longer counted
+        assert (before['hit_count'] + before['miss_count'] ==
+                after['hit_count'] + after['miss_count'] + 100)
+        assert after['cycle_count'] < before['cycle_count']
+    print protocol, results[0][0]
+
+print 'finished'
@@ -0,0 +1,454 @@
+'''This module contains the trace readers used by Processor, and a converter
+from the text trace format to a packed binary one
+
+text format, one instruction per line:
+    <op> <value>
+    op: 0 - load, 1 - store, 2 - non-mem instruction
+    value: hex address for loads/stores, hex cycle count for op 2
+
+binary format, little endian:
+    header: magic (8 bytes) | core id (uint32) | number of records (uint64)
+    records: op (uint8) | value (uint64), packed without padding
+
+A binary trace is read through mmap, so records are decoded straight from
+the page cache without reading the file into memory.
+
+Readers can be pickled, as part of a checkpoint: they are saved as their file
+name and position, and reopened at that position when unpickled.
+
+Traces compressed with gzip (.gz), bzip2 (.bz2), xz (.xz) or zstd (.zst) are
+read directly, in either format. A background thread decompresses and decodes
+chunks ahead of the simulation into a bounded queue. xz and zstd are read with
+the lzma/zstandard modules when installed, else through the xz/zstd commands.
+
+Processor reads traces a chunk at a time: next_chunk() decodes up to
+BATCH_SIZE records into two parallel arrays, op codes (uint8) and values
+(unsigned long). Consecutive non-mem records are merged into one, whose cycle
+count is the sum of theirs. A non-mem record costs the processor max(1,
+count) cycles whether or not it is merged, so merging does not change any
+result, but a run of compute records is one step instead of one per record.
+
+usage:
+    python tracefile.py <text trace> <binary trace> [core id]
+If core id is omitted, it is taken from the _N suffix of the text trace name.
+'''
+import bz2
+import gzip
+import mmap
+import os
+import Queue
+import re
+import struct
+import subprocess
+import sys
+import threading
+from array import array
+from itertools import islice, izip
+from sys import argv
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = 'RSTRACE\x01'
+HEADER = struct.Struct('<8sIQ')
+RECORD = struct.Struct('<BQ')
+
+# file extensions recognised as binary traces without sniffing the content
+BINARY_EXTENSIONS = ('.trace', '.bin')
+
+# trace records decoded at a time by next_chunk()
+BATCH_SIZE = 1 << 16
+
+# chunks decoded ahead of the simulation from a compressed trace
+PREFETCH_DEPTH = 4
+
+# bytes read from a compressed text trace per record wanted, about one line
+TEXT_RECORD_SIZE = 12
+
+# struct of a whole chunk of records, by number of records
+_chunk_structs = {}
+
+def merge_compute(ops, values):
+    '''Build a chunk, merging consecutive non-mem instructions into one
+
+    return: (array of op codes, array of values)
+    '''
+    merged_ops = []
+    merged_values = []
+    compute = 0 # cycles of the pending run of non-mem instructions
+    for op, value in izip(ops, values):
+        if op == 2:
+            # a non-mem instruction takes one cycle even if its count is 0
+            compute += value if value > 1 else 1
+            continue
+        if compute:
+            merged_ops.append(2)
+            merged_values.append(compute)
+            compute = 0
+        merged_ops.append(op)
+        merged_values.append(value)
+    if compute:
+        merged_ops.append(2)
+        merged_values.append(compute)
+    return array('B', merged_ops), array('L', merged_values)
+
+class TextTrace(object):
+    '''Reads instructions from a text trace'''
+    def __init__(self, filename, offset=0):
+        self.filename = filename
+        self.file = open(filename, 'r')
+        self.file.seek(offset)
+        # byte offset of the next line. file.tell() cannot be used while
+        # iterating over the file
+        self.offset = offset
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'offset': self.offset}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], state['offset'])
+
+    def next_instruction(self):
+        '''return: (op, value), or None at the end of the trace'''
+        line = next(self.file, '')
+        if line == '':
+            return None
+        self.offset += len(line)
+        op, value = line.split()
+        return (int(op, 16), int(value, 16))
+
+    def next_chunk(self, size=BATCH_SIZE):
+        '''Decode up to size more lines at once
+
+        return: (ops, values) arrays, or None at the end of the trace
+        '''
+        text = ''.join(islice(self.file, size))
+        self.offset += len(text)
+        fields = text.split()
+        if not fields:
+            return None
+        return decode_text(fields)
+
+def decode_text(fields):
+    '''return: the chunk of a list of whitespace separated text fields'''
+    return merge_compute([int(op, 16) for op in fields[0::2]],
+                         [int(value, 16) for value in fields[1::2]])
+
+def chunk_struct(count):
+    '''return: the struct of count binary records'''
+    records = _chunk_structs.get(count)
+    if records is None:
+        records = _chunk_structs[count] = struct.Struct(
+            '<' + RECORD.format.lstrip('<') * count)
+    return records
+
+class BinaryTrace(object):
+    '''Reads instructions from a memory-mapped binary trace'''
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.core_id, self.num_of_records = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(filename + ' is not a binary trace')
+
+        self.position = HEADER.size # byte offset of the next record
+        self.end = HEADER.size + self.num_of_records * RECORD.size
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'position': self.position}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+        self.position = state['position']
+
+    def next_instruction(self):
+        '''return: (op, value), or None at the end of the trace'''
+        if self.position >= self.end:
+            return None
+        instr = RECORD.unpack_from(self.map, self.position)
+        self.position += RECORD.size
+        return instr
+
+    def next_chunk(self, size=BATCH_SIZE):
+        '''Decode up to size more records with a single unpack
+
+        return: (ops, values) arrays, or None at the end of the trace
+        '''
+        count = min(size, (self.end - self.position) / RECORD.size)
+        if count <= 0:
+            return None
+        records = chunk_struct(count)
+        fields = records.unpack_from(self.map, self.position)
+        self.position += records.size
+        return merge_compute(fields[0::2], fields[1::2])
+
+class StreamTrace(object):
+    '''Reads chunks of a text or binary trace from a file object that can
+    only be read sequentially, e.g. a decompressor
+    '''
+    def __init__(self, stream):
+        self.stream = stream
+        header = self.read(HEADER.size)
+        self.is_binary = header.startswith(MAGIC)
+        if self.is_binary:
+            if len(header) < HEADER.size:
+                raise ValueError('truncated binary trace header')
+            _, self.core_id, self.remaining = HEADER.unpack(header)
+            self.pending = ''
+        else:
+            self.pending = header # start of the first line
+
+    def read(self, size):
+        '''return: the next size bytes, fewer only at the end of the stream'''
+        data = self.stream.read(size)
+        while 0 < len(data) < size:
+            block = self.stream.read(size - len(data))
+            if not block:
+                break
+            data += block
+        return data
+
+    def next_chunk(self, size=BATCH_SIZE):
+        '''return: (ops, values) arrays, or None at the end of the trace'''
+        if self.is_binary:
+            count = min(size, self.remaining)
+            if count <= 0:
+                return None
+            records = chunk_struct(count)
+            data = self.read(records.size)
+            if len(data) < records.size:
+                raise ValueError('binary trace ends before its last record')
+            self.remaining -= count
+            fields = records.unpack(data)
+            return merge_compute(fields[0::2], fields[1::2])
+
+        # read until the data holds at least one full line, and keep the
+        # partial last line for the next chunk
+        data = self.pending
+        while True:
+            # read() never returns less than asked before the end of the
+            # stream, so a trace is always cut into the same chunks
+            block = self.read(size * TEXT_RECORD_SIZE)
+            data += block
+            if not block:
+                cut = len(data)
+                break
+            cut = data.rfind('\n') + 1
+            if cut:
+                break
+        self.pending = data[cut:]
+        fields = data[:cut].split()
+        if not fields:
+            return None
+        return decode_text(fields)
+
+class PrefetchTrace(object):
+    '''Decodes the chunks of a compressed trace in a background thread
+
+    Up to depth chunks are decoded ahead of the simulation. Decompressors
+    release the GIL, so decompression overlaps with the simulation.
+
+    A compressed stream cannot seek, so an unpickled reader decompresses the
+    trace again from the start, and drops the chunks already read.
+    '''
+    def __init__(self, filename, depth=PREFETCH_DEPTH):
+        self.filename = filename
+        self.depth = depth
+        self.num_of_chunks = 0 # chunks returned by next_chunk()
+        self.queue = Queue.Queue(depth)
+        self.is_finished = False
+
+        extension = os.path.splitext(filename)[1]
+        source = StreamTrace(DECOMPRESSORS[extension](filename))
+        self.thread = threading.Thread(target=self.decode, args=(source,))
+        # an unfinished trace must not keep the simulator from exiting
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __getstate__(self):
+        return {'filename': self.filename, 'depth': self.depth,
+                'num_of_chunks': self.num_of_chunks}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'], state['depth'])
+        for _ in xrange(state['num_of_chunks']):
+            self.next_chunk()
+
+    def decode(self, source):
+        '''Thread body: queue (chunk, None), and (None, exc_info) on error'''
+        try:
+            while True:
+                chunk = source.next_chunk()
+                self.queue.put((chunk, None))
+                if chunk is None:
+                    return
+        except Exception:
+            self.queue.put((None, sys.exc_info()))
+
+    def next_chunk(self, size=None):
+        '''return: (ops, values) arrays, or None at the end of the trace
+
+        size is ignored, chunks are BATCH_SIZE records at most.
+        '''
+        if self.is_finished:
+            return None
+        chunk, error = self.queue.get()
+        if chunk is None:
+            self.is_finished = True
+            if error:
+                raise error[0], error[1], error[2]
+        else:
+            self.num_of_chunks += 1
+        return chunk
+
+class SharedTrace(object):
+    '''Decodes a trace once for several readers
+
+    Chunks are decoded into a window shared by all readers. Before a new
+    chunk is decoded, chunks every reader has already consumed are dropped,
+    so memory grows only with the distance between the slowest and the
+    fastest reader.
+    '''
+    def __init__(self, filename, batch_size=BATCH_SIZE):
+        self.source = open_trace(filename)
+        self.batch_size = batch_size
+        self.window = [] # decoded chunks not yet consumed by everyone
+        self.first_index = 0 # index in the trace of the chunk window[0]
+        self.readers = []
+
+    def reader(self):
+        '''return: a new reader, starting from the beginning of the trace'''
+        reader = SharedTraceReader(self)
+        self.readers.append(reader)
+        return reader
+
+    def decode_batch(self):
+        '''Append the next chunk of up to batch_size records to the window'''
+        consumed = min(reader.index for reader in self.readers)
+        if consumed > self.first_index:
+            del self.window[:consumed - self.first_index]
+            self.first_index = consumed
+
+        chunk = self.source.next_chunk(self.batch_size)
+        if chunk is not None:
+            self.window.append(chunk)
+
+class SharedTraceReader(object):
+    '''One reader's position in a SharedTrace'''
+    def __init__(self, shared):
+        self.shared = shared
+        self.index = 0 # index in the trace of the next chunk
+
+    def next_chunk(self):
+        '''return: (ops, values) arrays, or None at the end of the trace'''
+        shared = self.shared
+        position = self.index - shared.first_index
+        if position >= len(shared.window):
+            shared.decode_batch()
+            position = self.index - shared.first_index
+            if position >= len(shared.window): # end of the trace
+                return None
+        self.index += 1
+        return shared.window[position]
+
+def open_xz(filename):
+    if lzma is not None:
+        return lzma.LZMAFile(filename, 'rb')
+    return decompress_command(['xz', '-dc', filename])
+
+def open_zstd(filename):
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(filename, 'rb'))
+    return decompress_command(['zstd', '-dc', filename])
+
+def decompress_command(command):
+    '''return: the standard output of a decompression command'''
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                   bufsize=-1)
+    except OSError:
+        raise ImportError('no module nor %s command to read %s' %
+                          (command[0], command[-1]))
+    return process.stdout
+
+# extension of a compressed trace: function opening its decompressed stream
+DECOMPRESSORS = {
+    '.gz': lambda filename: gzip.open(filename, 'rb'),
+    '.bz2': lambda filename: bz2.BZ2File(filename, 'rb'),
+    '.xz': open_xz,
+    '.zst': open_zstd,
+}
+
+def is_compressed(filename):
+    return os.path.splitext(filename)[1] in DECOMPRESSORS
+
+def find_trace(filename):
+    '''return: filename, or a compressed version of it if only that exists'''
+    if os.path.exists(filename):
+        return filename
+    for extension in sorted(DECOMPRESSORS):
+        if os.path.exists(filename + extension):
+            return filename + extension
+    return filename
+
+def is_binary(filename):
+    '''Tell a binary trace from a text one by extension, then magic bytes'''
+    if filename.endswith(BINARY_EXTENSIONS):
+        return True
+    with open(filename, 'rb') as trace_file:
+        return trace_file.read(len(MAGIC)) == MAGIC
+
+def open_trace(filename):
+    '''Open a trace file with the reader matching its format'''
+    if is_compressed(filename):
+        return PrefetchTrace(filename)
+    if is_binary(filename):
+        return BinaryTrace(filename)
+    return TextTrace(filename)
+
+def write_trace(binary_filename, instructions, core_id):
+    '''Write an iterable of (op, value) instructions as a binary trace
+
+    return: number of records written
+    '''
+    num_of_records = 0
+    with open(binary_filename, 'wb') as output:
+        # the header is rewritten once the record count is known
+        output.write(HEADER.pack(MAGIC, core_id, 0))
+        for instr in instructions:
+            output.write(RECORD.pack(*instr))
+            num_of_records += 1
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, core_id, num_of_records))
+    return num_of_records
+
+def convert(text_filename, binary_filename, core_id):
+    '''Convert a text trace to the binary format
+
+    return: number of records written
+    '''
+    source = TextTrace(text_filename)
+    instructions = iter(source.next_instruction, None)
+    num_of_records = write_trace(binary_filename, instructions, core_id)
+    source.file.close()
+    return num_of_records
+
+if __name__ == '__main__':
+    if len(argv) == 4:
+        core = int(argv[3])
+    else:
+        match = re.search(r'_(\d+)(\.\w+)?$', argv[1])
+        if not match:
+            exit('Cannot tell the core id of ' + argv[1])
+        core = int(match.group(1))
+    print str(convert(argv[1], argv[2], core)) + ' records written'